@@ -1,4 +1,4 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from app.config import config
@@ -10,24 +10,82 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    from app.utils.sqlite import engine_options, attached_databases, configure_sqlite_engine, register_read_only_events, use_read_only_session
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     db.init_app(app)
+    from app.utils.instrumentation import register_sql_instrumentation
+    from app.utils.metrics import register_request_metrics
+    with app.app_context():
+        configure_sqlite_engine(db.engine, app.config['SQLITE_PRAGMAS'], attached_databases(db.engine.url, app.config))
+        from app.utils.archive import register_archive_schema
+        register_archive_schema(db.engine)
+        register_sql_instrumentation(app, db.engine)
+        register_request_metrics(app, db.engine)
     login_manager.init_app(app)
+    
+    from app.utils.fragments import configure_templates
+    configure_templates(app)
+    
+    from app.utils.assets import register_assets
+    register_assets(app)
+    
+    from app.utils.compression import register_compression
+    register_compression(app)
     login_manager.login_view = 'auth.login'
     
-    from app.models.user import User
+    from app.utils.counters import register_counter_events
+    register_counter_events()
+    
+    from app.utils.search import register_search_events
+    register_search_events()
+    
+    from app.utils.schedule import register_calendar_events
+    register_calendar_events()
+    
+    from app.utils.identity import register_identity_events, load_identity
+    register_identity_events()
+    
+    from app.utils.page_cache import register_page_cache_events
+    register_page_cache_events()
+    
+    from app.utils.reminders import register_reminder_jobs
+    from app.utils.jobs import register_job_runner
+    register_reminder_jobs(app)
+    register_job_runner(app)
+    
+    register_read_only_events()
+    
+    @app.before_request
+    def scope_session():
+        use_read_only_session(app.config['READ_ONLY_GET_SESSIONS'] and request.method in ('GET', 'HEAD'))
+    
+    from app.cli import (counters_cli, search_cli, appointments_cli, availability_cli, holds_cli, archive_cli, schema_cli,
+                         jobs_cli, assets_cli, import_command, export_command)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(appointments_cli)
+    app.cli.add_command(availability_cli)
+    app.cli.add_command(holds_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(import_command)
+    app.cli.add_command(export_command)
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return load_identity(int(user_id))
     
     from app.routes import (auth_bp, admin_dashboard_bp, admin_doctors_bp, admin_patients_bp, admin_search_bp, 
-                           doctor_dashboard_bp, doctor_appointments_bp, doctor_availability_bp,
-                           patient_dashboard_bp, patient_appointments_bp, patient_profile_bp)
+                           admin_export_bp, doctor_dashboard_bp, doctor_appointments_bp, doctor_availability_bp,
+                           patient_dashboard_bp, patient_appointments_bp, patient_profile_bp, metrics_bp, assets_bp, api_v1_bp)
     
     blueprints = [(auth_bp, None), (admin_dashboard_bp, '/admin'), (admin_doctors_bp, '/admin'),
-                  (admin_patients_bp, '/admin'), (admin_search_bp, '/admin'), (doctor_dashboard_bp, '/doctor'),
-                  (doctor_appointments_bp, '/doctor'), (doctor_availability_bp, '/doctor'), 
-                  (patient_dashboard_bp, '/patient'), (patient_appointments_bp, '/patient'), (patient_profile_bp, '/patient')]
+                  (admin_patients_bp, '/admin'), (admin_search_bp, '/admin'), (admin_export_bp, '/admin'),
+                  (doctor_dashboard_bp, '/doctor'), (doctor_appointments_bp, '/doctor'), (doctor_availability_bp, '/doctor'), 
+                  (patient_dashboard_bp, '/patient'), (patient_appointments_bp, '/patient'), (patient_profile_bp, '/patient'),
+                  (metrics_bp, None), (assets_bp, None), (api_v1_bp, '/api/v1')]
     
     for bp, prefix in blueprints:
         app.register_blueprint(bp, url_prefix=prefix)
@@ -0,0 +1,224 @@
+import click
+from flask.cli import AppGroup, with_appcontext
+
+counters_cli = AppGroup('counters', help='Maintain the materialized dashboard counters.')
+
+@counters_cli.command('rebuild')
+def rebuild_counters_command():
+    """Recompute all dashboard counters from the appointment, doctor and patient tables."""
+    from app.utils.counters import rebuild_counters
+    count = rebuild_counters()
+    click.echo(f'✓ Rebuilt {count} counters')
+
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+
+@search_cli.command('rebuild')
+def rebuild_search_command():
+    """Recreate the doctor and patient full-text indexes from their tables."""
+    from app.utils.search import rebuild_search_index
+    rebuild_search_index()
+    click.echo('✓ Rebuilt search index')
+
+appointments_cli = AppGroup('appointments', help='Maintain the appointments table.')
+
+@appointments_cli.command('upgrade')
+def upgrade_appointments_command():
+    """Add the version column and the active-slot unique index to a database created before they existed."""
+    from app.utils.booking import upgrade_appointment_schema
+    try:
+        changes = upgrade_appointment_schema()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for change in changes:
+        click.echo(f'  {change}')
+    click.echo('✓ Appointments table is up to date' if changes else '✓ Appointments table was already up to date')
+
+availability_cli = AppGroup('availability', help='Maintain doctor availability schedules.')
+
+@availability_cli.command('normalize')
+def normalize_availability_command():
+    """Merge overlapping weekly availability rows into non-overlapping intervals."""
+    from app.utils.schedule import normalize_availability
+    removed = normalize_availability()
+    click.echo(f'✓ Normalized availability ({removed} redundant rows removed)')
+
+holds_cli = AppGroup('holds', help='Maintain temporary slot holds.')
+
+@holds_cli.command('sweep')
+def sweep_holds_command():
+    """Delete every expired slot hold."""
+    from app.utils.holds import sweep_expired_holds
+    removed = sweep_expired_holds()
+    click.echo(f'✓ Removed {removed} expired holds')
+
+archive_cli = AppGroup('archive', help='Move old appointments to the archive database and maintain the hot one.')
+
+def _echo_maintenance(result):
+    if result['incremental']:
+        click.echo(f'✓ Analyzed; released {result["released_pages"]} of {result["free_pages"]} free pages')
+    else:
+        click.echo(f'✓ Analyzed; {result["free_pages"]} free pages kept (auto_vacuum is not INCREMENTAL, '
+                   'run `flask archive maintain --full-vacuum` once at a quiet time)')
+
+@archive_cli.command('run')
+@click.option('--older-than', 'days', type=int, help='Age in days (default: ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, help='Appointments per move (default: ARCHIVE_BATCH_SIZE).')
+@click.option('--no-maintain', is_flag=True, help='Skip ANALYZE and incremental vacuum afterwards.')
+def run_archive_command(days, batch_size, no_maintain):
+    """Move completed/cancelled appointments older than the horizon, with treatments, to the archive database."""
+    from app.utils.archive import archive_appointments, archive_cutoff, maintain_database
+    cutoff = archive_cutoff(days)
+    click.echo(f'Archiving completed/cancelled appointments dated before {cutoff} ...')
+    moved = archive_appointments(cutoff, batch_size, lambda count: click.echo(f'  {count} moved'))
+    click.echo(f'✓ Archived {moved} appointments')
+    if not no_maintain:
+        _echo_maintenance(maintain_database())
+
+@archive_cli.command('maintain')
+@click.option('--full-vacuum', is_flag=True, help='Rewrite the file once to enable incremental vacuum (locks the database).')
+def maintain_archive_command(full_vacuum):
+    """ANALYZE the databases and release free pages from the hot one."""
+    from app.utils.archive import maintain_database
+    _echo_maintenance(maintain_database(full_vacuum))
+
+schema_cli = AppGroup('schema', help='Keep an existing database in step with the models.')
+
+@schema_cli.command('sync')
+def sync_schema_command():
+    """Create the tables, columns and indexes the models define but the database lacks."""
+    from app import db
+    from app.utils.sqlite import SchemaSyncError, sync_schema
+    try:
+        created = sync_schema(db.engine, db.metadata)
+    except SchemaSyncError as e:
+        raise click.ClickException(str(e))
+    for name in created:
+        click.echo(f'  {name}')
+    click.echo(f'✓ Created {len(created)} tables, columns and indexes')
+
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+@jobs_cli.command('worker')
+@click.option('--threads', type=int, help='Worker threads (default: JOB_WORKER_THREADS).')
+def jobs_worker_command(threads):
+    """Run due jobs, including periodic ones like reminders, until interrupted."""
+    import time
+    from flask import current_app
+    from app.utils.jobs import JobRunner
+    app = current_app._get_current_object()
+    runner = JobRunner(app, threads or app.config['JOB_WORKER_THREADS'])
+    runner.start()
+    click.echo(f'✓ Job worker {runner.name} running {runner.threads} threads (Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        click.echo('Stopping after the running jobs finish...')
+        runner.stop()
+
+@jobs_cli.command('run')
+@click.option('--limit', type=int, help='Stop after this many jobs.')
+def jobs_run_command(limit):
+    """Enqueue periodic jobs, run every due job once and exit (for cron)."""
+    from flask import current_app
+    from app.utils.jobs import JobRunner
+    outcomes = JobRunner(current_app._get_current_object()).run_pending(limit)
+    click.echo(f'✓ Ran {sum(outcomes.values())} jobs' +
+               (' (' + ', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items())) + ')' if outcomes else ''))
+
+@jobs_cli.command('status')
+def jobs_status_command():
+    """Count jobs by kind and status, and show why failed jobs failed."""
+    from app.models import Job
+    from app.utils.jobs import job_counts
+    for (kind, status), count in sorted(job_counts().items()):
+        click.echo(f'  {kind:24} {status:10} {count}')
+    for job in Job.query.filter_by(status='failed').order_by(Job.finished_at.desc()).limit(10):
+        click.echo(f'  failed #{job.id} {job.kind} after {job.attempts} attempts: {job.last_error}')
+
+@jobs_cli.command('retry')
+@click.option('--kind', help='Only jobs of this kind.')
+def jobs_retry_command(kind):
+    """Queue failed jobs again with a fresh set of attempts."""
+    from app.utils.jobs import retry_failed
+    click.echo(f'✓ Requeued {retry_failed(kind)} failed jobs')
+
+assets_cli = AppGroup('assets', help='Build fingerprinted, precompressed static assets.')
+
+@assets_cli.command('build')
+def build_assets_command():
+    """Write content-hashed copies of app/static plus gzip/brotli variants and a manifest."""
+    from flask import current_app
+    from app.utils.assets import build_assets, brotli
+    manifest = build_assets(current_app.static_folder, current_app.config['ASSETS_BUILD_DIR'])
+    for logical, target in sorted(manifest.items()):
+        click.echo(f'  {logical} -> {target}')
+    if brotli is None:
+        click.echo('  (brotli not installed; wrote gzip variants only)')
+    click.echo(f'✓ Built {len(manifest)} assets; restart the app to serve them')
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(['doctors', 'patients', 'availability', 'appointments']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per bulk insert and transaction.')
+@click.option('--processes', type=int, help='Password hashing processes (default: one per core).')
+@click.option('--no-default-availability', is_flag=True, help='Doctors only: skip the Mon-Fri 9-5 schedule.')
+@click.option('--dry-run', is_flag=True, help='Validate the file without writing anything.')
+@with_appcontext
+def import_command(kind, path, fmt, batch_size, processes, no_default_availability, dry_run):
+    """Bulk-load doctors, patients, availability or historical appointments from CSV/NDJSON.
+
+    Doctors/patients: email, password (or password_hash), name, plus their
+    profile columns and department (by name) for doctors. Availability:
+    doctor_email, day_of_week, start_time, end_time. Appointments:
+    doctor_email, patient_email, date, time, status, notes and optionally
+    diagnosis, prescription, treatment_notes.
+    """
+    from app.utils.importer import run_import, ImportValidationError
+    
+    def progress(count, elapsed):
+        click.echo(f'  {count} rows ({count / elapsed:.0f} rows/s)')
+    
+    try:
+        count, elapsed = run_import(kind, path, fmt, batch_size, processes, not no_default_availability,
+                                    dry_run, progress)
+    except ImportValidationError as e:
+        for number, message in e.errors[:50]:
+            click.echo(f'  line {number}: {message}', err=True)
+        if len(e.errors) > 50:
+            click.echo(f'  ... and {len(e.errors) - 50} more', err=True)
+        raise click.ClickException(f'{len(e.errors)} problems found; nothing was imported')
+    
+    if dry_run:
+        click.echo(f'✓ {path} is valid')
+    else:
+        click.echo(f'✓ Imported {count} {kind} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} rows/s)')
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(['appointments', 'patients', 'treatments']))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='First appointment date to include.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Last appointment date to include.')
+@click.option('--department', help='Only doctors in this department (by name).')
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8', lazy=True), default='-',
+              help='File to write (default: stdout).')
+@with_appcontext
+def export_command(kind, fmt, start, end, department, output):
+    """Stream appointments, patients or treatments as CSV/NDJSON with constant memory.
+
+    Date and department filters apply to appointments; patients are narrowed
+    to those with an appointment matching them.
+    """
+    from app.models.department import Department
+    from app.utils.exporter import export_chunks
+    
+    department_id = None
+    if department:
+        found = Department.query.filter_by(name=department).first()
+        if found is None:
+            raise click.ClickException(f'Unknown department: {department}')
+        department_id = found.id
+    
+    for chunk in export_chunks(kind, fmt, start and start.date(), end and end.date(), department_id):
+        output.write(chunk)
@@ -4,10 +4,89 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'hospital.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Applied to every new SQLite connection; None skips a pragma
+    SQLITE_PRAGMAS = {
+        # Only takes effect when a database file is created, so it must come first; existing
+        # files are converted once with `flask archive maintain --full-vacuum`
+        'auto_vacuum': os.environ.get('SQLITE_AUTO_VACUUM', 'INCREMENTAL'),
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),  # readers no longer block on writers
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),  # safe with WAL, fsync only at checkpoints
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -20000)),  # negative = KiB, so ~20 MB per connection
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # ms to wait for a write lock
+        'temp_store': 'MEMORY',
+    }
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = 30
+    READ_ONLY_GET_SESSIONS = True
+    # Completed/cancelled appointments older than ARCHIVE_AFTER_DAYS are moved here by `flask archive run`;
+    # default is "<database name>_archive.db" next to the main database
+    ARCHIVE_DATABASE_PATH = os.environ.get('ARCHIVE_DATABASE_PATH')
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = 500  # appointments per move; each batch is two short transactions
+    SQLITE_ANALYSIS_LIMIT = 1000  # rows sampled per index by ANALYZE; 0 scans everything
+    SQLITE_VACUUM_STEP_PAGES = 1000  # free pages released per incremental_vacuum transaction
+    # Background jobs run from `flask jobs worker`; set JOB_IN_PROCESS_THREADS to also run them inside web processes
+    JOB_IN_PROCESS_THREADS = int(os.environ.get('JOB_IN_PROCESS_THREADS', 0))
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 2))
+    JOB_POLL_SECONDS = 2
+    JOB_LEASE_SECONDS = 300  # a running job not finished by then is assumed lost and run again
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_BASE_SECONDS = 30  # doubles with each failed attempt, up to JOB_RETRY_MAX_SECONDS
+    JOB_RETRY_MAX_SECONDS = 3600
+    JOB_RETENTION_DAYS = 7
+    REMINDER_LEAD_HOURS = int(os.environ.get('REMINDER_LEAD_HOURS', 24))
+    REMINDER_SCAN_SECONDS = int(os.environ.get('REMINDER_SCAN_SECONDS', 300))  # 0 stops new reminders
+    REMINDER_WINDOW_MINUTES = 60  # appointments starting in the same window are delivered as one batch
+    REMINDER_BATCH_SIZE = 200
+    # 'log', 'file' (JSON lines in REMINDER_FILE) or an importable "module:Class"
+    REMINDER_BACKEND = os.environ.get('REMINDER_BACKEND', 'log')
+    REMINDER_FILE = os.environ.get('REMINDER_FILE') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'reminders.ndjson')
+    # Werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"; existing
+    # hashes are upgraded on the user's next successful login after this changes
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+    # Per-request SQL detail (Server-Timing, slow-query log); when off none of its engine hooks are
+    # installed. METRICS_ENABLED adds its own lighter hook for per-request query count and DB time.
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '0') == '1'
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')  # JSON lines file; default is the app's logging setup
+    SERVER_TIMING_STATEMENTS = 5
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    # Each worker process writes a snapshot here; clear it when deploying so old processes' counters go away
+    METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'metrics')
+    METRICS_FLUSH_SECONDS = 5
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # lets a scraper use "Authorization: Bearer <token>" instead of an admin login
     WTF_CSRF_ENABLED = True
+    PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))
+    MAX_PAGE_SIZE = 200
+    TYPEAHEAD_LIMIT = 8
+    SLOT_INTERVAL_MINUTES = 30
+    MAX_SLOT_DAYS = 31
+    CALENDAR_CACHE_TTL = 60
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 10))
+    SLOT_HOLD_MINUTES = int(os.environ.get('SLOT_HOLD_MINUTES', 5))
+    SLOT_HOLD_SWEEP_SECONDS = 60
+    API_TOKEN_MAX_AGE = int(os.environ.get('API_TOKEN_MAX_AGE', 30 * 24 * 3600))  # seconds; tokens also die when the password changes
+    PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 30))
+    PAGE_CACHE_SIZE = 256
+    # Compiled templates, shared by all workers; None compiles in memory per process
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'jinja_cache')
+    # Output of `flask assets build`; when its manifest exists templates link the fingerprinted files
+    ASSETS_BUILD_DIR = os.environ.get('ASSETS_BUILD_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'assets')
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 5000))  # rendered {% cache %} blocks per process; 0 disables
+    HTML_COLLAPSE_WHITESPACE = os.environ.get('HTML_COLLAPSE_WHITESPACE', '1') == '1'
+    # Responses smaller than COMPRESS_MIN_SIZE bytes are sent as-is; br/zstd are used when installed
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = 4
+    COMPRESS_ZSTD_LEVEL = 3
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '1') == '1'
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -1,7 +1,17 @@
 from functools import wraps
-from flask import abort
+from flask import abort, g
 from flask_login import current_user
 
+PROFILE_ROLES = ('doctor', 'patient')
+
+def current_profile():
+    """The logged-in user's Doctor or Patient row, loaded with the user so no extra query runs"""
+    if 'profile' not in g:
+        g.profile = None
+        if current_user.is_authenticated and current_user.role in PROFILE_ROLES:
+            g.profile = getattr(current_user, current_user.role)
+    return g.profile
+
 def role_required(role):
     def decorator(f):
         @wraps(f)
@@ -12,6 +22,8 @@ def role_required(role):
                 abort(403)
             if not current_user.is_active:
                 abort(403)
+            if role in PROFILE_ROLES and current_profile() is None:
+                abort(404)
             return f(*args, **kwargs)
         return decorated_function
     return decorator
@@ -1,4 +1,4 @@
 from app.forms.auth_forms import LoginForm, PatientRegistrationForm
 from app.forms.admin_forms import DoctorForm, SearchForm
-from app.forms.doctor_forms import TreatmentForm, AvailabilityForm
+from app.forms.doctor_forms import TreatmentForm, AvailabilityForm, AvailabilityExceptionForm
 from app.forms.patient_forms import AppointmentBookingForm, ProfileUpdateForm
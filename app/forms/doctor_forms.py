@@ -1,6 +1,7 @@
 from flask_wtf import FlaskForm
-from wtforms import TextAreaField, SubmitField, TimeField, SelectField, BooleanField
-from wtforms.validators import DataRequired, Optional
+from wtforms import TextAreaField, SubmitField, TimeField, SelectField, BooleanField, DateField, StringField
+from wtforms.validators import DataRequired, Optional, Length
+from app.utils.validators import validate_future_date
 
 class TreatmentForm(FlaskForm):
     diagnosis = TextAreaField('Diagnosis', validators=[DataRequired()])
@@ -17,3 +18,11 @@ class AvailabilityForm(FlaskForm):
     end_time = TimeField('End Time', validators=[DataRequired()])
     is_available = BooleanField('Available')
     submit = SubmitField('Update Availability')
+
+class AvailabilityExceptionForm(FlaskForm):
+    date = DateField('Date', validators=[DataRequired(), validate_future_date])
+    start_time = TimeField('Start Time', validators=[Optional()])
+    end_time = TimeField('End Time', validators=[Optional()])
+    is_available = BooleanField('Extra opening hours (leave unchecked for a closure)')
+    reason = StringField('Reason', validators=[Optional(), Length(max=200)])
+    submit = SubmitField('Save Exception')
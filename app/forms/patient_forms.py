@@ -1,5 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, DateField, TimeField, SelectField, TextAreaField, SubmitField
+from wtforms import StringField, DateField, TimeField, SelectField, TextAreaField, SubmitField, IntegerField
+from wtforms.widgets import HiddenInput
 from wtforms.validators import DataRequired, Optional, Length
 from app.utils.validators import validate_appointment_conflict, validate_doctor_availability, validate_future_date, validate_active_doctor
 
@@ -14,6 +15,7 @@ class AppointmentRescheduleForm(FlaskForm):
     date = DateField('New Appointment Date', validators=[DataRequired(), validate_future_date])
     time = TimeField('New Appointment Time', validators=[DataRequired()])
     notes = TextAreaField('Notes/Symptoms', validators=[Optional()])
+    version = IntegerField(widget=HiddenInput(), validators=[DataRequired()])
     submit = SubmitField('Reschedule Appointment')
 
 class ProfileUpdateForm(FlaskForm):
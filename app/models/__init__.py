@@ -5,3 +5,9 @@ from app.models.patient import Patient
 from app.models.appointment import Appointment
 from app.models.treatment import Treatment
 from app.models.availability import Availability
+from app.models.counter import Counter
+from app.models.availability_exception import AvailabilityException
+from app.models.slot_hold import SlotHold
+from app.models.history import AppointmentHistory, TreatmentHistory
+from app.models.job import Job
+from app.models.reminder import AppointmentReminder
@@ -12,13 +12,21 @@ class Appointment(db.Model):
     status = db.Column(db.String(20), default='booked')
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text('1'))
     
     treatment = db.relationship('Treatment', backref='appointment', uselist=False, cascade='all, delete-orphan')
     
     __table_args__ = (
         db.Index('idx_doctor_datetime', 'doctor_id', 'date', 'time'),
-        db.UniqueConstraint('doctor_id', 'date', 'time', name='uq_doctor_datetime'),
+        db.Index('idx_patient_datetime', 'patient_id', 'date', 'time'),
+        db.Index('idx_datetime', 'date', 'time'),
+        # Only active appointments hold a slot; cancelled/completed ones don't block rebooking
+        db.Index('uq_doctor_active_slot', 'doctor_id', 'date', 'time', unique=True,
+                 sqlite_where=db.text("status IN ('booked', 'rescheduled')")),
     )
     
+    # UPDATEs check and bump the version, so concurrent edits fail instead of overwriting
+    __mapper_args__ = {'version_id_col': version}
+    
     def __repr__(self):
         return f'<Appointment {self.id} - {self.date} {self.time}>'
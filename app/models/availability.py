@@ -12,7 +12,7 @@ class Availability(db.Model):
     is_available = db.Column(db.Boolean, default=True)
     
     __table_args__ = (
-        db.Index('idx_doctor_day', 'doctor_id', 'day_of_week'),
+        db.Index('idx_doctor_day', 'doctor_id', 'day_of_week', 'start_time'),
     )
     
     def __repr__(self):
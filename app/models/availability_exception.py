@@ -0,0 +1,20 @@
+from app import db
+
+class AvailabilityException(db.Model):
+    """Date-specific override of a doctor's weekly availability (holidays, closures, extra hours)"""
+    __tablename__ = 'availability_exceptions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time)  # both times empty = the whole day
+    end_time = db.Column(db.Time)
+    is_available = db.Column(db.Boolean, default=False)  # False = closed, True = extra opening
+    reason = db.Column(db.String(200))
+    
+    __table_args__ = (
+        db.Index('idx_doctor_exception_date', 'doctor_id', 'date', 'start_time'),
+    )
+    
+    def __repr__(self):
+        return f'<AvailabilityException Doctor:{self.doctor_id} Date:{self.date}>'
@@ -0,0 +1,13 @@
+from app import db
+
+class Counter(db.Model):
+    """Materialized row counts for dashboards, kept current on every flush"""
+    __tablename__ = 'counters'
+    
+    scope = db.Column(db.String(20), primary_key=True)  # global, doctor, patient
+    scope_id = db.Column(db.Integer, primary_key=True, default=0)
+    name = db.Column(db.String(40), primary_key=True)  # appointments, status:<status>, doctors, patients
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<Counter {self.scope}:{self.scope_id} {self.name}={self.value}>'
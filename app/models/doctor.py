@@ -11,8 +11,14 @@ class Doctor(db.Model):
     phone = db.Column(db.String(20))
     years_of_experience = db.Column(db.Integer, default=0)
     
+    __table_args__ = (
+        db.Index('idx_doctor_user', 'user_id'),
+        db.Index('idx_doctor_department', 'department_id'),
+    )
+    
     appointments = db.relationship('Appointment', backref='doctor', lazy='dynamic', cascade='all, delete-orphan')
     availability = db.relationship('Availability', backref='doctor', lazy='dynamic', cascade='all, delete-orphan')
+    availability_exceptions = db.relationship('AvailabilityException', backref='doctor', lazy='dynamic', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Doctor {self.name}>'
@@ -0,0 +1,73 @@
+from sqlalchemy import exists, false, select, true, union_all
+from app import db
+from app.models.appointment import Appointment
+from app.models.treatment import Treatment
+
+def _archive_table(source, *indexes):
+    # Same columns as the live table, without foreign keys (SQLite can't reference across files)
+    columns = [db.Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in source.columns]
+    return db.Table(source.name, *columns, *indexes, schema='archive')
+
+# Completed/cancelled appointments moved out of the hot tables by `flask archive run`.
+# They live in a separate SQLite file ATTACHed to every connection as "archive".
+archived_appointments = _archive_table(
+    Appointment.__table__,
+    db.Index('idx_archive_patient_datetime', 'patient_id', 'date', 'time'),
+    db.Index('idx_archive_doctor_datetime', 'doctor_id', 'date', 'time'),
+    db.Index('idx_archive_datetime', 'date', 'time'),
+)
+archived_treatments = _archive_table(
+    Treatment.__table__,
+    db.Index('idx_archive_treatment_appointment', 'appointment_id', unique=True),
+)
+
+_live_appointments, _live_treatments = Appointment.__table__, Treatment.__table__
+
+def _not_live(live, archived):
+    # An archived row is hidden while its live copy still exists, i.e. in the middle of a move
+    return ~exists().where(live.c.id == archived.c.id)
+
+_appointment_history = union_all(
+    select(*_live_appointments.c, _live_treatments.c.id.label('treatment_id'), false().label('archived'))
+    .outerjoin_from(_live_appointments, _live_treatments, _live_treatments.c.appointment_id == _live_appointments.c.id),
+    select(*archived_appointments.c, archived_treatments.c.id.label('treatment_id'), true().label('archived'))
+    .outerjoin_from(archived_appointments, archived_treatments,
+                    archived_treatments.c.appointment_id == archived_appointments.c.id)
+    .where(_not_live(_live_appointments, archived_appointments)),
+).subquery('appointment_history')
+
+_treatment_history = union_all(
+    select(*_live_treatments.c, false().label('archived')),
+    select(*archived_treatments.c, true().label('archived')).where(_not_live(_live_treatments, archived_treatments)),
+).subquery('treatment_history')
+
+class AppointmentHistory(db.Model):
+    """Read-only view of every appointment, live or archived, for history pages.
+
+    SQLite pushes filters, ordering and limits into both halves of the
+    UNION ALL, so a patient's history is two index range scans. Relationships
+    into the other union are loaded with SELECT ... IN rather than joined,
+    which would materialize the whole union.
+    """
+    __table__ = _appointment_history
+    __mapper_args__ = {'primary_key': [_appointment_history.c.id]}
+
+    doctor = db.relationship('Doctor', primaryjoin='foreign(AppointmentHistory.doctor_id) == Doctor.id', viewonly=True)
+    patient = db.relationship('Patient', primaryjoin='foreign(AppointmentHistory.patient_id) == Patient.id',
+                              viewonly=True)
+    treatment = db.relationship('TreatmentHistory', lazy='selectin', viewonly=True,
+                                primaryjoin='foreign(AppointmentHistory.treatment_id) == TreatmentHistory.id')
+
+    def __repr__(self):
+        return f'<AppointmentHistory {self.id} - {self.date} {self.time}>'
+
+class TreatmentHistory(db.Model):
+    """Read-only view of every treatment, live or archived"""
+    __table__ = _treatment_history
+    __mapper_args__ = {'primary_key': [_treatment_history.c.id]}
+
+    appointment = db.relationship('AppointmentHistory', lazy='selectin', viewonly=True,
+                                  primaryjoin='foreign(TreatmentHistory.appointment_id) == AppointmentHistory.id')
+
+    def __repr__(self):
+        return f'<TreatmentHistory {self.id}>'
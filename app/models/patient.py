@@ -12,6 +12,10 @@ class Patient(db.Model):
     blood_group = db.Column(db.String(5))
     medical_history = db.Column(db.Text)
     
+    __table_args__ = (
+        db.Index('idx_patient_user', 'user_id'),
+    )
+    
     appointments = db.relationship('Appointment', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
     
     def __repr__(self):
@@ -0,0 +1,24 @@
+from app import db
+from datetime import datetime
+
+class AppointmentReminder(db.Model):
+    """A reminder claimed for one appointment slot, so each slot is reminded about once"""
+    __tablename__ = 'appointment_reminders'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: rows outlive appointments that are deleted or archived, and are pruned by date
+    appointment_id = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, sent, skipped
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        # A rescheduled appointment is a new slot and gets its own reminder
+        db.Index('uq_reminder_slot', 'appointment_id', 'date', 'time', unique=True),
+        db.Index('idx_reminder_date', 'date'),
+    )
+    
+    def __repr__(self):
+        return f'<AppointmentReminder Appointment:{self.appointment_id} {self.date} {self.time} {self.status}>'
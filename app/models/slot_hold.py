@@ -0,0 +1,23 @@
+from app import db
+from datetime import datetime
+
+class SlotHold(db.Model):
+    """Short-lived reservation of a slot while a patient fills in the booking form"""
+    __tablename__ = 'slot_holds'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), nullable=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'date', 'time', name='uq_hold_slot'),
+        db.Index('idx_hold_patient', 'patient_id'),
+        db.Index('idx_hold_expires', 'expires_at'),
+    )
+    
+    def __repr__(self):
+        return f'<SlotHold Doctor:{self.doctor_id} {self.date} {self.time} until {self.expires_at}>'
@@ -1,5 +1,4 @@
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from app import db
 
@@ -17,10 +16,16 @@ class User(UserMixin, db.Model):
     patient = db.relationship('Patient', backref='user', uselist=False, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from app.utils.passwords import hash_password
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        from app.utils.passwords import verify_password
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        from app.utils.passwords import needs_rehash
+        return needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f'<User {self.email}>'
@@ -4,6 +4,10 @@ from app.decorators import admin_required
 from app.models.doctor import Doctor
 from app.models.patient import Patient
 from app.models.appointment import Appointment
+from app.models.department import Department
+from app.utils.queries import view_query, APPOINTMENT_KEY
+from app.utils.pagination import keyset_paginate
+from app.utils.counters import get_counters, status_count
 from datetime import date
 
 admin_dashboard_bp = Blueprint('admin_dashboard', __name__)
@@ -12,19 +16,20 @@ admin_dashboard_bp = Blueprint('admin_dashboard', __name__)
 @login_required
 @admin_required
 def index():
+    counters = get_counters()
     stats = {
-        'total_doctors': Doctor.query.count(),
-        'total_patients': Patient.query.count(),
-        'total_appointments': Appointment.query.count(),
-        'recent_doctors': Doctor.query.order_by(Doctor.id.desc()).limit(5).all(),
-        'recent_patients': Patient.query.order_by(Patient.id.desc()).limit(5).all(),
-        'upcoming_appointments': Appointment.query.filter(
+        'total_doctors': counters.get('doctors', 0),
+        'total_patients': counters.get('patients', 0),
+        'total_appointments': counters.get('appointments', 0),
+        'recent_doctors': view_query('admin.doctors').order_by(Doctor.id.desc()).limit(5).all(),
+        'recent_patients': view_query('admin.patients').order_by(Patient.id.desc()).limit(5).all(),
+        'upcoming_appointments': view_query('admin.upcoming_appointments').filter(
             Appointment.date >= date.today(),
             Appointment.status.in_(['booked', 'rescheduled'])
         ).order_by(Appointment.date, Appointment.time).limit(10).all(),
-        'booked_count': Appointment.query.filter_by(status='booked').count(),
-        'completed_count': Appointment.query.filter_by(status='completed').count(),
-        'cancelled_count': Appointment.query.filter_by(status='cancelled').count()
+        'booked_count': status_count(counters, 'booked'),
+        'completed_count': status_count(counters, 'completed'),
+        'cancelled_count': status_count(counters, 'cancelled')
     }
     
     return render_template('admin/dashboard.html', **stats)
@@ -33,5 +38,6 @@ def index():
 @login_required
 @admin_required
 def appointments():
-    appointments = Appointment.query.order_by(Appointment.date.desc(), Appointment.time.desc()).all()
-    return render_template('admin/appointments.html', appointments=appointments)
+    appointments = keyset_paginate(view_query('admin.appointments'), APPOINTMENT_KEY, descending=True)
+    departments = Department.query.order_by(Department.name).all()
+    return render_template('admin/appointments.html', appointments=appointments, departments=departments)
@@ -6,6 +6,9 @@ from app.models.doctor import Doctor
 from app.models.department import Department
 from app.models.availability import Availability
 from app.forms.admin_forms import DoctorForm
+from app.utils.queries import view_query, DOCTOR_KEY
+from app.utils.pagination import keyset_paginate
+from app.utils.archive import purge_archived
 from app import db
 from datetime import time
 
@@ -15,7 +18,7 @@ admin_doctors_bp = Blueprint('admin_doctors', __name__)
 @login_required
 @admin_required
 def list_doctors():
-    return render_template('admin/doctors.html', doctors=Doctor.query.all())
+    return render_template('admin/doctors.html', doctors=keyset_paginate(view_query('admin.doctors'), DOCTOR_KEY))
 
 @admin_doctors_bp.route('/doctors/add', methods=['GET', 'POST'])
 @login_required
@@ -96,6 +99,7 @@ def delete_doctor(id):
     doctor = Doctor.query.get_or_404(id)
     doctor_name = doctor.name
     Availability.query.filter_by(doctor_id=doctor.id).delete()
+    purge_archived(doctor_id=doctor.id)
     db.session.delete(doctor)
     db.session.delete(doctor.user)
     db.session.commit()
@@ -0,0 +1,34 @@
+from datetime import date
+from flask import Blueprint, Response, abort, request, stream_with_context
+from flask_login import login_required
+from app.decorators import admin_required
+from app.utils.exporter import EXPORT_KINDS, EXPORT_FORMATS, export_chunks
+
+admin_export_bp = Blueprint('admin_export', __name__)
+
+def _filter_arg(name, parse):
+    # A filter that doesn't parse must not silently turn into a full, unfiltered export
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return parse(value)
+    except ValueError:
+        abort(400, description=f'Invalid {name!r} filter: {value!r}')
+
+@admin_export_bp.route('/export/<kind>.<fmt>')
+@login_required
+@admin_required
+def export(kind, fmt):
+    if kind not in EXPORT_KINDS or fmt not in EXPORT_FORMATS:
+        abort(404)
+    
+    start = _filter_arg('start', date.fromisoformat)
+    end = _filter_arg('end', date.fromisoformat)
+    department_id = _filter_arg('department', int)
+    
+    # The generator keeps the request context (and its session) alive until the last row is sent
+    chunks = stream_with_context(export_chunks(kind, fmt, start, end, department_id))
+    filename = f'{kind}-{date.today().isoformat()}.{fmt}'
+    return Response(chunks, mimetype=EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
@@ -2,8 +2,10 @@ from flask import Blueprint, render_template, redirect, url_for, flash
 from flask_login import login_required
 from app.decorators import admin_required
 from app.models.patient import Patient
-from app.models.appointment import Appointment
 from app.forms.patient_forms import ProfileUpdateForm
+from app.utils.queries import view_query, PATIENT_KEY, HISTORY_KEY
+from app.utils.pagination import keyset_paginate
+from app.utils.archive import purge_archived
 from app import db
 
 admin_patients_bp = Blueprint('admin_patients', __name__)
@@ -12,7 +14,7 @@ admin_patients_bp = Blueprint('admin_patients', __name__)
 @login_required
 @admin_required
 def list_patients():
-    return render_template('admin/patients.html', patients=Patient.query.all())
+    return render_template('admin/patients.html', patients=keyset_paginate(view_query('admin.patients'), PATIENT_KEY))
 
 @admin_patients_bp.route('/patients/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -43,6 +45,7 @@ def delete_patient(id):
     patient_name = patient.name
     
     # Delete the patient record (this will also delete the user due to cascade)
+    purge_archived(patient_id=patient.id)
     db.session.delete(patient)
     db.session.delete(patient.user)
     db.session.commit()
@@ -65,5 +68,6 @@ def deactivate_patient(id):
 @admin_required
 def patient_history(id):
     patient = Patient.query.get_or_404(id)
-    appointments = Appointment.query.filter_by(patient_id=patient.id).order_by(Appointment.date.desc()).all()
+    appointments = keyset_paginate(view_query('admin.patient_history').filter_by(patient_id=patient.id),
+                                   HISTORY_KEY, descending=True)
     return render_template('admin/patient_history.html', patient=patient, appointments=appointments)
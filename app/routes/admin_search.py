@@ -2,9 +2,9 @@ from flask import Blueprint, render_template, flash, redirect, url_for
 from flask_login import login_required
 from app.decorators import admin_required
 from app.models.user import User
-from app.models.doctor import Doctor
-from app.models.patient import Patient
 from app.forms.admin_forms import SearchForm
+from app.utils.queries import view_query
+from app.utils.search import search_doctors, search_patients
 from app import db
 
 admin_search_bp = Blueprint('admin_search', __name__)
@@ -21,14 +21,10 @@ def search():
         search_type = form.search_type.data
         
         if search_type in ['all', 'doctors']:
-            results['doctors'] = Doctor.query.filter(
-                (Doctor.name.ilike(f'%{query}%')) | (Doctor.specialization.ilike(f'%{query}%'))
-            ).all()
+            results['doctors'] = search_doctors(view_query('admin.doctors'), query).all()
         
         if search_type in ['all', 'patients']:
-            results['patients'] = Patient.query.filter(
-                (Patient.name.ilike(f'%{query}%')) | (Patient.phone.ilike(f'%{query}%'))
-            ).all()
+            results['patients'] = search_patients(view_query('admin.patients'), query).all()
     
     return render_template('admin/search.html', form=form, results=results)
 
@@ -0,0 +1,215 @@
+from datetime import date, time, datetime
+from flask import Blueprint, current_app, g, jsonify, request
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.exceptions import HTTPException
+from app import db
+from app.models.user import User
+from app.models.doctor import Doctor
+from app.models.appointment import Appointment
+from app.models.treatment import Treatment
+from app.utils.api import ApiError, api_auth, issue_token, appointment_json, slot_days_json
+from app.utils.booking import book_slot, reschedule_slot, SlotUnavailable, StaleAppointment
+from app.utils.metrics import metrics
+from app.utils.pagination import keyset_paginate
+from app.utils.queries import view_query, APPOINTMENT_KEY
+from app.utils.schedule import available_at
+from app.utils.slots import free_slots, ACTIVE_STATUSES, STATUSES
+
+api_v1_bp = Blueprint('api_v1', __name__)
+
+@api_v1_bp.errorhandler(ApiError)
+def api_error(error):
+    return jsonify(error.to_json()), error.status
+
+@api_v1_bp.errorhandler(HTTPException)
+def http_error(error):
+    return jsonify(error=error.description), error.code
+
+@api_v1_bp.errorhandler(StaleDataError)
+def stale_error(error):
+    db.session.rollback()
+    return jsonify(error='This appointment was changed by someone else. Reload it and try again.'), 409
+
+def _body(*required):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        raise ApiError(400, 'Expected a JSON object.')
+    missing = {name: 'This field is required.' for name in required if body.get(name) in (None, '')}
+    if missing:
+        raise ApiError(400, 'Some fields are missing.', missing)
+    return body
+
+def _parse(body, name, parse):
+    try:
+        return parse(body[name])
+    except (TypeError, ValueError):
+        raise ApiError(400, 'Some fields are invalid.', {name: 'Invalid value.'})
+
+def _text(body, name, default=None):
+    # Free-text fields are stored as given, so anything but a string (or null) is refused rather than coerced
+    value = body.get(name, default)
+    if value is not None and not isinstance(value, str):
+        raise ApiError(400, 'Some fields are invalid.', {name: 'Must be a string.'})
+    return value
+
+def _filter_arg(name, parse, message='Invalid value.'):
+    # A filter that doesn't parse must not silently turn into an unfiltered list
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return parse(value)
+    except ValueError:
+        raise ApiError(400, 'Some filters are invalid.', {name: message})
+
+def _statuses(value):
+    statuses = value.split(',')
+    if not set(statuses) <= set(STATUSES):
+        raise ValueError(value)
+    return statuses
+
+def _bookable(doctor_id, day, at_time):
+    """Same checks as the booking form, without WTForms"""
+    doctor = db.session.get(Doctor, doctor_id)
+    if doctor is None or not doctor.user.is_active:
+        raise ApiError(404, 'This doctor is currently unavailable for appointments.')
+    if datetime.combine(day, at_time) < datetime.now():
+        raise ApiError(400, 'Appointment must be scheduled for a future time.', {'time': 'Must be in the future.'})
+    if not available_at(doctor_id, day, at_time):
+        raise ApiError(409, 'The doctor is not available at this time.')
+
+def _own_appointment(id):
+    appointment = view_query('api.appointments').filter(Appointment.id == id).first()
+    owner = appointment and (appointment.patient_id if g.api_user.role == 'patient' else appointment.doctor_id)
+    if appointment is None or owner != g.api_profile.id:
+        raise ApiError(404, 'Appointment not found.')
+    return appointment
+
+@api_v1_bp.route('/tokens', methods=['POST'])
+def create_token():
+    body = _body('email', 'password')
+    user = User.query.filter_by(email=str(body['email'])).first()
+    if user is None or not user.check_password(str(body['password'])):
+        metrics.inc('hospital_logins_total', outcome='bad_credentials')
+        raise ApiError(401, 'Invalid email or password.')
+    if not user.is_active:
+        metrics.inc('hospital_logins_total', outcome='inactive')
+        raise ApiError(403, 'This account has been deactivated.')
+    metrics.inc('hospital_logins_total', outcome='success')
+    return jsonify(token=issue_token(user), expires_in=current_app.config['API_TOKEN_MAX_AGE'],
+                   user={'id': user.id, 'role': user.role}), 201
+
+@api_v1_bp.route('/appointments')
+@api_auth('patient', 'doctor')
+def list_appointments():
+    owner = Appointment.patient_id if g.api_user.role == 'patient' else Appointment.doctor_id
+    query = view_query('api.appointments').filter(owner == g.api_profile.id)
+    statuses = _filter_arg('status', _statuses, f'Must be a comma-separated list of {", ".join(STATUSES)}.')
+    start = _filter_arg('from', date.fromisoformat)
+    end = _filter_arg('to', date.fromisoformat)
+    if statuses:
+        query = query.filter(Appointment.status.in_(statuses))
+    if start:
+        query = query.filter(Appointment.date >= start)
+    if end:
+        query = query.filter(Appointment.date <= end)
+
+    page = keyset_paginate(query, APPOINTMENT_KEY, descending=request.args.get('order') == 'desc')
+    return jsonify(appointments=[appointment_json(a) for a in page], next=page.next_cursor, prev=page.prev_cursor)
+
+@api_v1_bp.route('/appointments/<int:id>')
+@api_auth('patient', 'doctor')
+def get_appointment(id):
+    return jsonify(appointment_json(_own_appointment(id)))
+
+@api_v1_bp.route('/doctors/<int:id>/slots')
+@api_auth('patient')
+def doctor_slots(id):
+    doctor = db.session.get(Doctor, id)
+    if doctor is None or not doctor.user.is_active:
+        raise ApiError(404, 'This doctor is currently unavailable.')
+    start = max(request.args.get('start', date.today(), type=date.fromisoformat), date.today())
+    days = max(1, min(request.args.get('days', 7, type=int), current_app.config['MAX_SLOT_DAYS']))
+    interval = current_app.config['SLOT_INTERVAL_MINUTES']
+    slots = free_slots(doctor.id, start, days, interval, g.api_profile.id)
+    return jsonify(doctor_id=doctor.id, interval_minutes=interval, days=slot_days_json(slots, interval))
+
+@api_v1_bp.route('/appointments', methods=['POST'])
+@api_auth('patient')
+def book_appointment():
+    body = _body('doctor_id', 'date', 'time')
+    doctor_id = _parse(body, 'doctor_id', int)
+    day = _parse(body, 'date', date.fromisoformat)
+    at_time = _parse(body, 'time', time.fromisoformat)
+    notes = _text(body, 'notes')
+    _bookable(doctor_id, day, at_time)
+
+    try:
+        appointment = book_slot(doctor_id, g.api_profile.id, day, at_time, notes)
+    except SlotUnavailable:
+        raise ApiError(409, 'This time slot is no longer available.')
+    return jsonify(appointment_json(_own_appointment(appointment.id))), 201
+
+@api_v1_bp.route('/appointments/<int:id>/reschedule', methods=['POST'])
+@api_auth('patient')
+def reschedule_appointment(id):
+    appointment = _own_appointment(id)
+    body = _body('date', 'time', 'version')
+    day = _parse(body, 'date', date.fromisoformat)
+    at_time = _parse(body, 'time', time.fromisoformat)
+    version = _parse(body, 'version', int)
+    notes = _text(body, 'notes', appointment.notes)
+    if appointment.date < date.today() or appointment.status not in ACTIVE_STATUSES:
+        raise ApiError(409, 'This appointment can no longer be rescheduled.')
+    _bookable(appointment.doctor_id, day, at_time)
+
+    try:
+        reschedule_slot(appointment.id, version, day, at_time, notes)
+    except SlotUnavailable:
+        raise ApiError(409, 'This time slot is already booked.')
+    except StaleAppointment:
+        raise ApiError(409, 'This appointment was changed by someone else. Reload it and try again.')
+    return jsonify(appointment_json(_own_appointment(id)))
+
+@api_v1_bp.route('/appointments/<int:id>/cancel', methods=['POST'])
+@api_auth('patient', 'doctor')
+def cancel_appointment(id):
+    appointment = _own_appointment(id)
+    if appointment.status not in ACTIVE_STATUSES:
+        raise ApiError(409, 'Only booked appointments can be cancelled.')
+    if g.api_user.role == 'patient' and appointment.date < date.today():
+        raise ApiError(409, 'Cannot cancel past appointments.')
+
+    appointment.status = 'cancelled'
+    db.session.commit()
+    metrics.inc('hospital_appointment_cancellations_total', by=g.api_user.role)
+    return jsonify(appointment_json(appointment))
+
+@api_v1_bp.route('/appointments/<int:id>/complete', methods=['POST'])
+@api_auth('doctor')
+def complete_appointment(id):
+    appointment = _own_appointment(id)
+    if appointment.status not in ACTIVE_STATUSES + ('completed',):
+        raise ApiError(409, 'Only booked appointments can be completed.')
+    if appointment.status != 'completed':
+        appointment.status = 'completed'
+        db.session.commit()
+        metrics.inc('hospital_appointments_completed_total')
+    return jsonify(appointment_json(appointment))
+
+@api_v1_bp.route('/appointments/<int:id>/treatment', methods=['POST'])
+@api_auth('doctor')
+def add_treatment(id):
+    appointment = _own_appointment(id)
+    if appointment.treatment:
+        raise ApiError(409, 'Treatment record already exists for this appointment.')
+    body = _body('diagnosis')
+    diagnosis, prescription, notes = _text(body, 'diagnosis'), _text(body, 'prescription'), _text(body, 'notes')
+
+    newly_completed = appointment.status != 'completed'
+    appointment.treatment = Treatment(diagnosis=diagnosis, prescription=prescription, notes=notes)
+    appointment.status = 'completed'
+    db.session.commit()
+    if newly_completed:
+        metrics.inc('hospital_appointments_completed_total')
+    return jsonify(appointment_json(appointment)), 201
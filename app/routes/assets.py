@@ -0,0 +1,24 @@
+import mimetypes
+from flask import Blueprint, abort, current_app, request, send_from_directory
+from app.utils.assets import preferred_variant
+
+assets_bp = Blueprint('assets', __name__)
+
+ONE_YEAR = 365 * 24 * 3600
+
+@assets_bp.route('/assets/<path:filename>')
+def serve(filename):
+    # Only fingerprinted names are served here; their content never changes under the same URL
+    if filename not in current_app.extensions['asset_manifest'].values():
+        abort(404)
+    
+    directory = current_app.config['ASSETS_BUILD_DIR']
+    variant, encoding = preferred_variant(directory, filename, request.accept_encodings)
+    response = send_from_directory(directory, variant, mimetype=mimetypes.guess_type(filename)[0],
+                                   max_age=ONE_YEAR, conditional=True, etag=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
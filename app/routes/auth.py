@@ -4,6 +4,7 @@ from app import db
 from app.models.user import User
 from app.models.patient import Patient
 from app.forms.auth_forms import LoginForm, PatientRegistrationForm
+from app.utils.metrics import metrics
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -17,15 +18,22 @@ def login():
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
             if not user.is_active:
+                metrics.inc('hospital_logins_total', outcome='inactive')
                 flash('Your account has been deactivated. Please contact admin.', 'danger')
                 return redirect(url_for('auth.login'))
+            # Upgrade hashes made with an older method or cost while we have the plaintext
+            if user.password_needs_rehash():
+                user.set_password(form.password.data)
+                db.session.commit()
             login_user(user)
+            metrics.inc('hospital_logins_total', outcome='success')
             flash(f'Welcome back, {user.email}!', 'success')
             next_page = request.args.get('next')
             if next_page:
                 return redirect(next_page)
             return redirect(url_for(f'{user.role}_dashboard.index'))
         else:
+            metrics.inc('hospital_logins_total', outcome='bad_credentials')
             flash('Invalid email or password.', 'danger')
     return render_template('auth/login.html', form=form)
 
@@ -1,11 +1,15 @@
 from flask import Blueprint, render_template, redirect, url_for, flash
-from flask_login import login_required, current_user
-from app.decorators import doctor_required
-from app.models.doctor import Doctor
+from flask_login import login_required
+from app.decorators import doctor_required, current_profile
 from app.models.appointment import Appointment
 from app.models.treatment import Treatment
+from app.models.history import TreatmentHistory
 from app.models.patient import Patient
 from app.forms.doctor_forms import TreatmentForm
+from app.utils.queries import view_query, APPOINTMENT_KEY, HISTORY_KEY
+from app.utils.pagination import keyset_paginate
+from app.utils.booking import commit_appointment, StaleAppointment
+from app.utils.metrics import metrics
 from app import db
 
 doctor_appointments_bp = Blueprint('doctor_appointments', __name__)
@@ -14,10 +18,9 @@ doctor_appointments_bp = Blueprint('doctor_appointments', __name__)
 @login_required
 @doctor_required
 def list_appointments():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
-    appointments = Appointment.query.filter_by(doctor_id=doctor.id).order_by(
-        Appointment.date.desc(), Appointment.time.desc()
-    ).all()
+    doctor = current_profile()
+    appointments = keyset_paginate(view_query('doctor.appointments').filter_by(doctor_id=doctor.id),
+                                   APPOINTMENT_KEY, descending=True)
     return render_template('doctor/appointments.html', appointments=appointments, doctor=doctor)
 
 @doctor_appointments_bp.route('/appointments/<int:id>/complete', methods=['POST'])
@@ -25,14 +28,21 @@ def list_appointments():
 @doctor_required
 def complete_appointment(id):
     appointment = Appointment.query.get_or_404(id)
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    doctor = current_profile()
     
     if appointment.doctor_id != doctor.id:
         flash('Unauthorized access.', 'danger')
     else:
+        newly_completed = appointment.status != 'completed'
         appointment.status = 'completed'
-        db.session.commit()
-        flash('Appointment marked as completed.', 'success')
+        try:
+            commit_appointment()
+        except StaleAppointment:
+            flash('This appointment was changed while you were viewing it. Please review it and try again.', 'warning')
+        else:
+            if newly_completed:
+                metrics.inc('hospital_appointments_completed_total')
+            flash('Appointment marked as completed.', 'success')
     
     return redirect(url_for('doctor_appointments.list_appointments'))
 
@@ -41,14 +51,19 @@ def complete_appointment(id):
 @doctor_required
 def cancel_appointment(id):
     appointment = Appointment.query.get_or_404(id)
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    doctor = current_profile()
     
     if appointment.doctor_id != doctor.id:
         flash('Unauthorized access.', 'danger')
     else:
         appointment.status = 'cancelled'
-        db.session.commit()
-        flash('Appointment cancelled.', 'info')
+        try:
+            commit_appointment()
+        except StaleAppointment:
+            flash('This appointment was changed while you were viewing it. Please review it and try again.', 'warning')
+        else:
+            metrics.inc('hospital_appointment_cancellations_total', by='doctor')
+            flash('Appointment cancelled.', 'info')
     
     return redirect(url_for('doctor_appointments.list_appointments'))
 
@@ -57,7 +72,7 @@ def cancel_appointment(id):
 @doctor_required
 def add_treatment(id):
     appointment = Appointment.query.get_or_404(id)
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    doctor = current_profile()
     
     if appointment.doctor_id != doctor.id:
         flash('Unauthorized access.', 'danger')
@@ -73,9 +88,16 @@ def add_treatment(id):
             appointment_id=appointment.id, diagnosis=form.diagnosis.data,
             prescription=form.prescription.data, notes=form.notes.data
         )
+        newly_completed = appointment.status != 'completed'
         appointment.status = 'completed'
         db.session.add(treatment)
-        db.session.commit()
+        try:
+            commit_appointment()
+        except StaleAppointment:
+            flash('This appointment was changed while you were viewing it. Please review it and try again.', 'warning')
+            return redirect(url_for('doctor_appointments.list_appointments'))
+        if newly_completed:
+            metrics.inc('hospital_appointments_completed_total')
         flash('Treatment record added successfully!', 'success')
         return redirect(url_for('doctor_appointments.list_appointments'))
     
@@ -85,8 +107,8 @@ def add_treatment(id):
 @login_required
 @doctor_required
 def view_treatment(id):
-    treatment = Treatment.query.get_or_404(id)
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    treatment = view_query('treatment_view').filter(TreatmentHistory.id == id).first_or_404()
+    doctor = current_profile()
     
     if treatment.appointment.doctor_id != doctor.id:
         flash('Unauthorized access.', 'danger')
@@ -99,7 +121,7 @@ def view_treatment(id):
 @doctor_required
 def edit_treatment(id):
     treatment = Treatment.query.get_or_404(id)
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    doctor = current_profile()
     
     if treatment.appointment.doctor_id != doctor.id:
         flash('Unauthorized access.', 'danger')
@@ -121,7 +143,7 @@ def edit_treatment(id):
 @doctor_required
 def edit_appointment_treatment(id):
     appointment = Appointment.query.get_or_404(id)
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    doctor = current_profile()
     
     if appointment.doctor_id != doctor.id:
         flash('Unauthorized access.', 'danger')
@@ -138,8 +160,8 @@ def edit_appointment_treatment(id):
 @doctor_required
 def patient_history(id):
     patient = Patient.query.get_or_404(id)
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
-    appointments = Appointment.query.filter_by(
+    doctor = current_profile()
+    appointments = keyset_paginate(view_query('doctor.patient_history').filter_by(
         patient_id=patient.id, doctor_id=doctor.id
-    ).order_by(Appointment.date.desc()).all()
+    ), HISTORY_KEY, descending=True)
     return render_template('doctor/patient_history.html', patient=patient, appointments=appointments)
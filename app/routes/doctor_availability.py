@@ -1,11 +1,13 @@
 from flask import Blueprint, render_template, redirect, url_for, flash
-from flask_login import login_required, current_user
-from app.decorators import doctor_required
-from app.models.doctor import Doctor
+from flask_login import login_required
+from app.decorators import doctor_required, current_profile
 from app.models.availability import Availability
-from app.forms.doctor_forms import AvailabilityForm
+from app.models.availability_exception import AvailabilityException
+from app.forms.doctor_forms import AvailabilityForm, AvailabilityExceptionForm
 from app.utils.helpers import get_day_name
+from app.utils.schedule import set_weekday_intervals, merge_intervals, subtract_interval
 from app import db
+from datetime import date
 
 doctor_availability_bp = Blueprint('doctor_availability', __name__)
 
@@ -13,9 +15,9 @@ doctor_availability_bp = Blueprint('doctor_availability', __name__)
 @login_required
 @doctor_required
 def view_availability():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    doctor = current_profile()
     availability_records = Availability.query.filter_by(doctor_id=doctor.id).order_by(
-        Availability.day_of_week
+        Availability.day_of_week, Availability.start_time
     ).all()
     
     weekly_schedule = {}
@@ -25,23 +27,37 @@ def view_availability():
             weekly_schedule[day] = []
         weekly_schedule[day].append(record)
     
+    exceptions = AvailabilityException.query.filter(
+        AvailabilityException.doctor_id == doctor.id,
+        AvailabilityException.date >= date.today()
+    ).order_by(AvailabilityException.date, AvailabilityException.start_time).all()
+    
     return render_template('doctor/availability.html',
-                         doctor=doctor, weekly_schedule=weekly_schedule, get_day_name=get_day_name)
+                         doctor=doctor, weekly_schedule=weekly_schedule, exceptions=exceptions,
+                         get_day_name=get_day_name)
 
 @doctor_availability_bp.route('/availability/add', methods=['GET', 'POST'])
 @login_required
 @doctor_required
 def add_availability():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    doctor = current_profile()
     form = AvailabilityForm()
     
     if form.validate_on_submit():
-        availability = Availability(
-            doctor_id=doctor.id, day_of_week=form.day_of_week.data,
-            start_time=form.start_time.data, end_time=form.end_time.data,
-            is_available=form.is_available.data
-        )
-        db.session.add(availability)
+        start, end = form.start_time.data, form.end_time.data
+        if end <= start:
+            flash('End time must be after start time.', 'danger')
+            return render_template('doctor/availability_form.html', form=form)
+        
+        # Keep each weekday as merged, non-overlapping intervals
+        intervals = [(r.start_time, r.end_time) for r in Availability.query.filter_by(
+            doctor_id=doctor.id, day_of_week=form.day_of_week.data, is_available=True
+        )]
+        if form.is_available.data:
+            intervals = merge_intervals(intervals + [(start, end)])
+        else:
+            intervals = subtract_interval(merge_intervals(intervals), start, end)
+        set_weekday_intervals(doctor.id, form.day_of_week.data, intervals)
         db.session.commit()
         flash('Availability updated successfully!', 'success')
         return redirect(url_for('doctor_availability.view_availability'))
@@ -53,7 +69,7 @@ def add_availability():
 @doctor_required
 def delete_availability(id):
     availability = Availability.query.get_or_404(id)
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    doctor = current_profile()
     
     if availability.doctor_id != doctor.id:
         flash('Unauthorized access.', 'danger')
@@ -63,3 +79,46 @@ def delete_availability(id):
         flash('Availability slot removed.', 'info')
     
     return redirect(url_for('doctor_availability.view_availability'))
+
+@doctor_availability_bp.route('/availability/exceptions/add', methods=['GET', 'POST'])
+@login_required
+@doctor_required
+def add_exception():
+    doctor = current_profile()
+    form = AvailabilityExceptionForm()
+    
+    if form.validate_on_submit():
+        start, end = form.start_time.data, form.end_time.data
+        if bool(start) != bool(end) or (start and end <= start):
+            flash('Give both a start and an end time (end after start), or neither for the whole day.', 'danger')
+            return render_template('doctor/availability_exception_form.html', form=form)
+        if form.is_available.data and not start:
+            flash('Extra opening hours need a start and end time.', 'danger')
+            return render_template('doctor/availability_exception_form.html', form=form)
+        
+        exception = AvailabilityException(
+            doctor_id=doctor.id, date=form.date.data, start_time=start, end_time=end,
+            is_available=form.is_available.data, reason=form.reason.data or None
+        )
+        db.session.add(exception)
+        db.session.commit()
+        flash('Schedule exception added.', 'success')
+        return redirect(url_for('doctor_availability.view_availability'))
+    
+    return render_template('doctor/availability_exception_form.html', form=form)
+
+@doctor_availability_bp.route('/availability/exceptions/<int:id>/delete', methods=['POST'])
+@login_required
+@doctor_required
+def delete_exception(id):
+    exception = AvailabilityException.query.get_or_404(id)
+    doctor = current_profile()
+    
+    if exception.doctor_id != doctor.id:
+        flash('Unauthorized access.', 'danger')
+    else:
+        db.session.delete(exception)
+        db.session.commit()
+        flash('Schedule exception removed.', 'info')
+    
+    return redirect(url_for('doctor_availability.view_availability'))
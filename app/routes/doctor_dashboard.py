@@ -1,8 +1,9 @@
 from flask import Blueprint, render_template
-from flask_login import login_required, current_user
-from app.decorators import doctor_required
-from app.models.doctor import Doctor
+from flask_login import login_required
+from app.decorators import doctor_required, current_profile
 from app.models.appointment import Appointment
+from app.utils.queries import view_query
+from app.utils.counters import get_counters, status_count
 from datetime import date
 
 doctor_dashboard_bp = Blueprint('doctor_dashboard', __name__)
@@ -11,9 +12,9 @@ doctor_dashboard_bp = Blueprint('doctor_dashboard', __name__)
 @login_required
 @doctor_required
 def index():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first_or_404()
+    doctor = current_profile()
     
-    upcoming_appointments = Appointment.query.filter(
+    upcoming_appointments = view_query('doctor.appointments').filter(
         Appointment.doctor_id == doctor.id,
         Appointment.date >= date.today(),
         Appointment.status.in_(['booked', 'rescheduled'])
@@ -21,13 +22,11 @@ def index():
     
     today_appointments = [apt for apt in upcoming_appointments if apt.date == date.today()]
     
+    counters = get_counters('doctor', doctor.id)
     stats = {
-        'total_appointments': Appointment.query.filter_by(doctor_id=doctor.id).count(),
-        'completed': Appointment.query.filter_by(doctor_id=doctor.id, status='completed').count(),
-        'pending': Appointment.query.filter(
-            Appointment.doctor_id == doctor.id,
-            Appointment.status.in_(['booked', 'rescheduled'])
-        ).count()
+        'total_appointments': counters.get('appointments', 0),
+        'completed': status_count(counters, 'completed'),
+        'pending': status_count(counters, 'booked', 'rescheduled')
     }
     
     return render_template('doctor/dashboard.html',
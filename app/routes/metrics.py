@@ -0,0 +1,26 @@
+import hmac
+from flask import Blueprint, Response, abort, current_app, request
+from flask_login import current_user
+from app import db
+from app.utils.metrics import metrics, collect, render
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def _authorized():
+    token = current_app.config['METRICS_TOKEN']
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[7:], token):
+        return True
+    return current_user.is_authenticated and current_user.role == 'admin' and current_user.is_active
+
+@metrics_bp.route('/metrics')
+def export():
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    if not _authorized():
+        abort(403)
+    
+    # Publish this process's latest numbers before merging every worker's snapshot
+    directory = current_app.config['METRICS_DIR']
+    metrics.flush(directory, db.engine.pool, force=True)
+    return Response(render(collect(directory)), mimetype='text/plain; version=0.0.4')
@@ -1,22 +1,30 @@
-from flask import Blueprint, render_template, redirect, url_for, flash
-from flask_login import login_required, current_user
-from app.decorators import patient_required
-from app.models.patient import Patient
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask_login import login_required
+from app.decorators import patient_required, current_profile
 from app.models.doctor import Doctor
 from app.models.appointment import Appointment
-from app.models.availability import Availability
+from app.models.history import AppointmentHistory, TreatmentHistory
 from app.forms.patient_forms import AppointmentBookingForm, AppointmentRescheduleForm
-from app.utils.helpers import get_next_7_days, generate_time_slots
+from app.utils.helpers import get_next_7_days
+from app.utils.slots import free_slots, free_slot_schedule, slot_times, slot_is_free
+from app.utils.schedule import resolve_availability
+from app.utils.booking import book_slot, reschedule_slot, commit_appointment, SlotUnavailable, StaleAppointment
+from app.utils.holds import place_hold
+from app.utils.metrics import metrics
+from app.utils.page_cache import cached_page
+from app.utils.queries import view_query, APPOINTMENT_KEY
+from app.utils.pagination import keyset_paginate
 from app import db
-from datetime import date
+from datetime import date, time
 
 patient_appointments_bp = Blueprint('patient_appointments', __name__)
 
 @patient_appointments_bp.route('/doctors/<int:id>')
 @login_required
 @patient_required
+@cached_page('doctors', 'departments', 'availability')
 def doctor_detail(id):
-    doctor = Doctor.query.get_or_404(id)
+    doctor = view_query('doctor_detail').filter(Doctor.id == id).first_or_404()
     
     # Check if doctor is active
     if not doctor.user.is_active:
@@ -24,15 +32,30 @@ def doctor_detail(id):
         return redirect(url_for('patient_dashboard.list_doctors'))
     
     next_days = get_next_7_days()
-    availability_schedule = {
-        day: Availability.query.filter_by(
-            doctor_id=doctor.id, day_of_week=day.weekday(), is_available=True
-        ).all() for day in next_days
-    }
+    availability_schedule = resolve_availability(doctor.id, next_days[0], len(next_days))
     
     return render_template('patient/doctor_detail.html',
                          doctor=doctor, availability_schedule=availability_schedule, next_days=next_days)
 
+@patient_appointments_bp.route('/doctors/<int:id>/slots')
+@login_required
+@patient_required
+def doctor_slots(id):
+    doctor = Doctor.query.get_or_404(id)
+    if not doctor.user.is_active:
+        return jsonify(error='This doctor is currently unavailable.'), 404
+    
+    patient = current_profile()
+    start = max(request.args.get('start', date.today(), type=date.fromisoformat), date.today())
+    days = max(1, min(request.args.get('days', 7, type=int), current_app.config['MAX_SLOT_DAYS']))
+    interval = current_app.config['SLOT_INTERVAL_MINUTES']
+    
+    return jsonify(doctor_id=doctor.id, interval_minutes=interval, days=[
+        {'date': day.isoformat(), 'bitmap': bitmap,
+         'slots': [t.strftime('%H:%M') for t in slot_times(bitmap, interval)]}
+        for day, bitmap in free_slots(doctor.id, start, days, interval, patient.id).items()
+    ])
+
 @patient_appointments_bp.route('/appointments/book/<int:doctor_id>', methods=['GET', 'POST'])
 @login_required
 @patient_required
@@ -44,62 +67,63 @@ def book_appointment(doctor_id):
         flash('This doctor is currently unavailable for appointments.', 'warning')
         return redirect(url_for('patient_dashboard.list_doctors'))
     
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
+    patient = current_profile()
     
     form = AppointmentBookingForm()
     form.doctor_id.choices = [(doctor.id, doctor.name)]
     form.doctor_id.data = doctor.id
+    form.patient_id = patient.id
     
     if form.validate_on_submit():
         if not doctor.user.is_active:
             flash('This doctor is no longer available for appointments.', 'danger')
             return redirect(url_for('patient_dashboard.list_doctors'))
         
-        # Check for appointment conflicts
-        existing_appointment = Appointment.query.filter_by(
-            doctor_id=doctor.id, date=form.date.data, time=form.time.data
-        ).filter(Appointment.status.in_(['booked', 'rescheduled'])).first()
-        
-        if existing_appointment:
-            flash('This time slot is already booked. Please choose another time.', 'danger')
-            return render_template('patient/book_appointment.html', form=form, doctor=doctor, time_slots=generate_time_slots())
-        
+        # Conflict check and insert run in one immediate write transaction
         try:
-            appointment = Appointment(
-                doctor_id=doctor.id, patient_id=patient.id,
-                date=form.date.data, time=form.time.data,
-                notes=form.notes.data, status='booked'
-            )
-            db.session.add(appointment)
-            db.session.commit()
+            book_slot(doctor.id, patient.id, form.date.data, form.time.data, form.notes.data)
             flash('Appointment booked successfully!', 'success')
             return redirect(url_for('patient_appointments.my_appointments'))
-        except Exception as e:
-            db.session.rollback()
+        except SlotUnavailable:
             flash('This time slot is no longer available. Please choose another time.', 'danger')
-            return render_template('patient/book_appointment.html', form=form, doctor=doctor, time_slots=generate_time_slots())
+            return render_template('patient/book_appointment.html', form=form, doctor=doctor,
+                                 free_slots=free_slot_schedule(doctor.id, patient_id=patient.id))
+    
+    slots = free_slots(doctor.id, patient_id=patient.id)
+    
+    # Opening the form for a specific slot holds it for this patient until they submit
+    hold_date = request.args.get('date', type=date.fromisoformat)
+    hold_time = request.args.get('time', type=time.fromisoformat)
+    if not form.is_submitted() and hold_date and hold_time:
+        if slot_is_free(slots, hold_date, hold_time) and place_hold(doctor.id, patient.id, hold_date, hold_time):
+            form.date.data = hold_date
+            form.time.data = hold_time
+            flash(f'This slot is held for you for {current_app.config["SLOT_HOLD_MINUTES"]} minutes.', 'info')
+        else:
+            flash('That slot was just taken. Please choose another time.', 'warning')
+            slots = free_slots(doctor.id, patient_id=patient.id)
     
     return render_template('patient/book_appointment.html',
-                         form=form, doctor=doctor, time_slots=generate_time_slots())
+                         form=form, doctor=doctor, free_slots=free_slot_schedule(doctor.id, slots=slots))
 
 @patient_appointments_bp.route('/appointments')
 @login_required
 @patient_required
 def my_appointments():
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
+    patient = current_profile()
     
-    upcoming = Appointment.query.filter(
+    upcoming = keyset_paginate(view_query('patient.appointments').filter(
         Appointment.patient_id == patient.id,
         Appointment.date >= date.today(),
         Appointment.status.in_(['booked', 'rescheduled'])
-    ).order_by(Appointment.date, Appointment.time).all()
+    ), APPOINTMENT_KEY, prefix='upcoming_')
     
-    past = Appointment.query.filter(
+    past = keyset_paginate(view_query('patient.appointments').filter(
         Appointment.patient_id == patient.id
     ).filter(
         (Appointment.date < date.today()) |
         (Appointment.status.in_(['completed', 'cancelled']))
-    ).order_by(Appointment.date.desc(), Appointment.time.desc()).all()
+    ), APPOINTMENT_KEY, descending=True, prefix='past_')
     
     return render_template('patient/appointments.html', upcoming=upcoming, past=past)
 
@@ -108,7 +132,7 @@ def my_appointments():
 @patient_required
 def cancel_appointment(id):
     appointment = Appointment.query.get_or_404(id)
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
+    patient = current_profile()
     
     if appointment.patient_id != patient.id:
         flash('Unauthorized access.', 'danger')
@@ -116,8 +140,13 @@ def cancel_appointment(id):
         flash('Cannot cancel past appointments.', 'warning')
     else:
         appointment.status = 'cancelled'
-        db.session.commit()
-        flash('Appointment cancelled successfully.', 'info')
+        try:
+            commit_appointment()
+        except StaleAppointment:
+            flash('This appointment was changed while you were viewing it. Please review it and try again.', 'warning')
+        else:
+            metrics.inc('hospital_appointment_cancellations_total', by='patient')
+            flash('Appointment cancelled successfully.', 'info')
     
     return redirect(url_for('patient_appointments.my_appointments'))
 
@@ -126,7 +155,7 @@ def cancel_appointment(id):
 @patient_required
 def reschedule_appointment(id):
     appointment = Appointment.query.get_or_404(id)
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
+    patient = current_profile()
     
     if appointment.patient_id != patient.id:
         flash('Unauthorized access.', 'danger')
@@ -143,44 +172,36 @@ def reschedule_appointment(id):
     form = AppointmentRescheduleForm()
     form.doctor_id = appointment.doctor_id
     form.appointment_id = appointment.id
+    form.patient_id = patient.id
     
     # Only populate form with original data on GET request (initial load)
     if not form.is_submitted():
         form.date.data = appointment.date
         form.time.data = appointment.time
         form.notes.data = appointment.notes
+        form.version.data = appointment.version
     
     if form.validate_on_submit():
-        existing_appointment = Appointment.query.filter_by(
-            doctor_id=appointment.doctor_id, date=form.date.data, time=form.time.data
-        ).filter(Appointment.status.in_(['booked', 'rescheduled'])).filter(Appointment.id != appointment.id).first()
+        if form.version.data != appointment.version:
+            flash('This appointment was changed while you were editing it. Please review and try again.', 'warning')
+            return redirect(url_for('patient_appointments.reschedule_appointment', id=appointment.id))
         
-        if existing_appointment:
-            flash('This time slot is already booked. Please choose another time.', 'danger')
+        availability_slots = resolve_availability(appointment.doctor_id, form.date.data, 1)[form.date.data]
+        
+        if not availability_slots:
+            flash('Doctor is not available on this day.', 'danger')
+        elif not any(start <= form.time.data < end for start, end in availability_slots):
+            flash('Doctor is not available at this time. Please check the doctor\'s availability schedule.', 'danger')
         else:
-            day_of_week = form.date.data.weekday()
-            availability_slots = Availability.query.filter_by(
-                doctor_id=appointment.doctor_id, day_of_week=day_of_week, is_available=True
-            ).all()
-            
-            if not availability_slots:
-                flash('Doctor is not available on this day.', 'danger')
-            else:
-                is_within_slot = any(slot.start_time <= form.time.data < slot.end_time for slot in availability_slots)
-                if not is_within_slot:
-                    flash('Doctor is not available at this time. Please check the doctor\'s availability schedule.', 'danger')
-                else:
-                    try:
-                        appointment.date = form.date.data
-                        appointment.time = form.time.data
-                        appointment.notes = form.notes.data
-                        appointment.status = 'rescheduled'
-                        db.session.commit()
-                        flash('Appointment rescheduled successfully!', 'success')
-                        return redirect(url_for('patient_appointments.my_appointments'))
-                    except Exception as e:
-                        db.session.rollback()
-                        flash('This time slot is no longer available. Please choose another time.', 'danger')
+            try:
+                reschedule_slot(appointment.id, form.version.data, form.date.data, form.time.data, form.notes.data)
+                flash('Appointment rescheduled successfully!', 'success')
+                return redirect(url_for('patient_appointments.my_appointments'))
+            except SlotUnavailable:
+                flash('This time slot is already booked. Please choose another time.', 'danger')
+            except StaleAppointment:
+                flash('This appointment was changed while you were editing it. Please review and try again.', 'warning')
+                return redirect(url_for('patient_appointments.reschedule_appointment', id=appointment.id))
     else:
         # Debug: Show form errors if validation fails
         if form.is_submitted():
@@ -188,15 +209,15 @@ def reschedule_appointment(id):
                 for error in errors:
                     flash(f'{field}: {error}', 'danger')
     
-    return render_template('patient/reschedule_appointment.html', form=form, appointment=appointment, time_slots=generate_time_slots())
+    return render_template('patient/reschedule_appointment.html', form=form, appointment=appointment,
+                         free_slots=free_slot_schedule(appointment.doctor_id, patient_id=patient.id))
 
 @patient_appointments_bp.route('/treatments/<int:id>/view')
 @login_required
 @patient_required
 def view_treatment(id):
-    from app.models.treatment import Treatment
-    treatment = Treatment.query.get_or_404(id)
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
+    treatment = view_query('treatment_view').filter(TreatmentHistory.id == id).first_or_404()
+    patient = current_profile()
     
     # Check if this treatment belongs to the current patient
     if treatment.appointment.patient_id != patient.id:
@@ -210,7 +231,7 @@ def view_treatment(id):
 @patient_required
 def view_appointment_treatment(id):
     appointment = Appointment.query.get_or_404(id)
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
+    patient = current_profile()
     
     if appointment.patient_id != patient.id:
         flash('Unauthorized access.', 'danger')
@@ -226,13 +247,13 @@ def view_appointment_treatment(id):
 @login_required
 @patient_required
 def medical_history():
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
+    patient = current_profile()
     
-    # Get all appointments with treatments
-    appointments_with_treatments = Appointment.query.filter(
-        Appointment.patient_id == patient.id,
-        Appointment.treatment != None
-    ).order_by(Appointment.date.desc()).all()
+    # Get all appointments with treatments, archived ones included
+    appointments_with_treatments = view_query('patient.medical_history').filter(
+        AppointmentHistory.patient_id == patient.id,
+        AppointmentHistory.treatment_id != None
+    ).order_by(AppointmentHistory.date.desc()).all()
     
     return render_template('patient/medical_history.html', 
                          patient=patient, 
@@ -1,38 +1,46 @@
-from flask import Blueprint, render_template, request
-from flask_login import login_required, current_user
-from app.decorators import patient_required
-from app.models.patient import Patient
+from flask import Blueprint, render_template, request, jsonify, url_for, current_app
+from flask_login import login_required
+from app.decorators import patient_required, current_profile
 from app.models.department import Department
 from app.models.doctor import Doctor
 from app.models.user import User
 from app.models.appointment import Appointment
+from app.utils.queries import view_query
+from app.utils.counters import get_counters, status_count
+from app.utils.search import search_doctors
+from app.utils.typeahead import doctor_typeahead
+from app.utils.page_cache import cached_page, cached_value
+from app import db
+from sqlalchemy import func
 from datetime import date
 
 patient_dashboard_bp = Blueprint('patient_dashboard', __name__)
 
+def _department_listing():
+    # Active doctor count for each department (one grouped query for all of them)
+    active_counts = dict(db.session.query(Doctor.department_id, func.count(Doctor.id)).join(
+        User, Doctor.user_id == User.id
+    ).filter(User.is_active == True).group_by(Doctor.department_id).all())
+    return [{'id': dept.id, 'name': dept.name, 'description': dept.description,
+             'active_doctor_count': active_counts.get(dept.id, 0)} for dept in Department.query.all()]
+
 @patient_dashboard_bp.route('/dashboard')
 @login_required
 @patient_required
 def index():
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
-    departments = Department.query.all()
+    patient = current_profile()
+    departments = cached_value('patient.departments', ('departments', 'doctors'), _department_listing)
     
-    # Add active doctor count for each department
-    for dept in departments:
-        dept.active_doctor_count = Doctor.query.join(User, Doctor.user_id == User.id).filter(
-            Doctor.department_id == dept.id,
-            User.is_active == True
-        ).count()
-    
-    upcoming_appointments = Appointment.query.filter(
+    upcoming_appointments = view_query('patient.appointments').filter(
         Appointment.patient_id == patient.id,
         Appointment.date >= date.today(),
         Appointment.status.in_(['booked', 'rescheduled'])
     ).order_by(Appointment.date, Appointment.time).limit(5).all()
     
+    counters = get_counters('patient', patient.id)
     stats = {
-        'total_appointments': Appointment.query.filter_by(patient_id=patient.id).count(),
-        'completed': Appointment.query.filter_by(patient_id=patient.id, status='completed').count()
+        'total_appointments': counters.get('appointments', 0),
+        'completed': status_count(counters, 'completed')
     }
     
     return render_template('patient/dashboard.html',
@@ -42,22 +50,20 @@ def index():
 @patient_dashboard_bp.route('/doctors')
 @login_required
 @patient_required
+@cached_page('doctors', 'departments')
 def list_doctors():
     department_id = request.args.get('department', type=int)
     search_query = request.args.get('search', '').strip()
     
     # Only show active doctors
-    base_query = Doctor.query.join(User, Doctor.user_id == User.id).filter(User.is_active == True)
+    base_query = view_query('patient.doctors').join(User, Doctor.user_id == User.id).filter(User.is_active == True)
     
     if department_id:
         base_query = base_query.filter(Doctor.department_id == department_id)
     
     if search_query:
-        # Search by doctor name or specialization
-        base_query = base_query.filter(
-            (Doctor.name.ilike(f'%{search_query}%')) |
-            (Doctor.specialization.ilike(f'%{search_query}%'))
-        )
+        # Search by doctor name or specialization, best matches first
+        base_query = search_doctors(base_query, search_query)
     
     doctors = base_query.all()
     departments = Department.query.all()
@@ -65,3 +71,23 @@ def list_doctors():
     return render_template('patient/doctors.html',
                          doctors=doctors, departments=departments, 
                          selected_department=department_id, search_query=search_query)
+
+@patient_dashboard_bp.route('/doctors/suggest')
+@login_required
+@patient_required
+def suggest_doctors():
+    query = request.args.get('q', '').strip()[:100]
+    if not query:
+        return jsonify(results=[])
+    
+    results = []
+    for (kind, ref_id), label in doctor_typeahead.search(query, current_app.config['TYPEAHEAD_LIMIT']):
+        if kind == 'doctor':
+            url = url_for('patient_appointments.doctor_detail', id=ref_id)
+        elif kind == 'department':
+            url = url_for('patient_dashboard.list_doctors', department=ref_id)
+        else:
+            url = url_for('patient_dashboard.list_doctors', search=label)
+        results.append({'type': kind, 'label': label, 'url': url})
+    
+    return jsonify(results=results)
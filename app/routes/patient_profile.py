@@ -1,7 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash
-from flask_login import login_required, current_user
-from app.decorators import patient_required
-from app.models.patient import Patient
+from flask_login import login_required
+from app.decorators import patient_required, current_profile
 from app.forms.patient_forms import ProfileUpdateForm
 from app import db
 
@@ -11,14 +10,14 @@ patient_profile_bp = Blueprint('patient_profile', __name__)
 @login_required
 @patient_required
 def view_profile():
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
+    patient = current_profile()
     return render_template('patient/profile.html', patient=patient)
 
 @patient_profile_bp.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
 @patient_required
 def edit_profile():
-    patient = Patient.query.filter_by(user_id=current_user.id).first_or_404()
+    patient = current_profile()
     form = ProfileUpdateForm(obj=patient)
     
     if form.validate_on_submit():
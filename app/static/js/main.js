@@ -20,4 +20,56 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
     });
+    
+    // Slot picker buttons fill in the booking form's date and time
+    const slotButtons = document.querySelectorAll('[data-slot-date]');
+    slotButtons.forEach(button => {
+        button.addEventListener('click', function() {
+            document.getElementById('date').value = this.dataset.slotDate;
+            document.getElementById('time').value = this.dataset.slotTime;
+            slotButtons.forEach(b => b.classList.replace('btn-success', 'btn-outline-success'));
+            this.classList.replace('btn-outline-success', 'btn-success');
+        });
+    });
+    
+    // As-you-type suggestions for inputs with a data-typeahead-url
+    const typeaheadInputs = document.querySelectorAll('[data-typeahead-url]');
+    typeaheadInputs.forEach(input => {
+        const menu = document.createElement('div');
+        menu.className = 'list-group position-absolute w-100 shadow-sm typeahead-menu';
+        input.parentNode.appendChild(menu);
+        let timer = null;
+        let latest = 0;
+        
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = this.value.trim();
+            if (!query) {
+                menu.innerHTML = '';
+                return;
+            }
+            timer = setTimeout(() => {
+                const request = ++latest;
+                fetch(input.dataset.typeaheadUrl + '?q=' + encodeURIComponent(query))
+                    .then(response => response.json())
+                    .then(data => {
+                        if (request !== latest) return;
+                        menu.innerHTML = '';
+                        data.results.forEach(item => {
+                            const link = document.createElement('a');
+                            link.href = item.url;
+                            link.className = 'list-group-item list-group-item-action';
+                            link.textContent = item.label;
+                            const kind = document.createElement('small');
+                            kind.className = 'text-muted float-end';
+                            kind.textContent = item.type;
+                            link.appendChild(kind);
+                            menu.appendChild(link);
+                        });
+                    });
+            }, 150);
+        });
+        
+        input.addEventListener('blur', () => setTimeout(() => { menu.innerHTML = ''; }, 200));
+    });
 });
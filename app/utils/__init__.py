@@ -1,2 +1,3 @@
 from app.utils.validators import *
 from app.utils.helpers import *
+from app.utils.queries import *
@@ -0,0 +1,89 @@
+import hashlib
+import hmac
+from functools import wraps
+from flask import current_app, g, request
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from app.utils.identity import load_identity
+from app.utils.slots import slot_times
+
+class ApiError(Exception):
+    """An error response for the JSON API: ``{"error": message, "fields": {...}}``"""
+
+    def __init__(self, status, message, fields=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.fields = fields
+
+    def to_json(self):
+        body = {'error': self.message}
+        if self.fields:
+            body['fields'] = self.fields
+        return body
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='api-token')
+
+def _password_fingerprint(user):
+    # Tokens are signed, not encrypted, so they carry a keyed digest of the password hash rather than any of it
+    return hashlib.blake2b(user.password_hash.encode(), key=current_app.config['SECRET_KEY'].encode()[:64],
+                           digest_size=6).hexdigest()
+
+def issue_token(user):
+    # The fingerprint ties the token to the current password, so changing it
+    # (or a rehash on login) revokes every token issued before
+    return _serializer().dumps([user.id, _password_fingerprint(user)])
+
+def user_for_token(token):
+    """The active user a token was issued to, or None if it is invalid, expired or revoked"""
+    try:
+        user_id, fingerprint = _serializer().loads(token, max_age=current_app.config['API_TOKEN_MAX_AGE'])
+    except (BadSignature, SignatureExpired, ValueError, TypeError):
+        return None
+    user = load_identity(user_id)
+    if user is None or not user.is_active or not hmac.compare_digest(_password_fingerprint(user), str(fingerprint)):
+        return None
+    return user
+
+def api_auth(*roles):
+    """Require ``Authorization: Bearer <token>`` for one of ``roles``; sets ``g.api_user`` and ``g.api_profile``.
+
+    Session cookies are deliberately ignored, so a browser that is logged in
+    to the site cannot be used to make API calls on its user's behalf.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            header = request.headers.get('Authorization', '')
+            user = user_for_token(header[7:]) if header.startswith('Bearer ') else None
+            if user is None:
+                raise ApiError(401, 'A valid API token is required.')
+            if user.role not in roles:
+                raise ApiError(403, 'This token cannot use this endpoint.')
+            profile = getattr(user, user.role, None) if user.role in ('doctor', 'patient') else None
+            if user.role in ('doctor', 'patient') and profile is None:
+                raise ApiError(403, 'This account has no profile.')
+            g.api_user, g.api_profile = user, profile
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def _hhmm(value):
+    return value.strftime('%H:%M')
+
+def treatment_json(treatment):
+    return {'id': treatment.id, 'diagnosis': treatment.diagnosis, 'prescription': treatment.prescription,
+            'notes': treatment.notes}
+
+def appointment_json(appointment):
+    return {
+        'id': appointment.id, 'doctor': {'id': appointment.doctor_id, 'name': appointment.doctor.name},
+        'patient': {'id': appointment.patient_id, 'name': appointment.patient.name},
+        'date': appointment.date.isoformat(), 'time': _hhmm(appointment.time), 'status': appointment.status,
+        'notes': appointment.notes, 'version': appointment.version,
+        'treatment': treatment_json(appointment.treatment) if appointment.treatment else None,
+    }
+
+def slot_days_json(slots, interval):
+    return [{'date': day.isoformat(), 'slots': [_hhmm(t) for t in slot_times(bitmap, interval)]}
+            for day, bitmap in slots.items()]
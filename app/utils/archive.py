@@ -0,0 +1,154 @@
+from collections import Counter as Tally
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import delete, event, exists, func, insert, literal, select, tuple_
+from sqlalchemy.schema import CreateIndex, CreateTable
+from app import db
+from app.models.appointment import Appointment
+from app.models.treatment import Treatment
+from app.models.history import archived_appointments, archived_treatments
+from app.utils.counters import appointment_keys, apply_deltas
+
+ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+
+def register_archive_schema(engine):
+    """Create the archive tables on every new connection if the attached archive file lacks them"""
+    if engine.dialect.name != 'sqlite':
+        return
+    statements = []
+    for table in (archived_appointments, archived_treatments):
+        statements.append(str(CreateTable(table, if_not_exists=True).compile(dialect=engine.dialect)))
+        statements += [str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                       for index in table.indexes]
+
+    @event.listens_for(engine, 'connect')
+    def _create_archive_tables(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+def archive_cutoff(days=None):
+    """Appointments dated before this are old enough to archive"""
+    return date.today() - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'] if days is None else days)
+
+def _unchanged(live, archived):
+    # The archived copy matches the live row column for column, so deleting the live row loses nothing
+    return exists().where(*[archived.c[column.name].is_not_distinct_from(column) for column in live.c])
+
+def _candidates(cutoff, after, limit):
+    appointments, treatments = Appointment.__table__, Treatment.__table__
+    key = (appointments.c.date, appointments.c.time, appointments.c.id)
+    query = select(*key).outerjoin_from(
+        appointments, treatments, treatments.c.appointment_id == appointments.c.id
+    ).where(
+        appointments.c.date < cutoff, appointments.c.status.in_(ARCHIVABLE_STATUSES),
+        # SQLite gives new rows max(id) + 1, so keeping the newest row live means an
+        # archived id is never handed out again
+        appointments.c.id < select(func.max(appointments.c.id)).scalar_subquery(),
+        treatments.c.id.is_(None) | (treatments.c.id < select(func.max(treatments.c.id)).scalar_subquery()),
+    )
+    if after:
+        # Seek past the previous batch, including rows it skipped (e.g. edited mid-move)
+        query = query.where(tuple_(*key) > tuple_(*[literal(value, column.type) for value, column in zip(after, key)]))
+    return db.session.execute(query.order_by(*key).limit(limit)).all()
+
+def _move(ids):
+    """Copy a batch into the archive, then delete the live rows that were copied unchanged.
+
+    SQLite only commits a transaction atomically per file in WAL mode, so the
+    copy and the delete are separate transactions: a crash in between leaves
+    both copies (history shows the live one) and the next run finishes it.
+    """
+    appointments, treatments = Appointment.__table__, Treatment.__table__
+    db.session.execute(insert(archived_appointments).prefix_with('OR REPLACE').from_select(
+        [c.name for c in appointments.c], select(appointments).where(appointments.c.id.in_(ids))))
+    db.session.execute(insert(archived_treatments).prefix_with('OR REPLACE').from_select(
+        [c.name for c in treatments.c], select(treatments).where(treatments.c.appointment_id.in_(ids))))
+    db.session.commit()
+
+    # Anything edited since the copy fails the comparison, stays live and is picked up next run
+    db.session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+    db.session.execute(delete(treatments).where(
+        treatments.c.appointment_id.in_(ids), _unchanged(treatments, archived_treatments)))
+    moved = db.session.execute(delete(appointments).where(
+        appointments.c.id.in_(ids), _unchanged(appointments, archived_appointments),
+        ~exists().where(treatments.c.appointment_id == appointments.c.id),
+    )).rowcount
+    db.session.commit()
+    return moved
+
+def archive_appointments(cutoff=None, batch_size=None, progress=None):
+    """Move completed/cancelled appointments dated before ``cutoff``, with their treatments, to the archive.
+
+    Works in batches of ARCHIVE_BATCH_SIZE so no transaction holds the write
+    lock for long. Counters are untouched: they count archived appointments
+    too. Returns how many appointments were moved.
+    """
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    moved, after = 0, None
+    while True:
+        rows = _candidates(cutoff, after, batch_size)
+        if not rows:
+            db.session.commit()  # end the read so it doesn't pin an old snapshot
+            return moved
+        moved += _move([row.id for row in rows])
+        after = tuple(rows[-1])
+        if progress:
+            progress(moved)
+
+def purge_archived(doctor_id=None, patient_id=None):
+    """Delete a doctor's or patient's archived appointments and treatments (part of the caller's transaction)"""
+    column = archived_appointments.c.doctor_id if doctor_id is not None else archived_appointments.c.patient_id
+    owner = doctor_id if doctor_id is not None else patient_id
+    rows = db.session.execute(select(
+        archived_appointments.c.doctor_id, archived_appointments.c.patient_id, archived_appointments.c.status,
+        func.count()
+    ).where(column == owner).group_by(
+        archived_appointments.c.doctor_id, archived_appointments.c.patient_id, archived_appointments.c.status
+    )).all()
+    deltas = Tally()
+    for doctor, patient, status, count in rows:
+        for key in appointment_keys(doctor, patient, status):
+            deltas[key] -= count
+    apply_deltas(db.session.connection(), dict(deltas))
+
+    ids = select(archived_appointments.c.id).where(column == owner)
+    db.session.execute(delete(archived_treatments).where(archived_treatments.c.appointment_id.in_(ids)))
+    db.session.execute(delete(archived_appointments).where(column == owner))
+
+def maintain_database(full_vacuum=False):
+    """Refresh planner statistics and hand free pages in the hot database back to the filesystem.
+
+    ANALYZE samples SQLITE_ANALYSIS_LIMIT rows per index, so it stays quick on
+    large tables. Free pages (left behind by archiving) are released with
+    incremental_vacuum in steps of SQLITE_VACUUM_STEP_PAGES, each its own short
+    write transaction. That needs auto_vacuum=INCREMENTAL, which an existing
+    file only gets from a full VACUUM: pass ``full_vacuum`` once, at a quiet
+    time, since it rewrites the whole file under an exclusive lock.
+    """
+    config = current_app.config
+    # VACUUM can't run inside a transaction, so use the driver connection (autocommit, see sqlite.py)
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if full_vacuum:
+            cursor.execute('PRAGMA main.auto_vacuum = INCREMENTAL')
+            cursor.execute('VACUUM main')
+        cursor.execute(f'PRAGMA analysis_limit = {int(config["SQLITE_ANALYSIS_LIMIT"])}')
+        cursor.execute('ANALYZE')
+
+        incremental = cursor.execute('PRAGMA main.auto_vacuum').fetchone()[0] == 2
+        free_pages = cursor.execute('PRAGMA main.freelist_count').fetchone()[0]
+        released = 0
+        if incremental:
+            step = config['SQLITE_VACUUM_STEP_PAGES']
+            for _ in range(0, free_pages, step):
+                # execute() would step the pragma once (one page) and leave the write transaction open
+                cursor.executescript(f'PRAGMA main.incremental_vacuum({step})')
+            released = free_pages - cursor.execute('PRAGMA main.freelist_count').fetchone()[0]
+        cursor.close()
+    finally:
+        connection.close()
+    return {'incremental': incremental, 'free_pages': free_pages, 'released_pages': max(released, 0)}
@@ -0,0 +1,80 @@
+import gzip
+import hashlib
+import json
+import os
+from flask import url_for
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are written
+    brotli = None
+
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+# Served variant suffixes in order of preference, with their Content-Encoding
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+def _fingerprinted(path, digest):
+    stem, ext = os.path.splitext(path)
+    return f'{stem}.{digest[:12]}{ext}'
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def build_assets(static_folder, output_dir):
+    """Copy every static file to a content-hashed name with .gz/.br siblings; returns the manifest.
+
+    The manifest maps each original path (as passed to ``url_for('static',
+    filename=...)``) to its fingerprinted path under ``output_dir``.
+    """
+    manifest = {}
+    output_dir = os.path.abspath(output_dir)
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root).startswith(output_dir):
+            dirs[:] = []
+            continue
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            target = _fingerprinted(logical, hashlib.sha256(data).hexdigest())
+            _write(os.path.join(output_dir, target), data)
+            if name.endswith(COMPRESSIBLE):
+                # mtime=0 keeps the gzip bytes identical between builds of the same file
+                _write(os.path.join(output_dir, target + '.gz'), gzip.compress(data, 9, mtime=0))
+                if brotli:
+                    _write(os.path.join(output_dir, target + '.br'), brotli.compress(data, quality=11))
+            manifest[logical] = target
+    with open(os.path.join(output_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def preferred_variant(directory, filename, accept_encodings):
+    """``(filename, content_encoding)`` of the best precompressed copy the client accepts"""
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding] and os.path.isfile(os.path.join(directory, filename + suffix)):
+            return filename + suffix, encoding
+    return filename, None
+
+def register_assets(app):
+    """Route ``url_for('static', ...)`` in templates through the build manifest when one exists"""
+    manifest = load_manifest(app.config['ASSETS_BUILD_DIR'])
+    app.extensions['asset_manifest'] = manifest
+
+    def asset_url_for(endpoint, **values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+            endpoint = 'assets.serve'
+        return url_for(endpoint, **values)
+
+    app.jinja_env.globals['url_for'] = asset_url_for
@@ -0,0 +1,147 @@
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.schema import CreateTable
+from app import db
+from app.models.appointment import Appointment
+from app.models.slot_hold import SlotHold
+from app.utils.slots import ACTIVE_STATUSES
+from app.utils.holds import active_holds, release_hold
+from app.utils.metrics import metrics
+
+class SlotUnavailable(Exception):
+    """The requested slot already has an active appointment"""
+
+class StaleAppointment(Exception):
+    """The appointment changed since the caller last read it"""
+
+def _begin_write():
+    # Finish whatever read transaction the request has open, then take
+    # SQLite's write lock at BEGIN so the check and the write below are
+    # serialized against every other booking.
+    db.session.commit()
+    db.session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+
+def _slot_taken(doctor_id, day, at_time, patient_id, exclude_id=None):
+    """Whether another active appointment or another patient's hold occupies the slot"""
+    query = db.session.query(Appointment.id).filter(
+        Appointment.doctor_id == doctor_id, Appointment.date == day, Appointment.time == at_time,
+        Appointment.status.in_(ACTIVE_STATUSES)
+    )
+    if exclude_id:
+        query = query.filter(Appointment.id != exclude_id)
+    held = active_holds(doctor_id, exclude_patient_id=patient_id).filter(
+        SlotHold.date == day, SlotHold.time == at_time
+    )
+    return db.session.query(query.exists() | held.exists()).scalar()
+
+def commit_appointment():
+    """Commit edits to a loaded appointment, or roll back and raise StaleAppointment if it changed since it was read"""
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        raise StaleAppointment()
+
+def book_slot(doctor_id, patient_id, day, at_time, notes=None):
+    """Atomically create a booked appointment, or raise SlotUnavailable"""
+    _begin_write()
+    try:
+        if _slot_taken(doctor_id, day, at_time, patient_id):
+            raise SlotUnavailable()
+        appointment = Appointment(doctor_id=doctor_id, patient_id=patient_id, date=day, time=at_time,
+                                  notes=notes, status='booked')
+        db.session.add(appointment)
+        release_hold(doctor_id, day, at_time, patient_id)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        metrics.inc('hospital_bookings_total', outcome='conflict')
+        raise SlotUnavailable()
+    except SlotUnavailable:
+        db.session.rollback()
+        metrics.inc('hospital_bookings_total', outcome='conflict')
+        raise
+    metrics.inc('hospital_bookings_total', outcome='booked')
+    return appointment
+
+def reschedule_slot(appointment_id, expected_version, day, at_time, notes=None):
+    """Move an appointment to a new slot if nobody changed it since ``expected_version``"""
+    _begin_write()
+    try:
+        appointment = db.session.get(Appointment, appointment_id, populate_existing=True)
+        if appointment is None or appointment.version != expected_version:
+            raise StaleAppointment()
+        if _slot_taken(appointment.doctor_id, day, at_time, appointment.patient_id, exclude_id=appointment.id):
+            raise SlotUnavailable()
+        release_hold(appointment.doctor_id, day, at_time, appointment.patient_id)
+        appointment.date = day
+        appointment.time = at_time
+        appointment.notes = notes
+        appointment.status = 'rescheduled'
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        metrics.inc('hospital_reschedules_total', outcome='conflict')
+        raise SlotUnavailable()
+    except StaleDataError:
+        db.session.rollback()
+        metrics.inc('hospital_reschedules_total', outcome='stale')
+        raise StaleAppointment()
+    except SlotUnavailable:
+        db.session.rollback()
+        metrics.inc('hospital_reschedules_total', outcome='conflict')
+        raise
+    except StaleAppointment:
+        db.session.rollback()
+        metrics.inc('hospital_reschedules_total', outcome='stale')
+        raise
+    metrics.inc('hospital_reschedules_total', outcome='rescheduled')
+    return appointment
+
+def upgrade_appointment_schema():
+    """Bring an appointments table from before optimistic locking up to date; returns the changes made.
+
+    Adds the version column and swaps the old unique constraint over every
+    status for the partial one over active appointments. SQLite can't drop
+    a table constraint, so a table that still has it is copied into a new
+    one. Raises ValueError, changing nothing, if two active appointments
+    already share a slot.
+    """
+    appointments = Appointment.__table__
+    changes = []
+    _begin_write()
+    connection = db.session.connection()
+    inspector = inspect(connection)
+    columns = [column['name'] for column in inspector.get_columns(appointments.name)]
+
+    clashes = db.session.execute(select(appointments.c.doctor_id, appointments.c.date, appointments.c.time).where(
+        appointments.c.status.in_(ACTIVE_STATUSES)
+    ).group_by(appointments.c.doctor_id, appointments.c.date, appointments.c.time).having(func.count() > 1)).all()
+    if clashes:
+        db.session.rollback()
+        raise ValueError('Active appointments share a slot; cancel or move all but one of each first: ' +
+                         ', '.join(f'doctor {row.doctor_id} on {row.date} at {row.time}' for row in clashes))
+
+    if inspector.get_unique_constraints(appointments.name):
+        # Build the table as the model defines it, copy the rows over, then swap it in
+        create = str(CreateTable(appointments).compile(dialect=connection.dialect))
+        connection.execute(text(create.replace(f'CREATE TABLE {appointments.name} ',
+                                               f'CREATE TABLE {appointments.name}_upgrade ', 1)))
+        copied = ', '.join(name for name in columns if name in appointments.c)
+        connection.execute(text(f'INSERT INTO {appointments.name}_upgrade ({copied}) '
+                                f'SELECT {copied} FROM {appointments.name}'))
+        connection.execute(text(f'DROP TABLE {appointments.name}'))
+        connection.execute(text(f'ALTER TABLE {appointments.name}_upgrade RENAME TO {appointments.name}'))
+        changes.append('rebuilt appointments without the unique constraint over every status')
+    elif 'version' not in columns:
+        connection.execute(text(f'ALTER TABLE {appointments.name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+        changes.append('added appointments.version')
+
+    existing = {index['name'] for index in inspect(connection).get_indexes(appointments.name)}
+    for index in appointments.indexes:
+        if index.name not in existing:
+            index.create(connection)
+            changes.append(f'created {index.name}')
+    db.session.commit()
+    return changes
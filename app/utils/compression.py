@@ -0,0 +1,142 @@
+import re
+import zlib
+from flask import request
+from jinja2.ext import Extension
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+COMPRESSIBLE_TYPES = {'text/html', 'text/plain', 'text/csv', 'text/css', 'text/javascript',
+                      'application/json', 'application/x-ndjson', 'application/javascript'}
+
+class _Gzip:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        # Sync flush pushes a streamed chunk to the client without ending the stream
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+class _Brotli:
+    def __init__(self, level):
+        self._c = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+class _Zstd:
+    def __init__(self, level):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._c.compress(data)
+
+    def flush(self):
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._c.flush()
+
+def available_encodings():
+    """Supported Content-Encodings, in server preference order"""
+    return [name for name, module in (('br', brotli), ('zstd', zstandard), ('gzip', zlib)) if module]
+
+def _compressor(encoding, config):
+    if encoding == 'br':
+        return _Brotli(config['COMPRESS_BROTLI_QUALITY'])
+    if encoding == 'zstd':
+        return _Zstd(config['COMPRESS_ZSTD_LEVEL'])
+    return _Gzip(config['COMPRESS_LEVEL'])
+
+def negotiate(accept_encodings, offered=None):
+    """The offered encoding with the highest client quality, ties going to server preference"""
+    best, best_quality = None, 0
+    for encoding in offered or available_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress(data, encoding, config):
+    compressor = _compressor(encoding, config)
+    return compressor.compress(data) + compressor.finish()
+
+def _compress_stream(chunks, source, compressor):
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # Closing the source ends e.g. stream_with_context and releases its session
+        if hasattr(source, 'close'):
+            source.close()
+
+def register_compression(app):
+    """Compress HTML/JSON/CSV responses, buffered or streamed, for clients that accept it"""
+    config = app.config
+
+    @app.after_request
+    def compress_response(response):
+        if (not config['COMPRESS_ENABLED'] or response.status_code < 200 or response.status_code in (204, 304)
+                or response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        if not response.is_streamed and response.calculate_content_length() < config['COMPRESS_MIN_SIZE']:
+            return response
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            source = response.response
+            response.response = _compress_stream(response.iter_encoded(), source, _compressor(encoding, config))
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(response.get_data(), encoding, config))
+        response.headers['Content-Encoding'] = encoding
+        # Same content, different bytes: keep conditional requests working with a weak validator
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+class WhitespaceCollapseExtension(Extension):
+    """Strips indentation and blank lines from HTML template source when it is compiled.
+
+    Runs once per template (and is stored in the bytecode cache), so rendered
+    pages are smaller at no per-request cost. ``<pre>``, ``<textarea>`` and
+    ``<script>`` blocks are left as written.
+    """
+    _protected = re.compile(r'(<(pre|textarea|script)\b.*?</\2\s*>)', re.S | re.I)
+    _indent = re.compile(r'\n\s+')
+
+    def preprocess(self, source, name, filename=None):
+        if not (name or '').endswith('.html'):
+            return source
+        parts = self._protected.split(source)
+        # split() yields text, protected block, tag name, text, ...
+        for i in range(0, len(parts), 3):
+            parts[i] = self._indent.sub('\n', parts[i])
+        del parts[2::3]
+        return ''.join(parts)
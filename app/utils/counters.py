@@ -0,0 +1,105 @@
+from collections import Counter as Tally
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.sqlite import insert
+from app import db
+from app.models.counter import Counter
+from app.models.appointment import Appointment
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+from app.models.history import AppointmentHistory
+
+def appointment_keys(doctor_id, patient_id, status):
+    """Counter keys an appointment contributes to"""
+    keys = []
+    for scope, scope_id in (('global', 0), ('doctor', doctor_id), ('patient', patient_id)):
+        keys.append((scope, scope_id, 'appointments'))
+        keys.append((scope, scope_id, f'status:{status}'))
+    return keys
+
+def _committed(obj, attr):
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, attr)
+
+def _collect_deltas(session):
+    deltas = Tally()
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            for key in appointment_keys(obj.doctor_id, obj.patient_id, obj.status or 'booked'):
+                deltas[key] += 1
+        elif isinstance(obj, Doctor):
+            deltas[('global', 0, 'doctors')] += 1
+        elif isinstance(obj, Patient):
+            deltas[('global', 0, 'patients')] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            old = (_committed(obj, 'doctor_id'), _committed(obj, 'patient_id'), _committed(obj, 'status'))
+            for key in appointment_keys(*old):
+                deltas[key] -= 1
+        elif isinstance(obj, Doctor):
+            deltas[('global', 0, 'doctors')] -= 1
+        elif isinstance(obj, Patient):
+            deltas[('global', 0, 'patients')] -= 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, Appointment) or obj in session.deleted:
+            continue
+        old = (_committed(obj, 'doctor_id'), _committed(obj, 'patient_id'), _committed(obj, 'status'))
+        new = (obj.doctor_id, obj.patient_id, obj.status)
+        if old != new:
+            for key in appointment_keys(*old):
+                deltas[key] -= 1
+            for key in appointment_keys(*new):
+                deltas[key] += 1
+
+    return {key: delta for key, delta in deltas.items() if delta}
+
+def apply_deltas(connection, deltas):
+    """Add ``deltas`` ({(scope, scope_id, name): delta}) to the counters table with upserts"""
+    rows = [{'scope': scope, 'scope_id': scope_id, 'name': name, 'value': delta}
+            for (scope, scope_id, name), delta in deltas.items()]
+    # Chunked to stay under SQLite's bound-parameter limit on large rebuilds
+    for start in range(0, len(rows), 500):
+        stmt = insert(Counter.__table__).values(rows[start:start + 500])
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['scope', 'scope_id', 'name'],
+            set_={'value': Counter.__table__.c.value + stmt.excluded.value}
+        ))
+
+def _after_flush(session, flush_context):
+    # Runs inside the flush's transaction, so counters commit or roll back
+    # together with the appointment rows that moved them.
+    apply_deltas(session.connection(), _collect_deltas(session))
+
+def register_counter_events():
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+
+def get_counters(scope='global', scope_id=0):
+    """Return every counter for a scope as a dict, in a single primary-key lookup"""
+    rows = db.session.query(Counter.name, Counter.value).filter_by(scope=scope, scope_id=scope_id).all()
+    return dict(rows)
+
+def status_count(counters, *statuses):
+    return sum(counters.get(f'status:{status}', 0) for status in statuses)
+
+def rebuild_counters():
+    """Recompute every counter from the source tables (archived appointments included), discarding any drift"""
+    deltas = Tally()
+    grouped = db.session.query(
+        AppointmentHistory.doctor_id, AppointmentHistory.patient_id, AppointmentHistory.status,
+        func.count(AppointmentHistory.id)
+    ).group_by(AppointmentHistory.doctor_id, AppointmentHistory.patient_id, AppointmentHistory.status).all()
+    for doctor_id, patient_id, status, count in grouped:
+        for key in appointment_keys(doctor_id, patient_id, status):
+            deltas[key] += count
+    deltas[('global', 0, 'doctors')] = db.session.query(func.count(Doctor.id)).scalar()
+    deltas[('global', 0, 'patients')] = db.session.query(func.count(Patient.id)).scalar()
+
+    # Page-cache versions are not derived from other tables and must never go backwards
+    Counter.query.filter(Counter.scope != 'version').delete()
+    apply_deltas(db.session.connection(), dict(deltas))
+    db.session.commit()
+    return len(deltas)
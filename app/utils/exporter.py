@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+from datetime import date, time, datetime
+from sqlalchemy import exists, or_, select, union_all
+from sqlalchemy.orm import aliased
+from app import db
+from app.models.user import User
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+from app.models.department import Department
+from app.models.appointment import Appointment
+from app.models.treatment import Treatment
+from app.models.history import archived_appointments, archived_treatments
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+YIELD_PER = 1000
+CSV_FLUSH_ROWS = 200
+
+def _sources():
+    """``(Appointment, Treatment)`` entities for the live tables, then for the archive ones"""
+    archived = (aliased(Appointment, archived_appointments, adapt_on_names=True),
+                aliased(Treatment, archived_treatments, adapt_on_names=True))
+    return ((Appointment, Treatment), archived)
+
+def _merged(build, start, end, department_id, key):
+    """UNION ALL of ``build`` over the live and archived tables, ordered by appointment date, time and ``key``.
+
+    Each half is joined on its own, so SQLite merges two index-ordered
+    streams rather than materializing either table. That only works when the
+    sort columns are part of the result, hence ``time`` in every export.
+    """
+    halves = []
+    for appointment, treatment in _sources():
+        stmt = build(appointment, treatment).where(*_appointment_filters(appointment, start, end, department_id))
+        if appointment is not Appointment:
+            # Rows caught mid-move by the archiver exist in both places; export the live copy
+            stmt = stmt.where(~exists().where(Appointment.id == appointment.id))
+        halves.append(stmt)
+    rows = union_all(*halves).subquery()
+    return select(rows).order_by(rows.c.date, rows.c.time, rows.c[key])
+
+def _appointment_rows(appointment, treatment):
+    return select(
+        appointment.id, appointment.date, appointment.time, appointment.status,
+        appointment.doctor_id, Doctor.name.label('doctor_name'), Doctor.specialization,
+        Department.name.label('department'), appointment.patient_id, Patient.name.label('patient_name'),
+        appointment.notes, appointment.created_at, treatment.diagnosis, treatment.prescription,
+        treatment.notes.label('treatment_notes')
+    ).join(Doctor, appointment.doctor_id == Doctor.id).join(
+        Patient, appointment.patient_id == Patient.id
+    ).outerjoin(Department, Doctor.department_id == Department.id).outerjoin(
+        treatment, treatment.appointment_id == appointment.id
+    )
+
+def _appointments(start, end, department_id):
+    return _merged(_appointment_rows, start, end, department_id, 'id')
+
+def _treatment_rows(appointment, treatment):
+    return select(
+        # appointment.id rather than treatment.appointment_id so the date/time index also orders it
+        treatment.id, appointment.id.label('appointment_id'), appointment.date, appointment.time, appointment.doctor_id,
+        Doctor.name.label('doctor_name'), Department.name.label('department'), appointment.patient_id,
+        Patient.name.label('patient_name'), treatment.diagnosis, treatment.prescription, treatment.notes,
+        treatment.created_at
+    ).join(appointment, treatment.appointment_id == appointment.id).join(
+        Doctor, appointment.doctor_id == Doctor.id
+    ).join(Patient, appointment.patient_id == Patient.id).outerjoin(
+        Department, Doctor.department_id == Department.id
+    )
+
+def _treatments(start, end, department_id):
+    return _merged(_treatment_rows, start, end, department_id, 'appointment_id')
+
+def _patients(start, end, department_id):
+    stmt = select(
+        Patient.id, Patient.name, User.email, Patient.phone, Patient.date_of_birth, Patient.blood_group,
+        Patient.address, User.is_active, User.created_at
+    ).join(User, Patient.user_id == User.id)
+    if start or end or department_id:
+        # The roster narrows to patients seen in the range/department, live or archived
+        seen = [exists(select(appointment.id).join(Doctor, appointment.doctor_id == Doctor.id).where(
+            appointment.patient_id == Patient.id, *_appointment_filters(appointment, start, end, department_id)
+        )) for appointment, _ in _sources()]
+        stmt = stmt.where(or_(*seen))
+    return stmt.order_by(Patient.id)
+
+def _appointment_filters(appointment, start, end, department_id):
+    filters = []
+    if start:
+        filters.append(appointment.date >= start)
+    if end:
+        filters.append(appointment.date <= end)
+    if department_id:
+        filters.append(Doctor.department_id == department_id)
+    return filters
+
+EXPORT_KINDS = {
+    'appointments': _appointments,
+    'patients': _patients,
+    'treatments': _treatments,
+}
+
+def export_rows(kind, start=None, end=None, department_id=None):
+    """Yield the column names, then one tuple per row, fetched ``YIELD_PER`` rows at a time.
+
+    ``start``/``end`` bound the appointment date (inclusive). Nothing is
+    loaded as ORM objects, so memory stays flat however large the table is.
+    """
+    result = db.session.execute(
+        EXPORT_KINDS[kind](start, end, department_id).execution_options(yield_per=YIELD_PER)
+    )
+    try:
+        yield list(result.keys())
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        result.close()
+
+def _value(value):
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    return value
+
+def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(['' if value is None else _value(value) for value in row])
+        if count % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _ndjson_chunks(rows):
+    columns = next(rows)
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({column: _value(value) for column, value in zip(columns, row)}) + '\n')
+        if len(lines) == CSV_FLUSH_ROWS:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+def export_chunks(kind, fmt, start=None, end=None, department_id=None):
+    """Encoded text chunks of a CSV (with header row) or NDJSON export"""
+    rows = export_rows(kind, start, end, department_id)
+    return _csv_chunks(rows) if fmt == 'csv' else _ndjson_chunks(rows)
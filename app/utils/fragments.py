@@ -0,0 +1,88 @@
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from app.utils.metrics import metrics
+from app.utils.page_cache import current_versions
+from app.utils.compression import WhitespaceCollapseExtension
+
+class FragmentCache:
+    """Process-local LRU of rendered template fragments with per-fragment hit/miss counts.
+
+    Keys are the values given to ``{% cache %}``, which should include every
+    version the fragment depends on, so stale entries are simply never looked
+    up again and fall off the end once FRAGMENT_CACHE_SIZE is exceeded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+    def stats(self):
+        """``{fragment: (hits, misses)}`` for this process"""
+        with self._lock:
+            return {name: tuple(counts) for name, counts in self._stats.items()}
+
+    def fetch(self, key, render):
+        size = current_app.config['FRAGMENT_CACHE_SIZE']
+        if not size:
+            return render()
+        name = key[0]
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            self._stats.setdefault(name, [0, 0])[value is None] += 1
+        metrics.inc('hospital_fragment_cache_total', fragment=name, result='miss' if value is None else 'hit')
+        if value is None:
+            value = render()
+            with self._lock:
+                self._entries[key] = value
+                while len(self._entries) > size:
+                    self._entries.popitem(last=False)
+        return value
+
+fragment_cache = FragmentCache()
+
+class FragmentCacheExtension(Extension):
+    """``{% cache 'name', key, ... %}...{% endcache %}`` stores the rendered block under those values"""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.Tuple(key, 'load')]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        return fragment_cache.fetch(key, caller)
+
+def versions(*tables):
+    """Template helper: the current versions of ``tables``, for use in fragment keys"""
+    current = current_versions()
+    return tuple(current.get(table, 0) for table in tables)
+
+def configure_templates(app):
+    """Install the bytecode cache, whitespace collapsing and the ``{% cache %}`` tag on the app's Jinja environment"""
+    collapse = app.config['HTML_COLLAPSE_WHITESPACE']
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if directory:
+        # Compiled templates are shared by every worker, so new processes start hot. Bytecode
+        # compiled with and without collapsing must not be mixed, hence the filename pattern.
+        os.makedirs(directory, exist_ok=True)
+        pattern = '__jinja2_%s.collapsed.cache' if collapse else '__jinja2_%s.cache'
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory, pattern)
+    if collapse:
+        app.jinja_env.add_extension(WhitespaceCollapseExtension)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals['versions'] = versions
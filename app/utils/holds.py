@@ -0,0 +1,71 @@
+import threading
+import time as clock
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert
+from app import db
+from app.models.slot_hold import SlotHold
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+def active_holds(doctor_id=None, exclude_patient_id=None):
+    """Query of unexpired holds, optionally for one doctor and ignoring one patient's own holds"""
+    query = db.session.query(SlotHold).filter(SlotHold.expires_at > datetime.utcnow())
+    if doctor_id is not None:
+        query = query.filter(SlotHold.doctor_id == doctor_id)
+    if exclude_patient_id is not None:
+        query = query.filter(SlotHold.patient_id != exclude_patient_id)
+    return query
+
+def place_hold(doctor_id, patient_id, day, at_time):
+    """Reserve a slot for the patient for SLOT_HOLD_MINUTES; returns the expiry or None if someone else holds it.
+
+    The claim is a single upsert: it inserts a fresh hold, takes over an
+    expired one, or extends the patient's own, and RETURNING tells us which.
+    Any other slot the patient was holding is released in the same commit.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=current_app.config['SLOT_HOLD_MINUTES'])
+    
+    _maybe_sweep(now)
+    db.session.query(SlotHold).filter(
+        SlotHold.patient_id == patient_id,
+        (SlotHold.doctor_id != doctor_id) | (SlotHold.date != day) | (SlotHold.time != at_time)
+    ).delete(synchronize_session=False)
+    
+    stmt = insert(SlotHold.__table__).values(doctor_id=doctor_id, patient_id=patient_id, date=day, time=at_time,
+                                             expires_at=expires_at, created_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['doctor_id', 'date', 'time'],
+        set_={'patient_id': stmt.excluded.patient_id, 'expires_at': stmt.excluded.expires_at,
+              'created_at': stmt.excluded.created_at},
+        where=(SlotHold.__table__.c.expires_at <= now) | (SlotHold.__table__.c.patient_id == patient_id)
+    ).returning(SlotHold.__table__.c.expires_at)
+    claimed = db.session.execute(stmt).scalar()
+    db.session.commit()
+    return claimed
+
+def release_hold(doctor_id, day, at_time, patient_id):
+    """Drop the patient's hold on a slot (part of the caller's transaction)"""
+    db.session.query(SlotHold).filter_by(
+        doctor_id=doctor_id, date=day, time=at_time, patient_id=patient_id
+    ).delete(synchronize_session=False)
+
+def sweep_expired_holds():
+    """Delete every expired hold in one statement; returns how many were removed"""
+    removed = db.session.query(SlotHold).filter(
+        SlotHold.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+def _maybe_sweep(now):
+    # Expired holds are already ignored by every reader; sweeping just keeps
+    # the table small, so piggyback on hold writes at most once per interval.
+    global _last_sweep
+    with _sweep_lock:
+        if clock.monotonic() - _last_sweep < current_app.config['SLOT_HOLD_SWEEP_SECONDS']:
+            return
+        _last_sweep = clock.monotonic()
+    db.session.query(SlotHold).filter(SlotHold.expires_at <= now).delete(synchronize_session=False)
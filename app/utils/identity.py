@@ -0,0 +1,85 @@
+import threading
+import time as clock
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.user import User
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+from app.models.department import Department
+
+def _identity_query(session, user_id):
+    # User, role profile and the doctor's department in one LEFT OUTER JOIN query
+    return session.query(User).options(
+        joinedload(User.doctor).joinedload(Doctor.department),
+        joinedload(User.patient)
+    ).filter(User.id == user_id)
+
+class IdentityCache:
+    """Process-local cache of users loaded together with their Doctor/Patient profile.
+
+    Entries are detached object graphs loaded in a private session and merged
+    into the request's session without SQL. Commits touching a user, profile
+    or department drop the affected entries; IDENTITY_CACHE_TTL bounds how
+    long changes made by other worker processes can go unseen (0 disables
+    the cache, leaving one joined query per request).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def invalidate(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+            for user_id in user_ids or ():
+                self._entries.pop(user_id, None)
+
+    def get(self, user_id):
+        ttl = current_app.config['IDENTITY_CACHE_TTL']
+        if not ttl:
+            return _identity_query(db.session, user_id).first()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None or clock.monotonic() - entry[0] > ttl:
+            session = db.session.session_factory()
+            try:
+                entry = (clock.monotonic(), _identity_query(session, user_id).first())
+            finally:
+                session.close()
+            with self._lock:
+                self._entries[user_id] = entry
+        user = entry[1]
+        return db.session.merge(user, load=False) if user is not None else None
+
+identity_cache = IdentityCache()
+
+def load_identity(user_id):
+    """User with ``doctor``/``patient`` (and the doctor's department) already loaded"""
+    return identity_cache.get(user_id)
+
+def _after_flush(session, flush_context):
+    touched = session.info.setdefault('identity_stale', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            touched.add(obj.id)
+        elif isinstance(obj, (Doctor, Patient)):
+            touched.add(obj.user_id)
+        elif isinstance(obj, Department):
+            touched.add(None)
+
+def _after_commit(session):
+    touched = session.info.pop('identity_stale', None)
+    if touched:
+        identity_cache.invalidate(None if None in touched else touched)
+
+def _after_rollback(session):
+    session.info.pop('identity_stale', None)
+
+def register_identity_events():
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
@@ -0,0 +1,321 @@
+import csv
+import json
+import os
+import time as clock
+from collections import Counter as Tally
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, time
+from itertools import islice
+from flask import current_app
+from sqlalchemy import insert, tuple_
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models.user import User
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+from app.models.department import Department
+from app.models.availability import Availability
+from app.models.appointment import Appointment
+from app.models.treatment import Treatment
+from app.utils.counters import apply_deltas, appointment_keys
+from app.utils.page_cache import version_key
+from app.utils.slots import ACTIVE_STATUSES, STATUSES
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+LOOKUP_CHUNK = 500  # stays under SQLite's bound-parameter limit
+
+class ImportValidationError(Exception):
+    """The input failed validation; nothing was written"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid rows')
+        self.errors = errors
+
+def _ndjson_rows(f, errors):
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            errors.append((number, 'invalid JSON'))
+            continue
+        if not isinstance(row, dict):
+            errors.append((number, 'expected a JSON object'))
+            continue
+        yield number, row
+
+def read_records(path, fmt=None, errors=None):
+    """Stream ``(line_number, record)`` from a CSV or NDJSON file, blank values as None.
+
+    NDJSON lines that aren't a JSON object are skipped and reported in
+    ``errors``; without a list to report them in, the first one raises
+    ImportValidationError.
+    """
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    bad_lines = [] if errors is None else errors
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            rows = ((reader.line_num, row) for row in reader)
+        else:
+            rows = _ndjson_rows(f, bad_lines)
+        for number, row in rows:
+            if bad_lines and errors is None:
+                raise ImportValidationError(bad_lines)
+            yield number, {key.strip(): (value.strip() or None) if isinstance(value, str) else value
+                           for key, value in row.items() if key}
+        if bad_lines and errors is None:
+            raise ImportValidationError(bad_lines)
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def _lookup(query_for, keys):
+    """Run ``query_for(chunk)`` over ``keys`` in parameter-limit-sized chunks and merge the rows into a dict"""
+    found = {}
+    keys = list(keys)
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        found.update(query_for(keys[start:start + LOOKUP_CHUNK]))
+    return found
+
+def _user_ids(emails):
+    return _lookup(lambda chunk: db.session.query(User.email, User.id).filter(User.email.in_(chunk)), emails)
+
+def _profile_ids(model, emails):
+    return _lookup(lambda chunk: db.session.query(User.email, model.id).join(model, model.user_id == User.id)
+                   .filter(User.email.in_(chunk)), emails)
+
+def _parse(record, field, parser, errors, number, required=False):
+    value = record.get(field)
+    if value is None:
+        if required:
+            errors.append((number, f'{field} is required'))
+        return None
+    try:
+        return parser(value)
+    except (TypeError, ValueError):
+        errors.append((number, f'invalid {field}: {value!r}'))
+        return None
+
+def _day_of_week(value):
+    """0-6 or a weekday name"""
+    value = str(value).lower()
+    if value in WEEKDAYS:
+        return WEEKDAYS.index(value)
+    if not 0 <= int(value) <= 6:
+        raise ValueError(value)
+    return int(value)
+
+def _status(value):
+    if value not in STATUSES:
+        raise ValueError(value)
+    return value
+
+def _hash_password(args):
+    return generate_password_hash(*args)
+
+def _hash_all(records, pool):
+    """Password hashes for a batch, computed across the process pool; ``password_hash`` columns pass through"""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    plain = [(r['password'], method) for r in records if not r.get('password_hash')]
+    hashed = iter(pool.map(_hash_password, plain, chunksize=16))
+    return [r.get('password_hash') or next(hashed) for r in records]
+
+# -- Validation: one streaming pass that checks every row and resolves references up front --
+
+def _validate_accounts(records, errors, required):
+    emails = {}
+    for number, record in records:
+        for field in required:
+            if not record.get(field):
+                errors.append((number, f'{field} is required'))
+        if not record.get('password') and not record.get('password_hash'):
+            errors.append((number, 'password or password_hash is required'))
+        email = record.get('email')
+        if email in emails:
+            errors.append((number, f'duplicate email {email} (also on line {emails[email]})'))
+        elif email:
+            emails[email] = number
+    for email in _user_ids(emails):
+        errors.append((emails[email], f'email {email} is already registered'))
+
+def _validate_doctors(records, errors):
+    departments = dict(db.session.query(Department.name, Department.id))
+    checked = []
+    for number, record in records:
+        if record.get('department') and record['department'] not in departments:
+            errors.append((number, f'unknown department {record["department"]!r}'))
+        _parse(record, 'years_of_experience', int, errors, number)
+        checked.append((number, record))
+    _validate_accounts(checked, errors, ('email', 'name', 'specialization'))
+    return {'departments': departments}
+
+def _validate_patients(records, errors):
+    checked = []
+    for number, record in records:
+        _parse(record, 'date_of_birth', date.fromisoformat, errors, number)
+        checked.append((number, record))
+    _validate_accounts(checked, errors, ('email', 'name'))
+    return {}
+
+def _validate_availability(records, errors):
+    referenced = {}
+    for number, record in records:
+        day = _parse(record, 'day_of_week', _day_of_week, errors, number, required=True)
+        start = _parse(record, 'start_time', time.fromisoformat, errors, number, required=True)
+        end = _parse(record, 'end_time', time.fromisoformat, errors, number, required=True)
+        if start and end and start >= end:
+            errors.append((number, 'start_time must be before end_time'))
+        if record.get('doctor_email'):
+            referenced.setdefault(record['doctor_email'], number)
+        else:
+            errors.append((number, 'doctor_email is required'))
+    doctors = _profile_ids(Doctor, referenced)
+    for email in referenced.keys() - doctors.keys():
+        errors.append((referenced[email], f'no doctor with email {email}'))
+    return {'doctors': doctors}
+
+def _validate_appointments(records, errors):
+    referenced = {'doctor': {}, 'patient': {}}
+    active_slots = {}
+    for number, record in records:
+        day = _parse(record, 'date', date.fromisoformat, errors, number, required=True)
+        at_time = _parse(record, 'time', time.fromisoformat, errors, number, required=True)
+        status = _parse(record, 'status', _status, errors, number) or 'completed'
+        for role in referenced:
+            email = record.get(f'{role}_email')
+            if email:
+                referenced[role].setdefault(email, number)
+            else:
+                errors.append((number, f'{role}_email is required'))
+        if status in ACTIVE_STATUSES and day and at_time and record.get('doctor_email'):
+            slot = (record['doctor_email'], day, at_time)
+            if slot in active_slots:
+                errors.append((number, f'slot already booked on line {active_slots[slot]}'))
+            active_slots[slot] = number
+    
+    context = {}
+    for role, model in (('doctor', Doctor), ('patient', Patient)):
+        context[f'{role}s'] = _profile_ids(model, referenced[role])
+        for email in referenced[role].keys() - context[f'{role}s'].keys():
+            errors.append((referenced[role][email], f'no {role} with email {email}'))
+    
+    slots = [(context['doctors'][email], day, at_time) for email, day, at_time in active_slots if email in context['doctors']]
+    taken = _lookup(lambda chunk: ((tuple(row), True) for row in db.session.query(
+        Appointment.doctor_id, Appointment.date, Appointment.time
+    ).filter(tuple_(Appointment.doctor_id, Appointment.date, Appointment.time).in_(chunk),
+             Appointment.status.in_(ACTIVE_STATUSES))), slots)
+    by_id = {id: email for email, id in context['doctors'].items()}
+    for doctor_id, day, at_time in taken:
+        errors.append((active_slots[(by_id[doctor_id], day, at_time)], 'slot is already booked in the database'))
+    return context
+
+# -- Insertion: one bulk INSERT per table per batch, each batch its own transaction --
+
+def _insert_users(records, role, pool):
+    rows = [{'email': r['email'], 'password_hash': h, 'role': role}
+            for r, h in zip(records, _hash_all(records, pool))]
+    return db.session.scalars(insert(User).returning(User.id, sort_by_parameter_order=True), rows).all()
+
+def _insert_doctors(records, context, pool):
+    user_ids = _insert_users(records, 'doctor', pool)
+    doctor_ids = db.session.scalars(insert(Doctor).returning(Doctor.id, sort_by_parameter_order=True), [
+        {'user_id': user_id, 'name': r['name'], 'specialization': r['specialization'],
+         'department_id': context['departments'].get(r.get('department')), 'phone': r.get('phone'),
+         'years_of_experience': int(r.get('years_of_experience') or 0)}
+        for r, user_id in zip(records, user_ids)
+    ]).all()
+    if context['default_availability']:
+        # Same weekday 9-5 schedule the admin form gives a new doctor
+        db.session.execute(insert(Availability), [
+            {'doctor_id': doctor_id, 'day_of_week': day, 'start_time': time(9), 'end_time': time(17), 'is_available': True}
+            for doctor_id in doctor_ids for day in range(5)
+        ])
+    return {('global', 0, 'doctors'): len(doctor_ids), version_key('doctors'): 1, version_key('availability'): 1}
+
+def _insert_patients(records, context, pool):
+    user_ids = _insert_users(records, 'patient', pool)
+    db.session.execute(insert(Patient), [
+        {'user_id': user_id, 'name': r['name'], 'phone': r.get('phone'),
+         'date_of_birth': date.fromisoformat(r['date_of_birth']) if r.get('date_of_birth') else None,
+         'address': r.get('address'), 'blood_group': r.get('blood_group'), 'medical_history': r.get('medical_history')}
+        for r, user_id in zip(records, user_ids)
+    ])
+    return {('global', 0, 'patients'): len(records), version_key('patients'): 1}
+
+def _insert_availability(records, context, pool):
+    db.session.execute(insert(Availability), [
+        {'doctor_id': context['doctors'][r['doctor_email']], 'day_of_week': _day_of_week(r['day_of_week']),
+         'start_time': time.fromisoformat(r['start_time']), 'end_time': time.fromisoformat(r['end_time']),
+         'is_available': str(r.get('is_available', True)).lower() not in ('0', 'false', 'no')}
+        for r in records
+    ])
+    return {}
+
+def _insert_appointments(records, context, pool):
+    rows = [{'doctor_id': context['doctors'][r['doctor_email']],
+             'patient_id': context['patients'][r['patient_email']],
+             'date': date.fromisoformat(r['date']), 'time': time.fromisoformat(r['time']),
+             'status': r.get('status') or 'completed', 'notes': r.get('notes')} for r in records]
+    ids = db.session.scalars(insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True), rows).all()
+    treatments = [{'appointment_id': id, 'diagnosis': r['diagnosis'], 'prescription': r.get('prescription'),
+                   'notes': r.get('treatment_notes')} for r, id in zip(records, ids) if r.get('diagnosis')]
+    if treatments:
+        db.session.execute(insert(Treatment), treatments)
+    deltas = Tally()
+    for row in rows:
+        for key in appointment_keys(row['doctor_id'], row['patient_id'], row['status']):
+            deltas[key] += 1
+    return deltas
+
+IMPORT_KINDS = {
+    'doctors': (_validate_doctors, _insert_doctors, True),
+    'patients': (_validate_patients, _insert_patients, True),
+    'availability': (_validate_availability, _insert_availability, False),
+    'appointments': (_validate_appointments, _insert_appointments, False),
+}
+
+def run_import(kind, path, fmt=None, batch_size=1000, processes=None, default_availability=True,
+               dry_run=False, progress=None):
+    """Validate the whole file, then bulk-insert it in batches; returns (rows, seconds).
+
+    Raises ImportValidationError listing every bad row before anything is
+    written. Each batch commits on its own, together with its counter
+    updates; the FTS indexes follow through their triggers.
+    """
+    validate, insert_batch, hashes = IMPORT_KINDS[kind]
+    started = clock.perf_counter()
+    
+    errors = []
+    context = validate(read_records(path, fmt, errors), errors)
+    db.session.rollback()
+    if errors:
+        raise ImportValidationError(sorted(errors))
+    context['default_availability'] = default_availability
+    if dry_run:
+        return 0, clock.perf_counter() - started
+    
+    pool = ProcessPoolExecutor(max_workers=processes or os.cpu_count()) if hashes else None
+    count = 0
+    try:
+        for batch in chunked(read_records(path, fmt), batch_size):
+            records = [record for number, record in batch]
+            deltas = insert_batch(records, context, pool)
+            apply_deltas(db.session.connection(), {key: delta for key, delta in deltas.items() if delta})
+            db.session.commit()
+            count += len(records)
+            if progress:
+                progress(count, clock.perf_counter() - started)
+    finally:
+        db.session.rollback()
+        if pool:
+            pool.shutdown()
+    
+    if kind == 'availability':
+        # Imported rows can overlap each other or existing ones; merge them like the UI does
+        from app.utils.schedule import normalize_availability
+        normalize_availability()
+    return count, clock.perf_counter() - started
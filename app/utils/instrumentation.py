@@ -0,0 +1,90 @@
+import heapq
+import json
+import logging
+import time as clock
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+slow_query_logger = logging.getLogger('hospital.slow_query')
+
+class QueryStats:
+    """SQL statements run while handling one request"""
+
+    def __init__(self, keep=5):
+        self.count = 0
+        self.total = 0.0
+        self.keep = keep
+        self.slowest = []  # min-heap of (duration, statement)
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total += duration
+        entry = (duration, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def server_timing(self, request_duration):
+        metrics = [f'app;dur={request_duration * 1000:.1f}',
+                   f'db;dur={self.total * 1000:.1f};desc="{self.count} queries"']
+        for rank, (duration, statement) in enumerate(sorted(self.slowest, reverse=True), 1):
+            summary = ' '.join(statement.split())[:80].replace('"', "'")
+            metrics.append(f'sql-{rank};dur={duration * 1000:.1f};desc="{summary}"')
+        return ', '.join(metrics)
+
+def parameters_shape(parameters, executemany=False):
+    """Describe bound parameters by type only, so patient data never reaches the log"""
+    if executemany:
+        return {'rows': len(parameters), 'row': parameters_shape(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+def register_sql_instrumentation(app, engine):
+    """Time every statement on ``engine``; does nothing unless SQL_INSTRUMENTATION is set.
+
+    Per-request totals and the slowest statements are kept on ``g`` and, in
+    debug mode, returned in a Server-Timing header. Statements slower than
+    SLOW_QUERY_MS go to the ``hospital.slow_query`` logger as JSON lines.
+    """
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+    threshold = app.config['SLOW_QUERY_MS'] / 1000
+    
+    if app.config['SLOW_QUERY_LOG'] and not slow_query_logger.handlers:
+        handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'])
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+    
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(clock.perf_counter())
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        duration = clock.perf_counter() - conn.info['query_started'].pop()
+        stats = g.get('query_stats') if has_app_context() else None
+        if stats is not None:
+            stats.record(statement, duration)
+        if duration >= threshold:
+            slow_query_logger.warning(json.dumps({
+                'duration_ms': round(duration * 1000, 2),
+                'endpoint': request.endpoint if has_request_context() else None,
+                'method': request.method if has_request_context() else None,
+                'statement': statement[:2000],
+                'parameters': parameters_shape(parameters, executemany),
+            }, default=str))
+    
+    @app.before_request
+    def _start_request_stats():
+        g.query_stats = QueryStats(app.config['SERVER_TIMING_STATEMENTS'])
+        g.request_started = clock.perf_counter()
+    
+    @app.after_request
+    def _add_server_timing(response):
+        stats = g.get('query_stats')
+        if stats is not None and app.debug:
+            response.headers['Server-Timing'] = stats.server_timing(clock.perf_counter() - g.request_started)
+        return response
@@ -0,0 +1,235 @@
+import json
+import os
+import random
+import socket
+import threading
+import time as clock
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from app import db
+from app.models.job import Job
+from app.utils.metrics import metrics
+
+# kind: handler(**payload)
+JOB_HANDLERS = {}
+# kind: seconds between runs, for jobs the runners enqueue themselves
+PERIODIC_JOBS = {}
+
+def register_job(kind, handler, every=None):
+    """Make ``handler`` run jobs of ``kind``; with ``every`` (seconds) the runners also enqueue it on that schedule"""
+    JOB_HANDLERS[kind] = handler
+    if every:
+        PERIODIC_JOBS[kind] = every
+    else:
+        PERIODIC_JOBS.pop(kind, None)
+
+def enqueue(kind, payload=None, run_at=None, unique_key=None, max_attempts=None):
+    """Queue a job (part of the caller's transaction).
+
+    With ``unique_key`` nothing is queued if a job with that key exists
+    already, whatever its status. Returns the new job's id, or None.
+    """
+    stmt = insert(Job.__table__).values(
+        kind=kind, payload=json.dumps(payload or {}), unique_key=unique_key, status='queued', attempts=0,
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_at=run_at or datetime.utcnow(), created_at=datetime.utcnow(),
+    ).on_conflict_do_nothing(index_elements=['unique_key']).returning(Job.__table__.c.id)
+    return db.session.execute(stmt).scalar()
+
+_scheduled = {}  # kind: the last interval this process enqueued it for
+
+def schedule_periodic():
+    """Enqueue each periodic job for the current interval, once however many runners ask"""
+    due = {}
+    for kind, every in PERIODIC_JOBS.items():
+        # Only the current interval: after downtime a periodic job runs once, not once per missed interval
+        slot = int(clock.time() // every)
+        if _scheduled.get(kind) != slot:
+            due[kind] = slot
+    if not due:
+        return
+    for kind, slot in due.items():
+        enqueue(kind, run_at=datetime.utcfromtimestamp(slot * PERIODIC_JOBS[kind]), unique_key=f'{kind}@{slot}')
+    db.session.commit()
+    _scheduled.update(due)
+
+def _begin_write():
+    db.session.commit()
+    db.session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+
+def claim_jobs(worker, limit=1):
+    """Lease up to ``limit`` due jobs to ``worker``, oldest first.
+
+    A running job's ``run_at`` is its lease expiry, so jobs whose worker
+    died are picked up again by the same (status, run_at) range that finds
+    queued ones, once JOB_LEASE_SECONDS have passed.
+    """
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+    _begin_write()
+    jobs = Job.query.filter(Job.status.in_(('queued', 'running')), Job.run_at <= now).order_by(Job.run_at).limit(limit).all()
+    claimed = []
+    for job in jobs:
+        if job.status == 'running' and job.attempts >= job.max_attempts:
+            job.status, job.finished_at = 'failed', now
+            job.last_error = f'Lease expired on its last attempt (worker {job.locked_by})'
+            metrics.inc('hospital_jobs_total', kind=job.kind, outcome='failed')
+            continue
+        job.status, job.locked_by, job.run_at = 'running', worker, lease
+        job.attempts += 1
+        claimed.append(job)
+    db.session.commit()
+    return claimed
+
+def retry_delay(attempts):
+    """Seconds before the next attempt: exponential from JOB_RETRY_BASE_SECONDS, capped, with jitter"""
+    config = current_app.config
+    delay = min(config['JOB_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1), config['JOB_RETRY_MAX_SECONDS'])
+    return delay * random.uniform(0.5, 1.0)  # spread out jobs that failed together
+
+def _finish(job_id, worker, values):
+    # Only if the lease is still ours; if it ran out, another worker has the job now
+    _begin_write()
+    db.session.execute(update(Job).where(Job.id == job_id, Job.status == 'running', Job.locked_by == worker)
+                       .values(**values))
+    db.session.commit()
+
+def run_job(job, worker):
+    """Run one claimed job; returns 'done', 'retry' or 'failed'"""
+    job_id, kind, attempts, max_attempts = job.id, job.kind, job.attempts, job.max_attempts
+    started = clock.perf_counter()
+    try:
+        handler = JOB_HANDLERS.get(kind)
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {kind!r}')
+        handler(**json.loads(job.payload))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Job %s (%s) failed on attempt %s of %s', job_id, kind, attempts, max_attempts)
+        error = f'{type(e).__name__}: {e}'[:2000]
+        if attempts < max_attempts:
+            outcome = 'retry'
+            _finish(job_id, worker, {'status': 'queued', 'last_error': error, 'locked_by': None,
+                                     'run_at': datetime.utcnow() + timedelta(seconds=retry_delay(attempts))})
+        else:
+            outcome = 'failed'
+            _finish(job_id, worker, {'status': 'failed', 'last_error': error, 'finished_at': datetime.utcnow()})
+    else:
+        outcome = 'done'
+        _finish(job_id, worker, {'status': 'done', 'finished_at': datetime.utcnow()})
+    metrics.inc('hospital_jobs_total', kind=kind, outcome=outcome)
+    metrics.observe('hospital_job_duration_seconds', clock.perf_counter() - started, kind=kind)
+    return outcome
+
+def prune_jobs():
+    """Delete jobs that finished successfully more than JOB_RETENTION_DAYS ago (failed ones are kept)"""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['JOB_RETENTION_DAYS'])
+    removed = db.session.execute(delete(Job).where(Job.status == 'done', Job.finished_at < cutoff)).rowcount
+    db.session.commit()
+    return removed
+
+def job_counts():
+    """``{(kind, status): count}`` across the queue"""
+    rows = db.session.execute(select(Job.kind, Job.status, func.count()).group_by(Job.kind, Job.status)).all()
+    return {(kind, status): count for kind, status, count in rows}
+
+def retry_failed(kind=None):
+    """Queue failed jobs again with a fresh set of attempts; returns how many"""
+    stmt = update(Job).where(Job.status == 'failed').values(
+        status='queued', attempts=0, run_at=datetime.utcnow(), locked_by=None, finished_at=None)
+    if kind:
+        stmt = stmt.where(Job.kind == kind)
+    count = db.session.execute(stmt).rowcount
+    db.session.commit()
+    return count
+
+class JobRunner:
+    """Worker threads that claim due jobs from the queue and run them, each in its own app context.
+
+    Any number of runners, in any number of processes, can share one queue:
+    claims happen under SQLite's write lock. The first thread also enqueues
+    periodic jobs as their intervals come round.
+    """
+
+    def __init__(self, app, threads=1):
+        self.app = app
+        self.threads = threads
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._workers = []
+
+    @property
+    def started(self):
+        return bool(self._workers)
+
+    def start(self):
+        with self._lock:
+            if self._workers:
+                return
+            self._stop.clear()
+            self._workers = [threading.Thread(target=self._work, args=(i,), name=f'job-worker-{i}', daemon=True)
+                             for i in range(self.threads)]
+            for worker in self._workers:
+                worker.start()
+
+    def stop(self, timeout=None):
+        """Let running jobs finish, then stop the threads"""
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def run_pending(self, limit=None):
+        """Enqueue periodic jobs and run every due job in this thread; returns ``{outcome: count}``"""
+        outcomes = {}
+        with self.app.app_context():
+            schedule_periodic()
+            while limit is None or sum(outcomes.values()) < limit:
+                jobs = claim_jobs(f'{self.name}:cli')
+                if not jobs:
+                    break
+                outcome = run_job(jobs[0], f'{self.name}:cli')
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        return outcomes
+
+    def _work(self, index):
+        worker = f'{self.name}:{index}'
+        poll = self.app.config['JOB_POLL_SECONDS']
+        while not self._stop.is_set():
+            ran = False
+            try:
+                with self.app.app_context():
+                    if index == 0:
+                        schedule_periodic()
+                    jobs = claim_jobs(worker)
+                    if jobs:
+                        run_job(jobs[0], worker)
+                        ran = True
+                    if self.app.config['METRICS_ENABLED']:
+                        metrics.flush(self.app.config['METRICS_DIR'], db.engine.pool)
+            except Exception:
+                self.app.logger.exception('Job worker %s hit an error', worker)
+            if not ran:
+                self._stop.wait(poll)
+
+def register_job_runner(app):
+    """Register the queue's own housekeeping job and, with JOB_IN_PROCESS_THREADS, run workers in this process.
+
+    In-process workers start with the first request rather than here, so
+    they are started after a pre-forking server forks (threads don't
+    survive a fork) and never by CLI commands.
+    """
+    register_job('jobs.prune', prune_jobs, every=3600)
+    threads = app.config['JOB_IN_PROCESS_THREADS']
+    if not threads:
+        return
+    runner = app.extensions['job_runner'] = JobRunner(app, threads)
+
+    @app.before_request
+    def _start_job_runner():
+        if not runner.started:
+            runner.start()
@@ -0,0 +1,181 @@
+import glob
+import json
+import os
+import threading
+import time as clock
+from bisect import bisect_left
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help, buckets)
+METRICS = {
+    'hospital_http_requests_total': ('counter', 'Requests handled, by endpoint, method and status.', None),
+    'hospital_http_request_duration_seconds': ('histogram', 'Request latency by endpoint.', LATENCY_BUCKETS),
+    'hospital_http_requests_in_flight': ('gauge', 'Requests currently being handled.', None),
+    'hospital_db_queries_total': ('counter', 'SQL statements executed, by endpoint.', None),
+    'hospital_db_time_seconds': ('histogram', 'Total SQL time per request, by endpoint.', LATENCY_BUCKETS),
+    'hospital_db_pool_connections': ('gauge', 'Database pool connections by state.', None),
+    'hospital_bookings_total': ('counter', 'Booking attempts by outcome.', None),
+    'hospital_reschedules_total': ('counter', 'Reschedule attempts by outcome.', None),
+    'hospital_appointment_cancellations_total': ('counter', 'Appointments cancelled, by who cancelled.', None),
+    'hospital_appointments_completed_total': ('counter', 'Appointments marked completed.', None),
+    'hospital_logins_total': ('counter', 'Login attempts by outcome.', None),
+    'hospital_fragment_cache_total': ('counter', 'Template fragment cache lookups, by fragment and hit/miss.', None),
+    'hospital_jobs_total': ('counter', 'Background jobs run, by kind and outcome (done, retry, failed).', None),
+    'hospital_job_duration_seconds': ('histogram', 'Background job run time by kind.', LATENCY_BUCKETS),
+    'hospital_reminders_total': ('counter', 'Appointment reminders by outcome: sent to the delivery backend, or skipped.', None),
+}
+
+class MetricsRegistry:
+    """Process-local metric values, periodically snapshotted to METRICS_DIR/<pid>.json.
+
+    Each worker process writes only its own file; the /metrics endpoint
+    merges every file, so counters and histograms add up across processes.
+    Gauges from processes that have exited are dropped, their counters kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # (name, labels) -> number, or [bucket counts..., sum, count] for histograms
+        self._last_flush = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._values.setdefault(key, [0] * (len(buckets) + 3))
+            series[bisect_left(buckets, value)] += 1  # last slot before sum/count is +Inf
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [[name, dict(labels), value] for (name, labels), value in self._values.items()]
+
+    def flush(self, directory, pool=None, force=False):
+        """Write this process's values if the flush interval has passed (or ``force``)"""
+        now = clock.monotonic()
+        if not force and now - self._last_flush < current_app.config['METRICS_FLUSH_SECONDS']:
+            return
+        self._last_flush = now
+        series = self.snapshot()
+        if isinstance(pool, QueuePool):
+            for state, value in (('checked_out', pool.checkedout()), ('idle', pool.checkedin()),
+                                 ('overflow', max(pool.overflow(), 0))):
+                series.append(['hospital_db_pool_connections', {'state': state}, value])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'pid': os.getpid(), 'series': series}, f)
+        os.replace(path + '.tmp', path)
+
+metrics = MetricsRegistry()
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def collect(directory):
+    """Merge every process snapshot in ``directory`` into ``{(name, labels): value}``"""
+    merged = {}
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        alive = _process_alive(snapshot['pid'])
+        for name, labels, value in snapshot['series']:
+            if name not in METRICS or (METRICS[name][0] == 'gauge' and not alive):
+                continue
+            key = (name, tuple(sorted(labels.items())))
+            if isinstance(value, list):
+                current = merged.setdefault(key, [0] * len(value))
+                merged[key] = [a + b for a, b in zip(current, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+def render(merged):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in merged.items() if metric == name)
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], value):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {value[-2]}')
+            lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+def register_request_metrics(app, engine):
+    """Record per-endpoint latency, in-flight requests and SQL time for every request"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    directory = app.config['METRICS_DIR']
+    
+    # Only a count and a running total per request; SQL_INSTRUMENTATION's
+    # slow-query log and Server-Timing detail stay off unless asked for
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(clock.perf_counter())
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+        duration = clock.perf_counter() - conn.info['metrics_started'].pop()
+        db_time = g.get('metrics_db_time') if has_app_context() else None
+        if db_time is not None:
+            db_time[0] += 1
+            db_time[1] += duration
+    
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started = clock.perf_counter()
+        g.metrics_db_time = [0, 0.0]  # statements, seconds
+        metrics.inc('hospital_http_requests_in_flight')
+    
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        if 'metrics_started' not in g:
+            return
+        metrics.inc('hospital_http_requests_in_flight', -1)
+        endpoint = request.endpoint or 'unmatched'
+        metrics.observe('hospital_http_request_duration_seconds', clock.perf_counter() - g.metrics_started,
+                        endpoint=endpoint)
+        count, total = g.metrics_db_time
+        metrics.inc('hospital_db_queries_total', count, endpoint=endpoint)
+        metrics.observe('hospital_db_time_seconds', total, endpoint=endpoint)
+        metrics.flush(directory, engine.pool)
+    
+    @app.after_request
+    def _count_response(response):
+        metrics.inc('hospital_http_requests_total', endpoint=request.endpoint or 'unmatched',
+                    method=request.method, status=str(response.status_code))
+        return response
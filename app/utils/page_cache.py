@@ -0,0 +1,153 @@
+import hashlib
+import threading
+import time as clock
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, select
+from app import db
+from app.models.counter import Counter
+from app.models.user import User
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+from app.models.department import Department
+from app.models.availability import Availability
+from app.models.availability_exception import AvailabilityException
+from app.utils.counters import apply_deltas
+
+# Change counters live in the counters table, so every worker process sees
+# the same versions and a bump commits or rolls back with the change itself
+VERSION_SCOPE = 'version'
+
+def version_key(table):
+    return (VERSION_SCOPE, 0, table)
+
+def current_versions():
+    """``{table: version}`` for every versioned table, read once per request"""
+    if 'page_versions' not in g:
+        counters = Counter.__table__.c
+        g.page_versions = dict(db.session.execute(
+            select(counters.name, counters.value).where(counters.scope == VERSION_SCOPE)
+        ).all())
+    return g.page_versions
+
+class PageCache:
+    """Process-local LRU of rendered pages and derived values, keyed by table versions.
+
+    Keys embed the versions they were built from, so a commit that bumps a
+    version makes the old entries unreachable; they age out after
+    PAGE_CACHE_TTL seconds or when PAGE_CACHE_SIZE is exceeded (a TTL of 0
+    disables the cache but keeps ETags).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key):
+        ttl = current_app.config['PAGE_CACHE_TTL']
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or clock.monotonic() - entry[0] > ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        if not current_app.config['PAGE_CACHE_TTL']:
+            return
+        with self._lock:
+            self._entries[key] = (clock.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > current_app.config['PAGE_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+
+page_cache = PageCache()
+
+def cached_value(name, tables, build):
+    """``build()``, reused until one of ``tables`` changes"""
+    versions = current_versions()
+    key = (name,) + tuple(versions.get(table, 0) for table in tables)
+    value = page_cache.get(key)
+    if value is None:
+        value = build()
+        page_cache.set(key, value)
+    return value
+
+def _page_etag(tables, view_args):
+    versions = current_versions()
+    key = (
+        request.endpoint, sorted(view_args.items()), sorted(request.args.items(multi=True)),
+        current_user.role if current_user.is_authenticated else None, date.today(),
+        [versions.get(table, 0) for table in tables],
+    )
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+def cached_page(*tables):
+    """Conditional-GET and server-side caching for a page that only changes with ``tables``.
+
+    The ETag is computed before the view runs, so a matching If-None-Match
+    is answered with 304 without loading models or rendering. The page must
+    not show anything specific to the logged-in user beyond their role.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET' or '_flashes' in session:
+                return f(*args, **kwargs)
+
+            etag = _page_etag(tables, kwargs)
+            # Weak comparison, since compressed responses carry the weak form of the ETag
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                body = page_cache.get(etag)
+                if body is None:
+                    response = make_response(f(*args, **kwargs))
+                    # Redirects, errors and pages that flashed a message are not shared
+                    if response.status_code != 200 or session.modified:
+                        return response
+                    page_cache.set(etag, response.get_data())
+                else:
+                    response = current_app.response_class(body, mimetype='text/html')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+def _collect_bumps(session):
+    touched = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Doctor):
+            touched.add('doctors')
+        elif isinstance(obj, (Availability, AvailabilityException)):
+            touched.add('availability')
+        elif isinstance(obj, Department):
+            touched.add('departments')
+        elif isinstance(obj, Patient):
+            touched.add('patients')
+        elif isinstance(obj, User) and obj.role in ('doctor', 'patient'):
+            touched.add(obj.role + 's')  # pages show the account's email and active flag
+    return {version_key(table): 1 for table in touched}
+
+def _after_flush(session, flush_context):
+    bumps = _collect_bumps(session)
+    if bumps:
+        apply_deltas(session.connection(), bumps)
+
+def _before_commit(session):
+    # Bulk availability deletes skip flush events and only flag the calendar cache
+    if session.info.get('calendar_stale'):
+        apply_deltas(session.connection(), {version_key('availability'): 1})
+
+def register_page_cache_events():
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'before_commit', _before_commit)
@@ -0,0 +1,105 @@
+import base64
+import json
+from datetime import date, time, datetime
+from flask import request, url_for, current_app, abort
+from sqlalchemy import tuple_, literal
+
+class KeysetPage:
+    """One page of rows from keyset_paginate, with links to its neighbours"""
+
+    def __init__(self, items, next_cursor, prev_cursor, prefix):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.prefix = prefix
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def next_url(self):
+        return self._url('after', self.next_cursor) if self.has_next else None
+
+    @property
+    def prev_url(self):
+        return self._url('before', self.prev_cursor) if self.has_prev else None
+
+    def _url(self, direction, cursor):
+        args = request.args.to_dict()
+        args.pop(self.prefix + 'after', None)
+        args.pop(self.prefix + 'before', None)
+        args[self.prefix + direction] = cursor
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+def encode_cursor(values):
+    payload = [v.isoformat() if isinstance(v, (date, time, datetime)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(payload) != len(columns):
+            raise ValueError('cursor does not match sort key')
+        values = []
+        for value, column in zip(payload, columns):
+            python_type = column.type.python_type
+            if python_type in (date, time, datetime):
+                value = python_type.fromisoformat(value)
+            values.append(python_type(value) if python_type in (int, str) else value)
+        return values
+    except (ValueError, TypeError):
+        abort(400)
+
+def get_page_size(per_page=None):
+    default = current_app.config['PAGE_SIZE']
+    per_page = per_page or request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+
+def keyset_paginate(query, columns, descending=False, prefix='', per_page=None):
+    """Seek-paginate ``query`` on ``columns`` using ``after``/``before`` cursors.
+
+    ``columns`` must end with a unique column (normally the primary key) so the
+    sort key is total. Each page costs one indexed range scan of ``per_page + 1``
+    rows regardless of how deep into the table it is.
+    """
+    per_page = get_page_size(per_page)
+    after = request.args.get(prefix + 'after')
+    before = request.args.get(prefix + 'before') if not after else None
+    backwards = before is not None
+
+    cursor = after or before
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        key = tuple_(*columns)
+        bound = tuple_(*[literal(value, column.type) for value, column in zip(values, columns)])
+        # Walking forward through a descending order means moving to smaller keys
+        query = query.filter(key < bound if descending != backwards else key > bound)
+
+    reverse = descending != backwards
+    rows = query.order_by(None).order_by(
+        *[column.desc() if reverse else column.asc() for column in columns]
+    ).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    key_of = lambda row: encode_cursor([getattr(row, column.key) for column in columns])
+    has_next = has_more if not backwards else True
+    has_prev = after is not None if not backwards else has_more
+    return KeysetPage(rows,
+                      key_of(rows[-1]) if rows and has_next else None,
+                      key_of(rows[0]) if rows and has_prev else None,
+                      prefix)
@@ -0,0 +1,43 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# hashlib's scrypt and pbkdf2 release the GIL, so a small thread pool runs
+# hashes on separate cores while capping how many run at once; requests
+# queue for a worker instead of every thread burning a core.
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_method_params = {}
+
+def _executor():
+    global _pool, _pool_pid
+    with _lock:
+        # Worker threads don't survive a fork, so each process gets its own pool
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=current_app.config['PASSWORD_HASH_WORKERS'],
+                                       thread_name_prefix='password-hash')
+            _pool_pid = os.getpid()
+        return _pool
+
+def hash_method():
+    return current_app.config['PASSWORD_HASH_METHOD']
+
+def hash_password(password):
+    """Hash with the configured method on the hashing pool"""
+    return _executor().submit(generate_password_hash, password, hash_method()).result()
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash on the hashing pool"""
+    return _executor().submit(check_password_hash, password_hash, password).result()
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with a different method or cost than configured"""
+    method = hash_method()
+    if method not in _method_params:
+        # Werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1");
+        # hash once to learn the full form it writes for this setting
+        _method_params[method] = generate_password_hash('', method).split('$', 1)[0]
+    return password_hash.split('$', 1)[0] != _method_params[method]
@@ -0,0 +1,56 @@
+from sqlalchemy.orm import joinedload, selectinload
+from app.models.appointment import Appointment
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+from app.models.history import AppointmentHistory, TreatmentHistory
+
+# Relationships each list view renders, as dotted paths from the root model.
+# Everything a template touches per row belongs here so the page renders in
+# a fixed number of queries no matter how many rows it shows.
+VIEW_RELATIONS = {
+    'admin.appointments': (Appointment, ('patient', 'doctor.department')),
+    'admin.upcoming_appointments': (Appointment, ('patient', 'doctor.department')),
+    'admin.doctors': (Doctor, ('user', 'department')),
+    'admin.patients': (Patient, ('user',)),
+    'admin.patient_history': (AppointmentHistory, ('doctor.department', 'treatment')),
+    'doctor.appointments': (Appointment, ('patient', 'treatment')),
+    'doctor.patient_history': (AppointmentHistory, ('treatment',)),
+    'patient.appointments': (Appointment, ('doctor', 'treatment')),
+    'patient.medical_history': (AppointmentHistory, ('doctor', 'treatment')),
+    'patient.doctors': (Doctor, ('department',)),
+    'doctor_detail': (Doctor, ('user', 'department')),
+    'treatment_view': (TreatmentHistory, ('appointment.patient', 'appointment.doctor')),
+    'api.appointments': (Appointment, ('doctor', 'patient', 'treatment')),
+}
+
+# Total sort keys for keyset pagination; each ends with the primary key
+APPOINTMENT_KEY = (Appointment.date, Appointment.time, Appointment.id)
+HISTORY_KEY = (AppointmentHistory.date, AppointmentHistory.time, AppointmentHistory.id)
+DOCTOR_KEY = (Doctor.id,)
+PATIENT_KEY = (Patient.id,)
+
+def eager_options(model, paths):
+    """Build loader options for dotted relationship paths.
+
+    Scalar relationships (many-to-one, one-to-one) are joined into the main
+    query; collections, and relationships declared ``lazy='selectin'``, are
+    fetched with one extra SELECT ... IN per level.
+    """
+    options = []
+    for path in paths:
+        option, current = None, model
+        for name in path.split('.'):
+            attr = getattr(current, name)
+            prop = attr.property
+            if prop.lazy == 'dynamic':
+                raise ValueError(f'{current.__name__}.{name} is a dynamic relationship and cannot be eager loaded')
+            loader = selectinload if prop.uselist or prop.lazy == 'selectin' else joinedload
+            option = loader(attr) if option is None else getattr(option, loader.__name__)(attr)
+            current = prop.mapper.class_
+        options.append(option)
+    return options
+
+def view_query(view, *extra_paths):
+    """Return ``Model.query`` preloaded with the relationships a view renders."""
+    model, paths = VIEW_RELATIONS[view]
+    return model.query.options(*eager_options(model, paths + extra_paths))
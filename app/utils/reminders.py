@@ -0,0 +1,149 @@
+import json
+import threading
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, exists, insert, or_, select, update
+from werkzeug.utils import import_string
+from app import db
+from app.models.appointment import Appointment
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+from app.models.reminder import AppointmentReminder
+from app.models.user import User
+from app.utils.jobs import enqueue, register_job
+from app.utils.metrics import metrics
+from app.utils.slots import ACTIVE_STATUSES
+
+class LogBackend:
+    """Writes each reminder to the app log; the default until a real channel (email, SMS) is plugged in"""
+
+    def __init__(self, app):
+        self.logger = app.logger
+
+    def send(self, window, reminders):
+        for reminder in reminders:
+            self.logger.info('Reminder to %s <%s>: appointment with %s on %s at %s', reminder['patient'],
+                             reminder['email'], reminder['doctor'], reminder['date'], reminder['time'])
+
+class FileBackend:
+    """Appends one JSON line per reminder to REMINDER_FILE; a stand-in for tests and local development"""
+
+    def __init__(self, app):
+        self.path = app.config['REMINDER_FILE']
+        self._lock = threading.Lock()
+
+    def send(self, window, reminders):
+        lines = ''.join(json.dumps({'window': window.isoformat(), **reminder}) + '\n' for reminder in reminders)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+REMINDER_BACKENDS = {'log': LogBackend, 'file': FileBackend}
+
+def reminder_backend():
+    """The REMINDER_BACKEND for this app: 'log', 'file' or an importable ``module:Class`` constructed with the app.
+
+    A backend has ``send(window, reminders)``, where ``window`` is the start
+    of the time window the batch covers and each reminder is a dict. It
+    should raise if delivery failed, so the job is retried.
+    """
+    app = current_app._get_current_object()
+    backend = app.extensions.get('reminder_backend')
+    if backend is None:
+        name = app.config['REMINDER_BACKEND']
+        backend = app.extensions['reminder_backend'] = (REMINDER_BACKENDS.get(name) or import_string(name))(app)
+    return backend
+
+def _window(day, at_time, minutes):
+    # Start of the REMINDER_WINDOW_MINUTES window, counted from midnight, that an appointment falls in
+    start = datetime.combine(day, at_time).replace(second=0, microsecond=0)
+    return start - timedelta(minutes=(start.hour * 60 + start.minute) % minutes)
+
+def scan_reminders():
+    """Claim a reminder for each active appointment starting within REMINDER_LEAD_HOURS and queue their delivery.
+
+    The appointments come from one range over idx_datetime, and the unique
+    slot index on appointment_reminders skips any already claimed. They are
+    grouped by REMINDER_WINDOW_MINUTES of appointment time into one delivery
+    job per window (split at REMINDER_BATCH_SIZE). Returns how many were queued.
+    """
+    config = current_app.config
+    now = datetime.now()
+    horizon = now + timedelta(hours=config['REMINDER_LEAD_HOURS'])
+    appointments, reminders = Appointment.__table__, AppointmentReminder.__table__
+
+    # Claims and jobs are written in the same transaction as the read, so concurrent scans can't both claim a slot
+    db.session.commit()
+    db.session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+    rows = db.session.execute(select(appointments.c.id, appointments.c.date, appointments.c.time).where(
+        appointments.c.date.between(now.date(), horizon.date()),
+        or_(appointments.c.date > now.date(), appointments.c.time >= now.time()),
+        or_(appointments.c.date < horizon.date(), appointments.c.time < horizon.time()),
+        appointments.c.status.in_(ACTIVE_STATUSES),
+        ~exists().where(reminders.c.appointment_id == appointments.c.id, reminders.c.date == appointments.c.date,
+                        reminders.c.time == appointments.c.time),
+    ).order_by(appointments.c.date, appointments.c.time)).all()
+
+    windows = {}
+    for row in rows:
+        windows.setdefault(_window(row.date, row.time, config['REMINDER_WINDOW_MINUTES']), []).append(row)
+    size = config['REMINDER_BATCH_SIZE']
+    for window, batch in windows.items():
+        for start in range(0, len(batch), size):
+            ids = db.session.scalars(insert(reminders).returning(reminders.c.id), [
+                {'appointment_id': row.id, 'date': row.date, 'time': row.time, 'status': 'queued',
+                 'created_at': datetime.utcnow()} for row in batch[start:start + size]
+            ]).all()
+            enqueue('reminders.deliver', {'window': window.isoformat(), 'reminder_ids': ids})
+    db.session.commit()
+    return len(rows)
+
+def deliver_reminders(window, reminder_ids):
+    """Hand one window's reminders to the delivery backend, then mark them sent.
+
+    Appointments cancelled or moved since the scan are skipped; a moved one
+    gets a reminder for its new slot from a later scan. If the backend
+    raises, the job is retried and the batch sent again: delivery is at
+    least once.
+    """
+    rows = db.session.execute(select(
+        AppointmentReminder.id, AppointmentReminder.date, AppointmentReminder.time, AppointmentReminder.appointment_id,
+        Appointment.status, Appointment.date.label('appointment_date'), Appointment.time.label('appointment_time'),
+        Patient.name.label('patient'), User.email, Doctor.name.label('doctor'),
+    ).outerjoin(Appointment, Appointment.id == AppointmentReminder.appointment_id).outerjoin(
+        Patient, Patient.id == Appointment.patient_id
+    ).outerjoin(User, User.id == Patient.user_id).outerjoin(
+        Doctor, Doctor.id == Appointment.doctor_id
+    ).where(AppointmentReminder.id.in_(reminder_ids), AppointmentReminder.status == 'queued')).all()
+    current = [row for row in rows if row.status in ACTIVE_STATUSES
+               and (row.appointment_date, row.appointment_time) == (row.date, row.time)]
+    skipped = sorted({row.id for row in rows} - {row.id for row in current})
+    db.session.commit()  # don't hold a read transaction open while the backend works
+
+    if current:
+        reminder_backend().send(datetime.fromisoformat(window), [
+            {'appointment_id': row.appointment_id, 'patient': row.patient, 'email': row.email, 'doctor': row.doctor,
+             'date': row.date.isoformat(), 'time': row.time.strftime('%H:%M')} for row in current
+        ])
+
+    db.session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+    if current:
+        db.session.execute(update(AppointmentReminder).where(AppointmentReminder.id.in_([row.id for row in current]))
+                           .values(status='sent', sent_at=datetime.utcnow()))
+    if skipped:
+        db.session.execute(update(AppointmentReminder).where(AppointmentReminder.id.in_(skipped)).values(status='skipped'))
+    db.session.commit()
+    metrics.inc('hospital_reminders_total', len(current), outcome='sent')
+    metrics.inc('hospital_reminders_total', len(skipped), outcome='skipped')
+
+def prune_reminders():
+    """Forget reminders for appointments more than JOB_RETENTION_DAYS in the past"""
+    cutoff = date.today() - timedelta(days=current_app.config['JOB_RETENTION_DAYS'])
+    removed = db.session.execute(delete(AppointmentReminder).where(AppointmentReminder.date < cutoff)).rowcount
+    db.session.commit()
+    return removed
+
+def register_reminder_jobs(app):
+    # A REMINDER_SCAN_SECONDS of 0 stops new reminders; queued deliveries still run
+    register_job('reminders.scan', scan_reminders, every=app.config['REMINDER_SCAN_SECONDS'])
+    register_job('reminders.deliver', deliver_reminders)
+    register_job('reminders.prune', prune_reminders, every=24 * 3600)
@@ -0,0 +1,155 @@
+import threading
+import time as clock
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import event, literal
+from app import db
+from app.models.doctor import Doctor
+from app.models.availability import Availability
+from app.models.availability_exception import AvailabilityException
+
+def merge_intervals(intervals):
+    """Sort and merge overlapping or touching (start, end) intervals"""
+    merged = []
+    for start, end in sorted(i for i in intervals if i[0] < i[1]):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def subtract_interval(intervals, start, end):
+    """Remove [start, end) from a merged interval list"""
+    result = []
+    for s, e in intervals:
+        if e <= start or s >= end:
+            result.append((s, e))
+            continue
+        if s < start:
+            result.append((s, start))
+        if e > end:
+            result.append((end, e))
+    return result
+
+class DoctorCalendar:
+    """Per-doctor cache of merged weekly intervals plus upcoming date exceptions.
+
+    Entries are dropped when a commit touches the doctor's availability or
+    exceptions, and expire after CALENDAR_CACHE_TTL seconds so edits made by
+    other worker processes are picked up too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def invalidate(self, doctor_ids=None):
+        with self._lock:
+            if doctor_ids is None:
+                self._entries.clear()
+            for doctor_id in doctor_ids or ():
+                self._entries.pop(doctor_id, None)
+
+    def get(self, doctor_id):
+        ttl = current_app.config['CALENDAR_CACHE_TTL']
+        with self._lock:
+            entry = self._entries.get(doctor_id)
+        if entry is None or clock.monotonic() - entry[0] > ttl:
+            entry = (clock.monotonic(),) + self._load(doctor_id)
+            with self._lock:
+                self._entries[doctor_id] = entry
+        return entry[1], entry[2]
+
+    def _load(self, doctor_id):
+        # Weekly rows and upcoming exceptions come back in one UNION ALL query
+        weekly_rows = db.session.query(
+            Availability.day_of_week, literal(None, db.Date).label('date'),
+            Availability.start_time, Availability.end_time, Availability.is_available
+        ).filter(Availability.doctor_id == doctor_id, Availability.is_available == True)
+        exception_rows = db.session.query(
+            literal(None, db.Integer), AvailabilityException.date,
+            AvailabilityException.start_time, AvailabilityException.end_time, AvailabilityException.is_available
+        ).filter(AvailabilityException.doctor_id == doctor_id, AvailabilityException.date >= date.today())
+
+        weekly = {day: [] for day in range(7)}
+        exceptions = {}
+        for day_of_week, exception_date, start_time, end_time, is_available in weekly_rows.union_all(exception_rows):
+            if exception_date is None:
+                weekly[day_of_week].append((start_time, end_time))
+            else:
+                exceptions.setdefault(exception_date, []).append((start_time, end_time, bool(is_available)))
+        return {day: merge_intervals(intervals) for day, intervals in weekly.items()}, exceptions
+
+doctor_calendar = DoctorCalendar()
+
+def weekly_schedule(doctor_id):
+    """``{weekday: [(start, end), ...]}`` of merged weekly availability"""
+    return doctor_calendar.get(doctor_id)[0]
+
+def resolve_day(weekly, exceptions, day):
+    intervals = list(weekly[day.weekday()])
+    day_exceptions = exceptions.get(day, ())
+    # Extra openings first, then closures, so a closure always wins
+    for start, end, is_available in day_exceptions:
+        if is_available and start and end:
+            intervals = merge_intervals(intervals + [(start, end)])
+    for start, end, is_available in day_exceptions:
+        if not is_available:
+            intervals = subtract_interval(intervals, start, end) if start and end else []
+    return intervals
+
+def resolve_availability(doctor_id, start_date, days=7):
+    """``{date: [(start, end), ...]}`` of actual availability for each day in the range"""
+    weekly, exceptions = doctor_calendar.get(doctor_id)
+    return {day: resolve_day(weekly, exceptions, day)
+            for day in (start_date + timedelta(days=offset) for offset in range(days))}
+
+def available_at(doctor_id, day, at_time):
+    return any(start <= at_time < end for start, end in resolve_availability(doctor_id, day, 1)[day])
+
+def set_weekday_intervals(doctor_id, day_of_week, intervals):
+    """Replace a weekday's availability rows with the given intervals, merged"""
+    # The bulk delete skips ORM events, so flag the doctor's cache entry directly
+    db.session.info.setdefault('calendar_stale', set()).add(doctor_id)
+    Availability.query.filter_by(doctor_id=doctor_id, day_of_week=day_of_week).delete()
+    for start, end in merge_intervals(intervals):
+        db.session.add(Availability(doctor_id=doctor_id, day_of_week=day_of_week,
+                                    start_time=start, end_time=end, is_available=True))
+
+def normalize_availability():
+    """Merge every doctor's weekly rows into non-overlapping intervals; returns rows removed"""
+    before = Availability.query.count()
+    rows = db.session.query(Availability.doctor_id, Availability.day_of_week,
+                            Availability.start_time, Availability.end_time, Availability.is_available).all()
+    grouped = {}
+    for doctor_id, day_of_week, start, end, is_available in rows:
+        intervals = grouped.setdefault((doctor_id, day_of_week), [])
+        if is_available:
+            intervals.append((start, end))
+    for (doctor_id, day_of_week), intervals in grouped.items():
+        set_weekday_intervals(doctor_id, day_of_week, intervals)
+    db.session.commit()
+    doctor_calendar.invalidate()
+    return before - Availability.query.count()
+
+def _after_flush(session, flush_context):
+    touched = session.info.setdefault('calendar_stale', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Availability, AvailabilityException)):
+            touched.add(obj.doctor_id)
+        elif isinstance(obj, Doctor):
+            touched.add(obj.id)
+
+def _after_commit(session):
+    touched = session.info.pop('calendar_stale', None)
+    if touched:
+        doctor_calendar.invalidate(touched)
+
+def _after_rollback(session):
+    session.info.pop('calendar_stale', None)
+
+def register_calendar_events():
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
@@ -0,0 +1,84 @@
+import re
+from sqlalchemy import event, false, table, column, text
+from app import db
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+
+# Strips the usual phone separators so "555-123 4567" is also indexed as 5551234567
+_PHONE_DIGITS = "replace(replace(replace(replace(replace(coalesce(new.phone, ''), '-', ''), ' ', ''), '(', ''), ')', ''), '+', '')"
+
+# FTS5 tables mirror their source table by rowid and are kept current by
+# triggers, so every write path (ORM, bulk SQL, imports) updates them.
+SEARCH_INDEXES = {
+    Doctor.__table__: ('doctor_fts', [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS doctor_fts USING fts5(name, specialization, prefix='2 3')",
+        """CREATE TRIGGER IF NOT EXISTS doctor_fts_insert AFTER INSERT ON doctors BEGIN
+            INSERT INTO doctor_fts(rowid, name, specialization) VALUES (new.id, new.name, new.specialization);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS doctor_fts_update AFTER UPDATE OF name, specialization ON doctors BEGIN
+            UPDATE doctor_fts SET name = new.name, specialization = new.specialization WHERE rowid = old.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS doctor_fts_delete AFTER DELETE ON doctors BEGIN
+            DELETE FROM doctor_fts WHERE rowid = old.id;
+        END""",
+    ], "INSERT INTO doctor_fts(rowid, name, specialization) SELECT id, name, specialization FROM doctors"),
+    Patient.__table__: ('patient_fts', [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS patient_fts USING fts5(name, phone, prefix='2 3')",
+        f"""CREATE TRIGGER IF NOT EXISTS patient_fts_insert AFTER INSERT ON patients BEGIN
+            INSERT INTO patient_fts(rowid, name, phone) VALUES (new.id, new.name, coalesce(new.phone, '') || ' ' || {_PHONE_DIGITS});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS patient_fts_update AFTER UPDATE OF name, phone ON patients BEGIN
+            UPDATE patient_fts SET name = new.name, phone = coalesce(new.phone, '') || ' ' || {_PHONE_DIGITS} WHERE rowid = old.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS patient_fts_delete AFTER DELETE ON patients BEGIN
+            DELETE FROM patient_fts WHERE rowid = old.id;
+        END""",
+    ], "INSERT INTO patient_fts(rowid, name, phone) SELECT id, name, coalesce(phone, '') || ' ' || "
+       + _PHONE_DIGITS.replace('new.', '') + " FROM patients"),
+}
+
+doctor_fts = table('doctor_fts', column('rowid'), column('rank'), column('doctor_fts'))
+patient_fts = table('patient_fts', column('rowid'), column('rank'), column('patient_fts'))
+
+def _create_index(target, connection, **kw):
+    for statement in SEARCH_INDEXES[target][1]:
+        connection.execute(text(statement))
+
+def _drop_index(target, connection, **kw):
+    connection.execute(text(f'DROP TABLE IF EXISTS {SEARCH_INDEXES[target][0]}'))
+
+def register_search_events():
+    for source in SEARCH_INDEXES:
+        if not event.contains(source, 'after_create', _create_index):
+            event.listen(source, 'after_create', _create_index)
+            event.listen(source, 'before_drop', _drop_index)
+
+def rebuild_search_index():
+    """(Re)create the FTS tables and triggers and repopulate them from the source tables"""
+    connection = db.session.connection()
+    for source, (name, statements, populate) in SEARCH_INDEXES.items():
+        _drop_index(source, connection)
+        _create_index(source, connection)
+        connection.execute(text(populate))
+    db.session.commit()
+
+def fts_query(search):
+    """Turn free text into an FTS5 query: every word must match as a prefix"""
+    terms = re.findall(r'\w+', search or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def _match(query, model, index, search):
+    match = fts_query(search)
+    if not match:
+        return query.filter(false())
+    return query.join(index, index.c.rowid == model.id).filter(
+        getattr(index.c, index.name).op('MATCH')(match)
+    ).order_by(index.c.rank)
+
+def search_doctors(query, search):
+    """Restrict a Doctor query to full-text matches on name/specialization, best match first"""
+    return _match(query, Doctor, doctor_fts, search)
+
+def search_patients(query, search):
+    """Restrict a Patient query to full-text matches on name/phone, best match first"""
+    return _match(query, Patient, patient_fts, search)
@@ -0,0 +1,97 @@
+from datetime import datetime, date, time, timedelta
+from flask import current_app
+from app import db
+from app.models.appointment import Appointment
+from app.models.slot_hold import SlotHold
+from app.utils.schedule import resolve_availability
+from app.utils.holds import active_holds
+
+ACTIVE_STATUSES = ('booked', 'rescheduled')
+STATUSES = ACTIVE_STATUSES + ('completed', 'cancelled')
+
+def _minutes(t):
+    return t.hour * 60 + t.minute
+
+def _ceil_div(a, b):
+    return -(-a // b)
+
+def slot_interval():
+    return current_app.config['SLOT_INTERVAL_MINUTES']
+
+def interval_mask(start_time, end_time, interval):
+    """Bits for every slot whose start falls in [start_time, end_time)"""
+    lo = _ceil_div(_minutes(start_time), interval)
+    hi = _ceil_div(_minutes(end_time), interval)
+    return ((1 << (hi - lo)) - 1) << lo if hi > lo else 0
+
+def slot_index(t, interval):
+    """Bit position of a slot start time, or None if ``t`` is off the grid"""
+    minutes = _minutes(t)
+    if t.second or t.microsecond or minutes % interval:
+        return None
+    return minutes // interval
+
+def slot_times(bitmap, interval=None):
+    interval = interval or slot_interval()
+    times = []
+    while bitmap:
+        low = bitmap & -bitmap
+        minutes = (low.bit_length() - 1) * interval
+        times.append(time(minutes // 60, minutes % 60))
+        bitmap ^= low
+    return times
+
+def free_slots(doctor_id, start_date=None, days=7, interval=None, patient_id=None):
+    """Free bookable slots per day as ``{date: bitmap}``, bit ``i`` = slot at ``i * interval`` minutes.
+
+    Each day's resolved availability (weekly schedule plus exceptions, from the
+    calendar cache) becomes a mask, then active bookings, other patients'
+    unexpired holds and (for today) already-past slots are cleared. Costs one
+    query for the whole range once the doctor's calendar is cached.
+    """
+    interval = interval or slot_interval()
+    start_date = start_date or date.today()
+    end_date = start_date + timedelta(days=days)
+
+    availability = resolve_availability(doctor_id, start_date, days)
+
+    appointments = db.session.query(Appointment.date, Appointment.time).filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.date >= start_date, Appointment.date < end_date,
+        Appointment.status.in_(ACTIVE_STATUSES)
+    )
+    holds = active_holds(doctor_id, exclude_patient_id=patient_id).filter(
+        SlotHold.date >= start_date, SlotHold.date < end_date
+    ).with_entities(SlotHold.date, SlotHold.time)
+
+    booked = {}
+    for apt_date, apt_time in appointments.union_all(holds):
+        index = slot_index(apt_time, interval)
+        if index is not None:
+            booked[apt_date] = booked.get(apt_date, 0) | (1 << index)
+
+    now = datetime.now()
+    slots = {}
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        bitmap = 0
+        for start_time, end_time in availability[day]:
+            bitmap |= interval_mask(start_time, end_time, interval)
+        bitmap &= ~booked.get(day, 0)
+        if day == now.date():
+            bitmap &= ~((1 << (_minutes(now.time()) // interval + 1)) - 1)
+        elif day < now.date():
+            bitmap = 0
+        slots[day] = bitmap
+    return slots
+
+def slot_is_free(slots, day, at_time, interval=None):
+    """Whether ``at_time`` on ``day`` is set in a ``free_slots`` result"""
+    index = slot_index(at_time, interval or slot_interval())
+    return index is not None and bool(slots.get(day, 0) >> index & 1)
+
+def free_slot_schedule(doctor_id, start_date=None, days=7, patient_id=None, slots=None):
+    """``[(date, [time, ...]), ...]`` for templates"""
+    interval = slot_interval()
+    slots = slots if slots is not None else free_slots(doctor_id, start_date, days, interval, patient_id)
+    return [(day, slot_times(bitmap, interval)) for day, bitmap in slots.items()]
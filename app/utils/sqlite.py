@@ -0,0 +1,149 @@
+import os
+from sqlalchemy import event, inspect, literal
+from sqlalchemy.engine import make_url
+from app import db
+
+class ReadOnlySessionError(RuntimeError):
+    """An ORM write was flushed from a session marked read-only"""
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database, with pool sizing from config.
+
+    In-memory SQLite uses a single static connection, so pool sizing only
+    applies to file databases.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite' or url.database not in (None, '', ':memory:'):
+        options.setdefault('pool_size', config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    return options
+
+# Pragmas that are per database file, so they are repeated for every attached database
+SCHEMA_PRAGMAS = ('journal_mode', 'synchronous')
+
+def attached_databases(url, config):
+    """``{schema: path}`` of the SQLite files to ATTACH to every connection of the database at ``url``.
+
+    The archive defaults to ``<name>_archive.db`` next to the main file, so
+    each database (including benchmark copies) gets its own.
+    """
+    if url.get_backend_name() != 'sqlite':
+        return {}
+    path = config['ARCHIVE_DATABASE_PATH']
+    if not path:
+        if url.database in (None, '', ':memory:'):
+            path = ':memory:'
+        else:
+            root, ext = os.path.splitext(url.database)
+            path = f'{root}_archive{ext or ".db"}'
+    return {'archive': path}
+
+def configure_sqlite_engine(engine, pragmas=None, attached=None):
+    """Hand transaction control from pysqlite to SQLAlchemy, apply pragmas and ATTACH databases per connection.
+
+    pysqlite normally issues its own deferred BEGIN right before the first
+    write. With that disabled, SQLAlchemy's ``begin`` emits the BEGIN itself,
+    so a transaction can ask for the write lock up front with the
+    ``sqlite_begin='IMMEDIATE'`` execution option.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = dict(pragmas or {})
+
+    @event.listens_for(engine, 'connect')
+    def _configure_connection(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if value is not None:
+                cursor.execute(f'PRAGMA {name} = {value}')
+                cursor.fetchall()
+        for schema, path in (attached or {}).items():
+            cursor.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+            for name in SCHEMA_PRAGMAS:
+                if pragmas.get(name) is not None:
+                    cursor.execute(f'PRAGMA {schema}.{name} = {pragmas[name]}')
+                    cursor.fetchall()
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _begin(connection):
+        mode = connection.get_execution_options().get('sqlite_begin', 'DEFERRED')
+        connection.exec_driver_sql(f'BEGIN {mode}')
+
+def _add_column_ddl(connection, column):
+    """``ALTER TABLE ... ADD COLUMN`` for ``column``, or None if SQLite can't add it to a table with rows"""
+    if column.primary_key or column.unique:
+        return None
+    dialect, preparer = connection.dialect, connection.dialect.identifier_preparer
+    spec = dialect.ddl_compiler(dialect, None).get_column_specification(column)
+    if not column.nullable and column.server_default is None:
+        default = column.default
+        if default is None or not default.is_scalar:
+            return None
+        # Existing rows get the model's Python default
+        value = literal(default.arg, column.type).compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+        spec = f'{preparer.format_column(column)} {column.type.compile(dialect=dialect)} DEFAULT {value} NOT NULL'
+    return f'ALTER TABLE {preparer.format_table(column.table)} ADD COLUMN {spec}'
+
+class SchemaSyncError(RuntimeError):
+    """The database differs from the models in a way sync_schema can't fix"""
+
+def sync_schema(engine, metadata):
+    """Create the model tables, columns and indexes a database lacks, and rebuild indexes whose columns changed.
+
+    ``create_all`` skips tables that already exist, so anything added to a
+    model after the database was created never reaches it otherwise. Tables
+    in attached databases create their own indexes (see archive.py).
+    Returns what was created. Raises SchemaSyncError, changing nothing, for
+    a missing column SQLite can't add (a key, or NOT NULL with no default).
+    """
+    created = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        tables = [table for table in metadata.sorted_tables if not table.schema]
+        missing = {}  # existing table: its model columns the database lacks
+        for table in tables:
+            if inspector.has_table(table.name):
+                present = {column['name'] for column in inspector.get_columns(table.name)}
+                missing[table] = [column for column in table.columns if column.name not in present]
+        # Checked up front: pysqlite commits DDL as it goes unless configure_sqlite_engine took over transactions
+        unfixable = [f'{table.name}.{column.name}' for table, columns in missing.items()
+                     for column in columns if _add_column_ddl(connection, column) is None]
+        if unfixable:
+            raise SchemaSyncError(f'Cannot add {", ".join(unfixable)} to existing tables; nothing was changed')
+        for table in tables:
+            if table not in missing:
+                table.create(connection)
+                created += [table.name] + [index.name for index in table.indexes]
+                continue
+            for column in missing[table]:
+                connection.exec_driver_sql(_add_column_ddl(connection, column))
+                created.append(f'{table.name}.{column.name}')
+            existing = {index['name']: index['column_names'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                columns = [column.name for column in index.columns]
+                if existing.get(index.name) == columns:
+                    continue
+                if index.name in existing:
+                    index.drop(connection)
+                index.create(connection)
+                created.append(index.name)
+    return created
+
+def use_read_only_session(read_only=True):
+    """Mark the current request's session read-only (no autoflush, ORM writes refused) or writable"""
+    db.session.autoflush = not read_only
+    db.session.info['read_only'] = read_only
+
+def _before_flush(session, flush_context, instances):
+    if not session.info.get('read_only'):
+        return
+    if session.new or session.deleted or any(session.is_modified(obj) for obj in session.dirty):
+        raise ReadOnlySessionError('ORM changes flushed from a read-only (GET) session')
+
+def register_read_only_events():
+    if not event.contains(db.session, 'before_flush', _before_flush):
+        event.listen(db.session, 'before_flush', _before_flush)
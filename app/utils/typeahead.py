@@ -0,0 +1,84 @@
+import threading
+from bisect import bisect_left
+from app import db
+from app.models.user import User
+from app.models.doctor import Doctor
+from app.models.department import Department
+from app.utils.page_cache import current_versions
+
+class PrefixIndex:
+    """Immutable sorted-array prefix index: lookups bisect to the first matching key.
+
+    Every word of a label is indexed as its own key (``"interventional
+    cardiology"`` and ``"cardiology"``), so prefixes of any word match.
+    """
+
+    def __init__(self, entries=()):
+        self._labels = {}
+        pairs = []
+        for ref, label in entries:
+            words = label.lower().split()
+            self._labels[ref] = label
+            pairs += [(' '.join(words[i:]), ref) for i in range(len(words))]
+        pairs.sort(key=lambda pair: pair[0])
+        self._keys = [key for key, ref in pairs]
+        self._refs = [ref for key, ref in pairs]
+
+    def __len__(self):
+        return len(self._labels)
+
+    def search(self, prefix, limit):
+        prefix = ' '.join(prefix.lower().split())
+        results, seen = [], set()
+        i = bisect_left(self._keys, prefix)
+        while i < len(self._keys) and len(results) < limit and self._keys[i].startswith(prefix):
+            ref = self._refs[i]
+            if ref not in seen:
+                seen.add(ref)
+                results.append((ref, self._labels[ref]))
+            i += 1
+        return results
+
+class DoctorTypeahead:
+    """Process-local suggestions over active doctors, specializations and departments.
+
+    Built lazily on first use and rebuilt when the shared 'doctors' or
+    'departments' version moves, so changes committed by any worker process
+    or CLI command (``flask import``) show up on the next lookup.
+    """
+
+    TABLES = ('doctors', 'departments')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._versions = None
+
+    def reset(self):
+        with self._lock:
+            self._index = None
+
+    def search(self, prefix, limit):
+        versions = current_versions()
+        key = tuple(versions.get(table, 0) for table in self.TABLES)
+        with self._lock:
+            # Versions only go up; a request that read them before the last rebuild keeps the newer index
+            if self._index is None or any(new > built for new, built in zip(key, self._versions)):
+                self._index = self._build()
+                self._versions = key
+            return self._index.search(prefix, limit)
+
+    def _build(self):
+        entries, specializations = [], {}
+        doctors = db.session.query(Doctor.id, Doctor.name, Doctor.specialization).join(
+            User, Doctor.user_id == User.id
+        ).filter(User.is_active == True)
+        for doctor_id, name, specialization in doctors:
+            entries.append((('doctor', doctor_id), name))
+            specializations.setdefault(specialization.strip().lower(), specialization.strip())
+        entries += [(('specialization', key), label) for key, label in specializations.items()]
+        entries += [(('department', department_id), name)
+                    for department_id, name in db.session.query(Department.id, Department.name)]
+        return PrefixIndex(entries)
+
+doctor_typeahead = DoctorTypeahead()
@@ -1,6 +1,5 @@
 from wtforms.validators import ValidationError
 from app.models.appointment import Appointment
-from app.models.availability import Availability
 from datetime import datetime, date
 
 def validate_active_doctor(form, field):
@@ -34,8 +33,20 @@ def validate_appointment_conflict(form, field):
         if appointment_id:
             query = query.filter(Appointment.id != appointment_id)
         
+        from app.models.slot_hold import SlotHold
+        from app.utils.holds import active_holds
+        from app.utils.metrics import metrics
+        
         if query.first():
+            metrics.inc('hospital_reschedules_total' if appointment_id else 'hospital_bookings_total', outcome='conflict')
             raise ValidationError('This time slot is already booked.')
+        
+        held = active_holds(doctor_id, exclude_patient_id=getattr(form, 'patient_id', None)).filter(
+            SlotHold.date == appointment_date, SlotHold.time == appointment_time
+        )
+        if held.first():
+            metrics.inc('hospital_reschedules_total' if appointment_id else 'hospital_bookings_total', outcome='held')
+            raise ValidationError('This time slot is being held by another patient. Please choose another time.')
 
 def validate_doctor_availability(form, field):
     doctor_id = None
@@ -57,15 +68,14 @@ def validate_doctor_availability(form, field):
         if not doctor or not doctor.user.is_active:
             raise ValidationError('This doctor is currently unavailable for appointments.')
         
-        day_of_week = appointment_date.weekday()
-        availability_slots = Availability.query.filter_by(
-            doctor_id=doctor_id, day_of_week=day_of_week, is_available=True
-        ).all()
+        from app.utils.schedule import resolve_availability
+        
+        availability_slots = resolve_availability(doctor_id, appointment_date, 1)[appointment_date]
         
         if not availability_slots:
             raise ValidationError('Doctor is not available on this day.')
         
-        is_within_slot = any(slot.start_time <= appointment_time < slot.end_time for slot in availability_slots)
+        is_within_slot = any(start <= appointment_time < end for start, end in availability_slots)
         
         if not is_within_slot:
             raise ValidationError('Doctor is not available at this time. Please check the doctor\'s availability schedule.')
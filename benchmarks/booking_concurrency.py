@@ -0,0 +1,103 @@
+"""Race many patients for the same slot and check exactly one booking wins, within a latency bound.
+
+Usage: python benchmarks/booking_concurrency.py [threads] [--max-latency-ms MS]
+Runs against a throwaway SQLite database, never the configured one. Fails
+if any attempt, winning or losing, takes longer than --max-latency-ms, so
+a lock convoy (writers queuing on the busy timeout) is caught.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time as clock
+from datetime import date, time, timedelta
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'booking_bench.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app, db
+from app.models import User, Doctor, Patient, Availability, Appointment
+from app.utils.booking import book_slot, SlotUnavailable
+
+def seed(threads):
+    db.drop_all()
+    db.create_all()
+    user = User(email='doctor@bench.local', role='doctor')
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.flush()
+    doctor = Doctor(user_id=user.id, name='Bench Doctor', specialization='General')
+    db.session.add(doctor)
+    db.session.flush()
+    for day in range(7):
+        db.session.add(Availability(doctor_id=doctor.id, day_of_week=day, start_time=time(9), end_time=time(17)))
+    patient_ids = []
+    for i in range(threads):
+        user = User(email=f'patient{i}@bench.local', role='patient', password_hash='-')
+        db.session.add(user)
+        db.session.flush()
+        patient = Patient(user_id=user.id, name=f'Patient {i}')
+        db.session.add(patient)
+        db.session.flush()
+        patient_ids.append(patient.id)
+    db.session.commit()
+    return doctor.id, patient_ids
+
+def run(threads=32, max_latency_ms=2000):
+    app = create_app()
+    with app.app_context():
+        doctor_id, patient_ids = seed(threads)
+    
+    day = date.today() + timedelta(days=1)
+    barrier = threading.Barrier(threads)
+    results, latencies = [], []
+    lock = threading.Lock()
+    
+    def attempt(patient_id):
+        with app.app_context():
+            barrier.wait()
+            started = clock.perf_counter()
+            try:
+                book_slot(doctor_id, patient_id, day, time(10))
+                outcome = 'booked'
+            except SlotUnavailable:
+                outcome = 'rejected'
+            except Exception as e:
+                outcome = f'error: {e.__class__.__name__}: {e}'
+            with lock:
+                results.append(outcome)
+                latencies.append(clock.perf_counter() - started)
+    
+    workers = [threading.Thread(target=attempt, args=(pid,)) for pid in patient_ids]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    
+    with app.app_context():
+        stored = Appointment.query.filter_by(doctor_id=doctor_id, date=day, time=time(10)).count()
+    
+    latencies.sort()
+    booked = results.count('booked')
+    errors = [r for r in results if r.startswith('error')]
+    print(f'threads:  {threads}')
+    print(f'booked:   {booked}')
+    print(f'rejected: {results.count("rejected")}')
+    print(f'errors:   {len(errors)}')
+    print(f'stored:   {stored}')
+    slowest_ms = latencies[-1] * 1000
+    print(f'latency:  p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, max {slowest_ms:.1f}ms '
+          f'(limit {max_latency_ms:.0f}ms)')
+    for error in sorted(set(errors)):
+        print(f'  {error}')
+    if slowest_ms > max_latency_ms:
+        print(f'  slowest attempt exceeded the {max_latency_ms:.0f}ms limit')
+    return booked == 1 and stored == 1 and not errors and slowest_ms <= max_latency_ms
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('threads', type=int, nargs='?', default=32)
+    parser.add_argument('--max-latency-ms', type=float, default=2000,
+                        help='Fail if any attempt takes longer (default 2000, well under the 5s busy timeout)')
+    args = parser.parse_args()
+    sys.exit(0 if run(args.threads, args.max_latency_ms) else 1)
@@ -0,0 +1,107 @@
+"""Measure bytes on the wire and compression CPU cost for the largest server-rendered pages.
+
+Usage: python benchmarks/compression.py [--scale 10k] [--db PATH] [--iterations 20]
+Pages are rendered once with whitespace collapsing off and once with it on
+(each in its own process, since it is applied when templates compile), then
+compressed with every available encoding and level. CPU is process time per
+compression, averaged over --iterations runs.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time as clock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generate_data import PASSWORD, generate, open_app, parse_scale
+
+PAGES = ['admin_dashboard.appointments', 'admin_patients.list_patients', 'admin_doctors.list_doctors',
+         'patient_appointments.medical_history', 'patient_dashboard.list_doctors']
+MODES = {'raw': {'HTML_COLLAPSE_WHITESPACE': '0'}, 'collapsed': {'HTML_COLLAPSE_WHITESPACE': '1'}}
+
+def settings():
+    """``[(label, encoding, config overrides)]`` for every encoding installed here"""
+    from app.utils.compression import available_encodings
+    available = available_encodings()
+    options = [('identity', None, {})]
+    options += [(f'gzip-{level}', 'gzip', {'COMPRESS_LEVEL': level}) for level in (1, 6, 9)]
+    if 'br' in available:
+        options += [(f'br-{quality}', 'br', {'COMPRESS_BROTLI_QUALITY': quality}) for quality in (4, 11)]
+    if 'zstd' in available:
+        options += [(f'zstd-{level}', 'zstd', {'COMPRESS_ZSTD_LEVEL': level}) for level in (3, 10)]
+    return options
+
+def run_mode(db_path, iterations):
+    from routes import sample_routes
+    app = open_app(db_path)
+    app.config.update(WTF_CSRF_ENABLED=False, COMPRESS_ENABLED=False)
+    from app import db
+    from app.utils.compression import compress
+
+    with app.app_context(), app.test_request_context():
+        routes = sample_routes(db)
+
+    results, clients = {}, {}
+    for name in PAGES:
+        email, url = routes[name]
+        if email not in clients:
+            clients[email] = app.test_client()
+            clients[email].post('/login', data={'email': email, 'password': PASSWORD})
+            clients[email].get('/')  # consume the login flash so it doesn't end up in a page
+        body = clients[email].get(url).data
+
+        results[name] = {}
+        for label, encoding, overrides in settings():
+            if encoding is None:
+                results[name][label] = (len(body), 0.0)
+                continue
+            config = {**app.config, **overrides}
+            started = clock.process_time()
+            for _ in range(iterations):
+                size = len(compress(body, encoding, config))
+            results[name][label] = (size, (clock.process_time() - started) / iterations * 1000)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='10k', help='10k, 100k, 1m or an appointment count')
+    parser.add_argument('--db', help='Reuse this database, or generate into it if missing')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'compression_bench.db')
+    if not os.path.exists(db_path):
+        print(f'Generating {args.scale} dataset into {db_path} ...')
+        app = open_app(db_path)
+        from app import db
+        with app.app_context():
+            generate(db, parse_scale(args.scale))
+
+    results = {}
+    for mode, env in MODES.items():
+        output = subprocess.run([sys.executable, __file__, '--mode', db_path, str(args.iterations)],
+                                env={**os.environ, **env}, capture_output=True, text=True, check=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    for name in PAGES:
+        raw_size = results['raw'][name]['identity'][0]
+        print(f'\n{name}')
+        print(f'{"":12}' + ''.join(f'{mode + " bytes":>18}{"% of raw":>10}{"CPU ms":>9}' for mode in results))
+        for label in results['raw'][name]:
+            line = f'{label:12}'
+            for mode in results:
+                size, cpu = results[mode][name][label]
+                line += f'{size:>18,}{size / raw_size * 100:>9.1f}%{cpu:>9.2f}'
+            print(line)
+
+if __name__ == '__main__':
+    # Keep benchmark runs out of the app's instance/ folder
+    scratch = tempfile.mkdtemp()
+    os.environ.setdefault('METRICS_DIR', os.path.join(scratch, 'metrics'))
+    os.environ.setdefault('JINJA_BYTECODE_CACHE_DIR', os.path.join(scratch, 'jinja'))
+    if sys.argv[1:2] == ['--mode']:
+        print(json.dumps(run_mode(sys.argv[2], int(sys.argv[3]))))
+    else:
+        main()
@@ -0,0 +1,165 @@
+"""Deterministic synthetic hospital data at a chosen scale.
+
+Usage: python benchmarks/generate_data.py DB_PATH [--scale 10k|100k|1m|<n>] [--seed 1]
+Creates (or recreates) the SQLite database at DB_PATH with departments,
+doctors and their weekly availability, patients, a year of appointment
+history plus a month of upcoming bookings, and treatments. Every user's
+password is "bench"; the admin is admin@bench.example.com.
+"""
+import argparse
+import os
+import random
+import sys
+import time as clock
+from datetime import date, time, timedelta
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+PASSWORD = 'bench'
+DEPARTMENTS = {
+    'Cardiology': ['Cardiologist', 'Interventional Cardiology'],
+    'Neurology': ['Neurologist', 'Neurosurgery'],
+    'Orthopedics': ['Orthopedic Surgeon', 'Sports Medicine'],
+    'Pediatrics': ['Pediatrician', 'Neonatology'],
+    'General Medicine': ['General Physician', 'Internal Medicine'],
+    'Dermatology': ['Dermatologist'],
+    'Oncology': ['Oncologist', 'Radiation Oncology'],
+}
+FIRST_NAMES = ['Aarav', 'Ananya', 'Maria', 'James', 'Wei', 'Fatima', 'Lucas', 'Priya', 'Noah', 'Sofia',
+               'Omar', 'Hana', 'Mateo', 'Zara', 'Ethan', 'Ishaan', 'Chloe', 'Arjun', 'Mia', 'Kenji']
+LAST_NAMES = ['Sharma', 'Garcia', 'Smith', 'Chen', 'Khan', 'Silva', 'Patel', 'Kim', 'Nguyen', 'Rossi',
+              'Ali', 'Tanaka', 'Lopez', 'Singh', 'Brown', 'Haddad', 'Cohen', 'Okafor', 'Ivanova', 'Mehta']
+SHIFTS = [[(9, 13), (14, 18)], [(9, 17)], [(8, 12)], [(13, 19)], [(10, 14), (15, 19)]]
+DIAGNOSES = ['Hypertension', 'Migraine', 'Seasonal flu', 'Sprained ankle', 'Eczema', 'Type 2 diabetes',
+             'Bronchitis', 'Lower back pain', 'Anemia', 'Routine check-up']
+BLOOD_GROUPS = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+CHUNK = 10_000
+
+def parse_scale(value):
+    return SCALES.get(value.lower()) or int(value)
+
+def _name(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+def _insert(db, model, rows, returning=False):
+    from sqlalchemy import insert
+    ids = []
+    for start in range(0, len(rows), CHUNK):
+        chunk = rows[start:start + CHUNK]
+        if returning:
+            ids += db.session.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), chunk).all()
+        else:
+            db.session.execute(insert(model), chunk)
+    return ids
+
+def generate(db, appointments, seed=1, doctors=None, patients=None):
+    """Drop and recreate every table, then fill them; returns row counts"""
+    from flask import current_app
+    from werkzeug.security import generate_password_hash
+    from app.models import User, Department, Doctor, Patient, Availability, Appointment, Treatment
+    from app.utils.counters import rebuild_counters
+    
+    rng = random.Random(seed)
+    doctors = doctors or max(10, appointments // 1000)
+    patients = patients or max(50, appointments // 20)
+    today = date.today()
+    password_hash = generate_password_hash(PASSWORD, current_app.config['PASSWORD_HASH_METHOD'])
+    
+    db.drop_all()
+    db.create_all()
+    
+    department_ids = _insert(db, Department, [{'name': name, 'description': f'{name} department'} for name in DEPARTMENTS],
+                             returning=True)
+    departments = list(zip(department_ids, DEPARTMENTS.values()))
+    
+    _insert(db, User, [{'email': 'admin@bench.example.com', 'password_hash': password_hash, 'role': 'admin'}])
+    user_ids = _insert(db, User, [{'email': f'doctor{i}@bench.example.com', 'password_hash': password_hash, 'role': 'doctor'}
+                                  for i in range(doctors)], returning=True)
+    doctor_rows = []
+    for user_id in user_ids:
+        department_id, specializations = rng.choice(departments)
+        doctor_rows.append({'user_id': user_id, 'name': f'Dr. {_name(rng)}', 'specialization': rng.choice(specializations),
+                            'department_id': department_id, 'phone': f'555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+                            'years_of_experience': rng.randint(1, 35)})
+    doctor_ids = _insert(db, Doctor, doctor_rows, returning=True)
+    
+    # Each doctor works 4-6 days a week in one of a few shift patterns
+    schedules, availability_rows = {}, []
+    for doctor_id in doctor_ids:
+        shifts = rng.choice(SHIFTS)
+        days = sorted(rng.sample(range(6), rng.randint(4, 6)))
+        schedules[doctor_id] = (set(days), [time(hour, minute) for start, end in shifts
+                                            for hour in range(start, end) for minute in (0, 30)])
+        availability_rows += [{'doctor_id': doctor_id, 'day_of_week': day, 'start_time': time(start),
+                               'end_time': time(end), 'is_available': True} for day in days for start, end in shifts]
+    _insert(db, Availability, availability_rows)
+    
+    user_ids = _insert(db, User, [{'email': f'patient{i}@bench.example.com', 'password_hash': password_hash, 'role': 'patient'}
+                                  for i in range(patients)], returning=True)
+    patient_ids = _insert(db, Patient, [
+        {'user_id': user_id, 'name': _name(rng), 'phone': f'555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+         'date_of_birth': date(1940, 1, 1) + timedelta(days=rng.randint(0, 80 * 365)),
+         'blood_group': rng.choice(BLOOD_GROUPS), 'address': f'{rng.randint(1, 999)} Main Street'}
+        for user_id in user_ids
+    ], returning=True)
+    
+    # A few doctors and patients are much busier than the rest, like real clinics
+    doctor_weights = [rng.paretovariate(1.5) for _ in doctor_ids]
+    patient_weights = [rng.paretovariate(2.0) for _ in patient_ids]
+    active, treatments, created = set(), 0, 0
+    while created < appointments:
+        batch = min(CHUNK, appointments - created)
+        rows = []
+        for doctor_id, patient_id in zip(rng.choices(doctor_ids, doctor_weights, k=batch),
+                                         rng.choices(patient_ids, patient_weights, k=batch)):
+            days, slots = schedules[doctor_id]
+            day = today + timedelta(days=rng.randint(-365, 30))
+            while day.weekday() not in days:
+                day += timedelta(days=1)
+            at_time = rng.choice(slots)
+            if day < today:
+                status = rng.choices(['completed', 'cancelled', 'booked'], [75, 20, 5])[0]
+            else:
+                status = rng.choices(['booked', 'rescheduled', 'cancelled'], [80, 10, 10])[0]
+            if status in ('booked', 'rescheduled'):
+                if (doctor_id, day, at_time) in active:
+                    status = 'cancelled'
+                active.add((doctor_id, day, at_time))
+            rows.append({'doctor_id': doctor_id, 'patient_id': patient_id, 'date': day, 'time': at_time,
+                         'status': status, 'notes': rng.choice([None, 'Follow-up visit', 'Recurring pain', 'Annual check'])})
+        ids = _insert(db, Appointment, rows, returning=True)
+        treatment_rows = [{'appointment_id': id, 'diagnosis': rng.choice(DIAGNOSES), 'prescription': 'As directed',
+                           'notes': 'Review in 4 weeks'} for id, row in zip(ids, rows)
+                          if row['status'] == 'completed' and rng.random() < 0.8]
+        _insert(db, Treatment, treatment_rows)
+        db.session.commit()
+        created += batch
+        treatments += len(treatment_rows)
+    
+    rebuild_counters()
+    return {'doctors': doctors, 'patients': patients, 'appointments': appointments, 'treatments': treatments,
+            'availability': len(availability_rows)}
+
+def open_app(db_path):
+    """App bound to the SQLite file at ``db_path`` (call before anything imports ``app``)"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(db_path)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app
+    return create_app()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('db_path')
+    parser.add_argument('--scale', default='10k', help='10k, 100k, 1m or an appointment count')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    app = open_app(args.db_path)
+    from app import db
+    started = clock.perf_counter()
+    with app.app_context():
+        counts = generate(db, parse_scale(args.scale), args.seed)
+    print(', '.join(f'{count} {name}' for name, count in counts.items()))
+    print(f'✓ Generated {args.db_path} in {clock.perf_counter() - started:.1f}s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Measure login throughput for several password hashing policies.
+
+Usage: python benchmarks/password_hashing.py [seconds] [clients]
+Simulates `clients` concurrent logins verifying passwords through the
+hashing pool and reports logins/sec overall and per core, plus latency.
+"""
+import os
+import sys
+import threading
+import time as clock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from werkzeug.security import generate_password_hash
+from app import create_app
+from app.utils.passwords import verify_password
+
+POLICIES = ['pbkdf2:sha256:600000', 'scrypt:16384:8:1', 'scrypt:32768:8:1']
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def measure(app, method, seconds, clients):
+    stored = generate_password_hash('correct horse battery staple', method)
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies = []
+    
+    def client():
+        mine = []
+        with app.app_context():
+            while not stop.is_set():
+                started = clock.perf_counter()
+                assert verify_password(stored, 'correct horse battery staple')
+                mine.append(clock.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+    
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    clock.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / seconds, percentile(latencies, 50), percentile(latencies, 95)
+
+def main(seconds=3, clients=16):
+    app = create_app()
+    cores = os.cpu_count() or 1
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    print(f'{cores} cores, {workers} hashing workers, {clients} concurrent logins, {seconds}s per policy')
+    print(f'{"policy":24}{"logins/s":>10}{"per core":>10}{"p50 ms":>10}{"p95 ms":>10}')
+    for method in POLICIES:
+        rate, p50, p95 = measure(app, method, seconds, clients)
+        print(f'{method:24}{rate:>10.1f}{rate / min(cores, workers):>10.1f}{p50 * 1000:>10.1f}{p95 * 1000:>10.1f}')
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
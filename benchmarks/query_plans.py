@@ -0,0 +1,335 @@
+"""Explain every SQL statement the routes issue and flag table scans, temp B-tree sorts and missing indexes.
+
+Usage: python benchmarks/query_plans.py [--scale 10k] [--db PATH] [--verbose]
+                                        [--output plans.json] [--check [baseline.json]]
+Requests each route routes.py samples once, with the identity, page,
+fragment and calendar caches off so every query runs, plus a web login
+and an API token request. Each SELECT/INSERT/UPDATE/DELETE issued is run
+through EXPLAIN QUERY PLAN with its real parameters. Findings:
+
+  scan         SCAN <table>: every row of a table (or of the inner side of a join)
+  auto index   SQLite builds a throwaway index on every execution
+  index scan   every entry of an index, e.g. a LIMITed walk in index order
+  temp b-tree  ORDER BY/GROUP BY/DISTINCT sorted at run time
+
+For each finding an index is proposed from the statement's WHERE, JOIN,
+ORDER BY and GROUP BY columns on that table. It is created inside a
+transaction that is rolled back, and only suggested if the plan improves.
+
+--check exits 1 if a route scans or auto-indexes a table not listed in
+EXPECTED_SCANS. Given an earlier --output file, it also fails on any
+finding (including sorts and index scans) that file doesn't have for
+that route, so a plan that regresses from SEARCH to SCAN is caught.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generate_data import PASSWORD, generate, open_app, parse_scale
+from routes import SKIP, sample_routes
+
+# Caches that would answer a request without running its queries
+NO_CACHES = {'IDENTITY_CACHE_TTL': 0, 'PAGE_CACHE_TTL': 0, 'FRAGMENT_CACHE_SIZE': 0, 'CALENDAR_CACHE_TTL': -1}
+
+# Lookup tables with a handful of rows, fine to scan anywhere
+SMALL_TABLES = {'departments'}
+
+# Scans that are what the route is for, or that stop after one page
+EXPECTED_SCANS = {
+    'admin_dashboard.index': {'doctors', 'patients'},  # newest few, walked in rowid order with LIMIT
+    'admin_doctors.list_doctors': {'doctors'},  # keyset pages in rowid order
+    'admin_patients.list_patients': {'patients'},  # keyset pages in rowid order
+    'patient_dashboard.index': {'doctors'},  # active doctors per department, over every doctor
+    'patient_dashboard.list_doctors': {'doctors'},  # directory pages in rowid order
+    'patient_dashboard.suggest_doctors': {'doctors'},  # loads the whole typeahead index once
+    'admin_export.export': {'patients'},  # dumps every patient
+}
+
+EXPLAINED = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+TEMP_BTREE = re.compile(r'USE TEMP B-TREE FOR (.+)')
+SCAN = re.compile(r'SCAN (\S+)(?: USING (?:COVERING )?INDEX (\S+))?')
+AUTO_INDEX = re.compile(r'SEARCH (\S+) USING AUTOMATIC')
+ORDERING = re.compile(r'\b(?:ORDER|GROUP) BY (.+?)(?=\s+(?:LIMIT|OFFSET|HAVING|ORDER BY|UNION)\b|\)|$)')
+
+class Schema:
+    """Tables, columns and integer primary keys of the main and attached databases"""
+
+    def __init__(self, connection):
+        self.columns, self.rowids, self.rows = {}, {}, {}
+        for _, schema, _ in connection.execute('PRAGMA database_list').fetchall():
+            names = connection.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table' "
+                                       f"AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'").fetchall()
+            for (name,) in names:
+                info = connection.execute(f'PRAGMA {schema}.table_info({name})').fetchall()
+                self.columns[schema, name] = [row[1] for row in info]
+                pk = [row for row in info if row[5]]
+                self.rowids[schema, name] = pk[0][1] if len(pk) == 1 and pk[0][2].upper() == 'INTEGER' else None
+                self.rows[schema, name] = connection.execute(f'SELECT count(*) FROM {schema}.{name}').fetchone()[0]
+
+    def aliases(self, sql):
+        """``{name EXPLAIN uses: (schema, table)}`` for every table the statement reads"""
+        found = {}
+        for schema, table, alias in re.findall(r'(?:\bFROM|\bJOIN|,)\s+(?:(\w+)\.)?(\w+)(?:\s+AS\s+(\w+))?', sql):
+            key = (schema or 'main', table)
+            if key in self.columns:
+                found[alias or (f'{schema}.{table}' if schema and schema != 'main' else table)] = key
+        return found
+
+def explain(connection, sql, parameters):
+    return [row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()]
+
+def findings(plan, tables):
+    """``[signature]`` for the plan lines worth a look; ``tables`` maps EXPLAIN names to real tables"""
+    found = []
+    for line in plan:
+        if (match := TEMP_BTREE.match(line)):
+            found.append(f'temp b-tree {match.group(1)}')
+        elif (match := AUTO_INDEX.match(line)) and match.group(1) in tables:
+            found.append(f'auto index {tables[match.group(1)][1]}')
+        elif (match := SCAN.match(line)) and match.group(1) in tables:
+            found.append(f'{"index scan" if match.group(2) else "scan"} {tables[match.group(1)][1]}')
+    return found
+
+def _columns(sql, name, schema, table):
+    """Columns of one table the statement compares for equality, by range, orders by and mentions at all"""
+    ref = rf'(?<![\w.]){re.escape(name)}\.(\w+)'
+    known = [c for c in schema.columns[table] if c != schema.rowids[table]]  # the rowid is in every index already
+
+    def pick(pattern):
+        return [c for c in dict.fromkeys(re.findall(pattern, sql)) if c in known]
+    equal = pick(ref + r'\s*(?:(?<![!<>])=|IN\b|IS\b(?!\s+NOT))') + pick(r'(?:(?<![!<>])=|\bIS)\s*' + ref)
+    ranged = pick(ref + r'\s*(?:>=|<=|>|<|BETWEEN\b)')
+    ordered = []
+    for clause in ORDERING.findall(sql):
+        terms = [re.fullmatch(ref + r'(?:\s+(?:ASC|DESC))?', term.strip()) for term in clause.split(',')]
+        if all(terms):
+            ordered = [term.group(1) for term in terms if term.group(1) in known]
+    return list(dict.fromkeys(equal)), ranged, ordered, pick(ref)
+
+def candidates(sql, name, schema, table):
+    """Index column lists to try, narrowest first: equality, then ordering, then a range, then covering"""
+    equal, ranged, ordered, mentioned = _columns(sql, name, schema, table)
+    tried = [equal[:n] for n in range(1, len(equal))] + [equal, equal + ordered, equal + ranged[:1], equal + ordered + ranged[:1]]
+    tried.append(ordered)  # a driving table can be read in GROUP BY/ORDER BY order instead
+    tried += [columns + [c for c in mentioned if c not in columns] for columns in tried[1:]]
+    unique = []
+    for columns in tried:
+        columns = list(dict.fromkeys(columns))
+        if columns and len(columns) <= 6 and columns not in unique:
+            unique.append(columns)
+    return unique
+
+def index_sql(schema_name, table, columns):
+    prefix = '' if schema_name == 'main' else f'{schema_name}.'
+    return f'CREATE INDEX {prefix}idx_{table}_{"_".join(columns)} ON {table} ({", ".join(columns)})'
+
+def advise(connection, schema, sql, parameters, plan):
+    """``[(index DDL, findings it removes)]`` for one statement.
+
+    Tables are tried in turn, each index staying in place while the next
+    table's are tried (one index can change how SQLite joins the rest).
+    An index is kept if the plan ends up with fewer findings overall and
+    fewer on its own table or fewer sorts.
+    """
+    tables = schema.aliases(sql)
+    before = original = findings(plan, tables)
+    advice = []
+    connection.execute('BEGIN')
+    try:
+        for name, (schema_name, table) in tables.items():
+            def own(found):
+                return [f for f in found if f.endswith(' ' + table)], [f for f in found if f.startswith('temp b-tree')]
+            if not any(own(before)):
+                continue
+            for columns in candidates(sql, name, schema, (schema_name, table)):
+                ddl = index_sql(schema_name, table, columns)
+                connection.execute('SAVEPOINT trial')
+                connection.execute(ddl)
+                after = findings(explain(connection, sql, parameters), tables)
+                (table_before, sorts_before), (table_after, sorts_after) = own(before), own(after)
+                if len(after) < len(before) and (len(table_after) < len(table_before) or len(sorts_after) < len(sorts_before)):
+                    connection.execute('RELEASE trial')
+                    advice.append((ddl, sorted(set(sum(own(original), [])) - set(after))))
+                    before = after
+                    break
+                connection.execute('ROLLBACK TO trial')
+                connection.execute('RELEASE trial')
+    finally:
+        connection.execute('ROLLBACK')
+    return advice
+
+def _client(app, clients, email, login_statements, capture):
+    if email not in clients:
+        clients[email] = app.test_client()
+        if email:
+            capture(login_statements['auth.login [POST]'])
+            response = clients[email].post('/login', data={'email': email, 'password': PASSWORD})
+            assert response.status_code == 302, f'login failed for {email}'
+            capture(login_statements['api_v1.create_token [POST]'])
+            token = clients[email].post('/api/v1/tokens', json={'email': email, 'password': PASSWORD}).json['token']
+            clients[email].environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+            capture(None)
+    return clients[email]
+
+def capture_statements(app):
+    """``({route: url}, {route: [(sql, parameters)]}, uncovered)``, each statement once per route"""
+    from sqlalchemy import event
+    from app import db
+
+    with app.app_context(), app.test_request_context():
+        routes = sample_routes(db)
+        engine = db.engine
+    covered = {name.split('?')[0] for name in routes}
+    uncovered = sorted(rule.endpoint for rule in app.url_map.iter_rules()
+                       if 'GET' in rule.methods and rule.endpoint not in SKIP and rule.endpoint not in covered)
+
+    target = [None]
+    captured = {'auth.login [POST]': {}, 'api_v1.create_token [POST]': {}}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if target[0] is not None and not executemany and statement.lstrip().split(None, 1)[0].upper() in EXPLAINED:
+            target[0].setdefault(statement, parameters)
+
+    def capture(statements):
+        target[0] = statements
+
+    clients, urls = {}, {name: '/login' for name in captured}
+    urls['api_v1.create_token [POST]'] = '/api/v1/tokens'
+    for name, (email, url) in routes.items():
+        client = _client(app, clients, email, captured, capture)
+        urls[name] = url
+        captured[name] = {}
+        capture(captured[name])
+        response = client.get(url, buffered=True)
+        capture(None)
+        assert response.status_code < 500, f'{name} returned {response.status_code}'
+    event.remove(engine, 'before_cursor_execute', record)
+    return urls, {name: list(statements.items()) for name, statements in captured.items()}, uncovered
+
+def analyse(app, statements):
+    """``(per-route results, suggestions)``"""
+    from app import db
+    with app.app_context():
+        connection = db.engine.raw_connection()  # autocommit, with the archive attached (see sqlite.py)
+    try:
+        schema = Schema(connection)
+        results, suggestions, advice = {}, {}, {}
+        for route, pairs in statements.items():
+            details = []
+            for sql, parameters in pairs:
+                try:
+                    plan = explain(connection, sql, parameters)
+                except sqlite3.Error as e:
+                    details.append({'sql': sql, 'error': str(e), 'findings': []})
+                    continue
+                found = findings(plan, schema.aliases(sql))
+                if not found:
+                    continue
+                details.append({'sql': sql, 'plan': plan, 'findings': found})
+                if sql not in advice:
+                    advice[sql] = advise(connection, schema, sql, parameters, plan)
+                for ddl, fixes in advice[sql]:
+                    suggestion = suggestions.setdefault(ddl, {'fixes': set(), 'routes': set()})
+                    suggestion['fixes'].update(fixes)
+                    suggestion['routes'].add(route)
+            results[route] = {'statements': len(pairs), 'details': details,
+                              'findings': sorted({f for d in details for f in d['findings']})}
+        rows = {table: count for (_, table), count in schema.rows.items()}
+    finally:
+        connection.close()
+    return results, rows, {ddl: {'fixes': sorted(s['fixes']), 'routes': sorted(s['routes'])}
+                           for ddl, s in suggestions.items()}
+
+def unexpected_scans(route, found):
+    allowed = SMALL_TABLES | EXPECTED_SCANS.get(route.split('?')[0], set())
+    return [f for f in found if f.split(' ', 1)[0] in ('scan', 'auto') and f.rsplit(' ', 1)[1] not in allowed]
+
+def print_results(results, rows, suggestions, verbose):
+    print(f'{"route":52}{"queries":>8}  findings')
+    for route, r in results.items():
+        print(f'{route:52}{r["statements"]:>8}  {", ".join(r["findings"]) or "-"}')
+        if verbose:
+            for detail in r['details']:
+                print(f'    {" ".join(detail["sql"].split())[:200]}')
+                for line in detail.get('plan', [detail.get('error')]):
+                    print(f'        {line}')
+    if suggestions:
+        print('\nSuggested indexes (each checked by creating it in a rolled-back transaction):')
+        for ddl, s in suggestions.items():
+            table = ddl.split(' ON ')[1].split()[0]
+            print(f'  {ddl};  -- {table}: {rows.get(table, 0):,} rows')
+            print(f'      removes {", ".join(s["fixes"])} in {", ".join(s["routes"])}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='10k', help='10k, 100k, 1m or an appointment count')
+    parser.add_argument('--db', help='Reuse this database, or generate into it if missing')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help='Print each flagged statement with its plan')
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--check', nargs='?', const='', metavar='BASELINE',
+                        help='Exit 1 on unexpected scans, or on any finding missing from an earlier --output file')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'query_plans.db')
+    existing = os.path.exists(db_path)
+    app = open_app(db_path)
+    app.config.update(WTF_CSRF_ENABLED=False, **NO_CACHES)
+    from app import db
+    from app.models import Appointment
+    with app.app_context():
+        if not existing:
+            print(f'Generating {args.scale} dataset into {db_path} ...')
+            generate(db, parse_scale(args.scale), args.seed)
+        appointments = Appointment.query.count()
+
+    urls, statements, uncovered = capture_statements(app)
+    results, rows, suggestions = analyse(app, statements)
+    for route, r in results.items():
+        r['url'] = urls[route]
+
+    print(f'{appointments} appointments, SQLite {sqlite3.sqlite_version}')
+    print_results(results, rows, suggestions, args.verbose)
+    if uncovered:
+        print('Uncovered GET routes: ' + ', '.join(uncovered))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'appointments': appointments, 'python': platform.python_version(),
+                                'sqlite': sqlite3.sqlite_version, 'created': datetime.now().isoformat(timespec='seconds')},
+                       'routes': results, 'suggestions': suggestions, 'uncovered': uncovered}, f, indent=2)
+        print(f'✓ Results written to {args.output}')
+
+    if args.check is None:
+        return 0
+    baseline = None
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)['routes']
+    failures = []
+    for route, r in results.items():
+        problems = unexpected_scans(route, r['findings'])
+        if baseline is not None:
+            problems += [f for f in r['findings'] if f not in baseline.get(route, {}).get('findings', [])]
+        if problems:
+            failures.append(f'{route}: {", ".join(sorted(set(problems)))}')
+    for failure in failures:
+        print(f'✗ {failure}')
+    if not failures:
+        print('✓ No unexpected scans' + (' and no regressions against ' + args.check if args.check else ''))
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    # Keep runs out of the app's instance/ folder
+    scratch = tempfile.mkdtemp()
+    os.environ.setdefault('METRICS_DIR', os.path.join(scratch, 'metrics'))
+    os.environ.setdefault('JINJA_BYTECODE_CACHE_DIR', os.path.join(scratch, 'jinja'))
+    sys.exit(main())
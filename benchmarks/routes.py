@@ -0,0 +1,212 @@
+"""Drive every GET route through the Flask test client and report latency, queries and memory.
+
+Usage: python benchmarks/routes.py [--scale 10k] [--db PATH] [--iterations 30]
+                                   [--output results.json] [--compare baseline.json]
+Uses the database at --db if it exists, otherwise generates one at
+--scale (into --db when given, else a temporary file). Routes that
+change data (POST-only endpoints, logout) are not exercised; any other
+GET route the benchmark has no sample arguments for is listed as
+uncovered so new routes don't go unnoticed.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time as clock
+import tracemalloc
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generate_data import PASSWORD, generate, open_app, parse_scale
+
+SKIP = {'static', 'assets.serve', 'auth.logout'}
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def sample_routes(db):
+    """``{name: (login email or None, url)}`` using the busiest doctor and patient as the logged-in users"""
+    from flask import url_for
+    from sqlalchemy import func
+    from app.models import User, Doctor, Patient, Appointment, Treatment
+    
+    def busiest(column):
+        return db.session.query(column).group_by(column).order_by(func.count().desc()).limit(1).scalar()
+    
+    doctor = db.session.get(Doctor, busiest(Appointment.doctor_id))
+    patient = db.session.get(Patient, busiest(Appointment.patient_id))
+    doctor_treated = db.session.query(Appointment.id, Treatment.id).join(Treatment).filter(
+        Appointment.doctor_id == doctor.id).first()
+    patient_treated = db.session.query(Appointment.id, Treatment.id).join(Treatment).filter(
+        Appointment.patient_id == patient.id).first()
+    untreated = db.session.query(Appointment.id).outerjoin(Treatment).filter(
+        Appointment.doctor_id == doctor.id, Treatment.id == None, Appointment.status.in_(['booked', 'rescheduled'])
+    ).limit(1).scalar()
+    upcoming = db.session.query(Appointment.id).filter(
+        Appointment.patient_id == patient.id, Appointment.date > date.today(),
+        Appointment.status.in_(['booked', 'rescheduled'])
+    ).limit(1).scalar()
+    doctor_patient = db.session.query(Appointment.patient_id).filter(Appointment.doctor_id == doctor.id).limit(1).scalar()
+    word = doctor.specialization.split()[0][:4].lower()
+    
+    admin, doctor_email, patient_email = 'admin@bench.example.com', doctor.user.email, patient.user.email
+    args = {
+        'index': (None, {}),
+        'auth.login': (None, {}),
+        'auth.register': (None, {}),
+        'admin_dashboard.index': (admin, {}),
+        'admin_dashboard.appointments': (admin, {}),
+        'admin_doctors.list_doctors': (admin, {}),
+        'admin_doctors.add_doctor': (admin, {}),
+        'admin_doctors.edit_doctor': (admin, {'id': doctor.id}),
+        'admin_patients.list_patients': (admin, {}),
+        'admin_patients.edit_patient': (admin, {'id': patient.id}),
+        'admin_patients.patient_history': (admin, {'id': patient.id}),
+        'admin_search.search': (admin, {}),
+        'doctor_dashboard.index': (doctor_email, {}),
+        'doctor_appointments.list_appointments': (doctor_email, {}),
+        'doctor_appointments.add_treatment': (doctor_email, {'id': untreated}),
+        'doctor_appointments.edit_appointment_treatment': (doctor_email, {'id': doctor_treated[0]}),
+        'doctor_appointments.edit_treatment': (doctor_email, {'id': doctor_treated[1]}),
+        'doctor_appointments.view_treatment': (doctor_email, {'id': doctor_treated[1]}),
+        'doctor_appointments.patient_history': (doctor_email, {'id': doctor_patient}),
+        'doctor_availability.view_availability': (doctor_email, {}),
+        'doctor_availability.add_availability': (doctor_email, {}),
+        'doctor_availability.add_exception': (doctor_email, {}),
+        'patient_dashboard.index': (patient_email, {}),
+        'patient_dashboard.list_doctors': (patient_email, {}),
+        'patient_dashboard.suggest_doctors': (patient_email, {'q': word}),
+        'patient_appointments.doctor_detail': (patient_email, {'id': doctor.id}),
+        'patient_appointments.doctor_slots': (patient_email, {'id': doctor.id}),
+        'patient_appointments.book_appointment': (patient_email, {'doctor_id': doctor.id}),
+        'patient_appointments.my_appointments': (patient_email, {}),
+        'patient_appointments.reschedule_appointment': (patient_email, {'id': upcoming}),
+        'patient_appointments.view_appointment_treatment': (patient_email, {'id': patient_treated[0]}),
+        'patient_appointments.view_treatment': (patient_email, {'id': patient_treated[1]}),
+        'patient_appointments.medical_history': (patient_email, {}),
+        'patient_profile.view_profile': (patient_email, {}),
+        'patient_profile.edit_profile': (patient_email, {}),
+        'admin_export.export': (admin, {'kind': 'patients', 'fmt': 'csv'}),
+        'metrics.export': (admin, {}),
+        'api_v1.list_appointments': (patient_email, {}),
+        'api_v1.get_appointment': (patient_email, {'id': upcoming}),
+        'api_v1.doctor_slots': (patient_email, {'id': doctor.id}),
+    }
+    routes = {endpoint: (email, url_for(endpoint, **kwargs)) for endpoint, (email, kwargs) in args.items()
+              if all(value is not None for value in kwargs.values())}
+    routes['patient_dashboard.list_doctors?search'] = (patient_email, url_for('patient_dashboard.list_doctors', search=word))
+    routes['admin_dashboard.appointments?per_page=max'] = (admin, url_for('admin_dashboard.appointments', per_page=200))
+    return routes
+
+def run(app, iterations):
+    from sqlalchemy import event
+    from app import db
+    
+    with app.app_context(), app.test_request_context():
+        routes = sample_routes(db)
+        engine = db.engine
+    covered = {name.split('?')[0] for name in routes}
+    uncovered = sorted(rule.endpoint for rule in app.url_map.iter_rules()
+                       if 'GET' in rule.methods and rule.endpoint not in SKIP and rule.endpoint not in covered)
+    
+    statements = []
+    
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, *args):
+        if not statement.startswith('BEGIN'):
+            statements.append(statement)
+    
+    clients, results = {}, {}
+    for name, (email, url) in routes.items():
+        if email not in clients:
+            clients[email] = app.test_client()
+            if email:
+                response = clients[email].post('/login', data={'email': email, 'password': PASSWORD})
+                assert response.status_code == 302, f'login failed for {email}'
+                # API routes ignore the session and need a token instead
+                token = clients[email].post('/api/v1/tokens', json={'email': email, 'password': PASSWORD}).json['token']
+                clients[email].environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        client = clients[email]
+        
+        client.get(url, buffered=True)  # warm-up: template compilation, caches
+        latencies = []
+        for _ in range(iterations):
+            del statements[:]
+            started = clock.perf_counter()
+            response = client.get(url, buffered=True)
+            latencies.append(clock.perf_counter() - started)
+        queries = len(statements)
+        
+        tracemalloc.start()
+        client.get(url, buffered=True)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        
+        results[name] = {
+            'url': url, 'status': response.status_code, 'bytes': len(response.data),
+            'p50_ms': percentile(latencies, 50) * 1000, 'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000, 'queries': queries, 'peak_kb': peak / 1024,
+        }
+    return results, uncovered
+
+def print_results(results, baseline=None):
+    print(f'{"route":52}{"status":>7}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}{"peak KB":>9}')
+    for name, r in results.items():
+        line = f'{name:52}{r["status"]:>7}{r["p50_ms"]:>9.1f}{r["p95_ms"]:>9.1f}{r["p99_ms"]:>9.1f}{r["queries"]:>9}{r["peak_kb"]:>9.0f}'
+        old = (baseline or {}).get(name)
+        if old:
+            change = (r['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+            flag = '  <-- slower' if change > 20 else ''
+            line += f'  p95 {change:+.0f}%, queries {r["queries"] - old["queries"]:+d}{flag}'
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='10k', help='10k, 100k, 1m or an appointment count')
+    parser.add_argument('--db', help='Reuse this database, or generate into it if missing')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--compare', help='Show changes against an earlier --output file')
+    args = parser.parse_args()
+    
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'routes_bench.db')
+    existing = os.path.exists(db_path)
+    app = open_app(db_path)
+    app.config['WTF_CSRF_ENABLED'] = False
+    from app import db
+    from app.models import Appointment
+    with app.app_context():
+        if not existing:
+            print(f'Generating {args.scale} dataset into {db_path} ...')
+            generate(db, parse_scale(args.scale), args.seed)
+        appointments = Appointment.query.count()
+    
+    results, uncovered = run(app, args.iterations)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['routes']
+    
+    print(f'{appointments} appointments, {args.iterations} iterations per route')
+    print_results(results, baseline)
+    if uncovered:
+        print('Uncovered GET routes: ' + ', '.join(uncovered))
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'appointments': appointments, 'iterations': args.iterations,
+                                'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                                'created': datetime.now().isoformat(timespec='seconds')},
+                       'routes': results, 'uncovered': uncovered}, f, indent=2)
+        print(f'✓ Results written to {args.output}')
+    
+    failed = [name for name, r in results.items() if r['status'] >= 500]
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
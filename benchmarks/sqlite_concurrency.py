@@ -0,0 +1,155 @@
+"""Compare read/write concurrency with the old rollback-journal defaults and the configured pragmas.
+
+Usage: python benchmarks/sqlite_concurrency.py [seconds] [readers] [writers]
+Each mode runs in its own process against a throwaway SQLite database;
+readers run the admin appointment list and dashboard counters while
+writers book appointments as fast as they can.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time as clock
+from datetime import date, time, timedelta
+
+MODES = {
+    'before (journal_mode=DELETE, synchronous=FULL)': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL',
+                                                       'SQLITE_CACHE_SIZE': '-2000', 'SQLITE_MMAP_SIZE': '0'},
+    'after (configured defaults)': {},
+}
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def seed(db, doctors, patients, appointments):
+    from app.models import User, Doctor, Patient, Appointment
+    db.drop_all()
+    db.create_all()
+    doctor_ids, patient_ids = [], []
+    for i in range(doctors):
+        user = User(email=f'doctor{i}@bench.local', role='doctor', password_hash='-')
+        db.session.add(user)
+        db.session.flush()
+        doctor = Doctor(user_id=user.id, name=f'Doctor {i}', specialization='General')
+        db.session.add(doctor)
+        db.session.flush()
+        doctor_ids.append(doctor.id)
+    for i in range(patients):
+        user = User(email=f'patient{i}@bench.local', role='patient', password_hash='-')
+        db.session.add(user)
+        db.session.flush()
+        patient = Patient(user_id=user.id, name=f'Patient {i}')
+        db.session.add(patient)
+        db.session.flush()
+        patient_ids.append(patient.id)
+    start = date.today() - timedelta(days=365)
+    for i in range(appointments):
+        db.session.add(Appointment(doctor_id=doctor_ids[i % doctors], patient_id=patient_ids[i % patients],
+                                   date=start + timedelta(days=i // 200), time=time(8 + i % 10, 30 * (i // 10 % 2)),
+                                   status='completed'))
+    db.session.commit()
+    return doctor_ids, patient_ids
+
+def run_mode(seconds, readers, writers):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'concurrency_bench.db')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app, db
+    from app.models import Appointment
+    from app.utils.booking import book_slot
+    from app.utils.counters import get_counters, rebuild_counters
+    from app.utils.queries import view_query, APPOINTMENT_KEY
+    from app.utils.sqlite import use_read_only_session
+    
+    app = create_app()
+    with app.app_context():
+        doctor_ids, patient_ids = seed(db, max(writers, 4), 50, 5000)
+        rebuild_counters()
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+    
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {'read_latency': [], 'write_latency': [], 'read_errors': 0, 'write_errors': 0}
+    
+    def reader():
+        latencies, errors = [], 0
+        while not stop.is_set():
+            with app.app_context():
+                use_read_only_session()
+                started = clock.perf_counter()
+                try:
+                    get_counters()
+                    view_query('admin.appointments').order_by(*(c.desc() for c in APPOINTMENT_KEY)).limit(50).all()
+                    latencies.append(clock.perf_counter() - started)
+                except Exception:
+                    errors += 1
+        with lock:
+            stats['read_latency'] += latencies
+            stats['read_errors'] += errors
+    
+    def writer(index):
+        latencies, errors, slot = [], 0, 0
+        doctor_id = doctor_ids[index]
+        while not stop.is_set():
+            day = date.today() + timedelta(days=1 + slot // 16)
+            at_time = time(9 + slot % 16 // 2, 30 * (slot % 2))
+            slot += 1
+            with app.app_context():
+                started = clock.perf_counter()
+                try:
+                    book_slot(doctor_id, patient_ids[slot % len(patient_ids)], day, at_time)
+                    latencies.append(clock.perf_counter() - started)
+                except Exception:
+                    db.session.rollback()
+                    errors += 1
+        with lock:
+            stats['write_latency'] += latencies
+            stats['write_errors'] += errors
+    
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    clock.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    with app.app_context():
+        booked = Appointment.query.filter(Appointment.status == 'booked').count()
+    
+    return {
+        'journal_mode': journal_mode,
+        'reads_per_sec': len(stats['read_latency']) / seconds,
+        'writes_per_sec': len(stats['write_latency']) / seconds,
+        'read_p50_ms': percentile(stats['read_latency'], 50) * 1000,
+        'read_p95_ms': percentile(stats['read_latency'], 95) * 1000,
+        'read_max_ms': percentile(stats['read_latency'], 100) * 1000,
+        'write_p95_ms': percentile(stats['write_latency'], 95) * 1000,
+        'read_errors': stats['read_errors'],
+        'write_errors': stats['write_errors'],
+        'booked': booked,
+    }
+
+def main(seconds=5, readers=4, writers=2):
+    results = {}
+    for name, env in MODES.items():
+        output = subprocess.run([sys.executable, __file__, '--mode', str(seconds), str(readers), str(writers)],
+                                env={**os.environ, **env}, capture_output=True, text=True, check=True).stdout
+        results[name] = json.loads(output.strip().splitlines()[-1])
+    
+    print(f'{seconds}s, {readers} readers, {writers} writers')
+    keys = list(next(iter(results.values())))
+    print(f'{"":16}' + ''.join(f'{name.split(" ")[0]:>14}' for name in results))
+    for key in keys:
+        print(f'{key:16}' + ''.join(f'{r[key]:>14.1f}' if isinstance(r[key], float) else f'{r[key]:>14}' for r in results.values()))
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--mode']:
+        print(json.dumps(run_mode(*(float(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])))))
+    else:
+        main(*(int(arg) for arg in sys.argv[1:4]))